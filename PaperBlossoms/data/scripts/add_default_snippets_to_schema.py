@@ -1,4 +1,4 @@
-import sys
+import argparse
 import json
 
 # Helper to generate placeholder text based on property type
@@ -53,9 +53,14 @@ def add_snippet_to_schema(schema_filename):
         json.dump(schema, f, indent = 4)
 
 
-def main():
-    add_snippet_to_schema(sys.argv[1])
+def main(schema_filenames):
+    for schema_filename in schema_filenames:
+        add_snippet_to_schema(schema_filename)
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description = 'Add defaultSnippets for editing in vscode to json schemas, in place.')
+    parser.add_argument('schema', nargs = '+', help = 'Filepaths of the json schemas to add snippets to')
+    args = parser.parse_args()
+
+    main(args.schema)
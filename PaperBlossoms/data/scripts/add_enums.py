@@ -435,10 +435,14 @@ def write_advance(data_dir, skill_groups_enum, skills_enum, technique_categories
 
 
 
-def main(option):
+# Groups of enums that can be written on their own
+ENUM_OPTIONS = ['rings', 'clans', 'skills', 'techniques', 'qualities', 'equipment', 'advantages', 'books', 'resistance', 'currency']
+
+
+def main(option, data_dir = None):
 
     # Get path to data directory
-    data_dir = pathlib.Path(__file__).parents[1]
+    data_dir = pathlib.Path(data_dir) if data_dir is not None else pathlib.Path(__file__).parents[1]
 
     # Write enums if they were requested
     if option is None or 'rings' in option:
@@ -471,9 +475,10 @@ if __name__ == '__main__':
     parser.add_argument(
         '--option',
         nargs = '*',
-        choices = ['rings', 'clans', 'skills', 'techniques', 'qualities', 'equipment', 'advantages', 'books', 'resistance', 'currency'],
+        choices = ENUM_OPTIONS,
         help = 'Which enums you want to write to json schemas (defaults to all with no arguments specified)'
     )
+    parser.add_argument('--data-dir', help = 'Data folder holding json and json_schema (defaults to the one this script is in)')
     args = parser.parse_args()
 
-    main(args.option)
+    main(args.option, args.data_dir)
@@ -0,0 +1,204 @@
+import argparse
+import sqlite3
+import sys
+import time
+
+
+# References between the data tables, as (child table stem, child columns,
+# parent table stem, parent columns, condition on the child rows holding
+# the reference). A reference resolves if the parent is in the base_ or the
+# user_ table; the parent columns are always the parent's primary key, so
+# each check is an anti-join on its index. The first child column must be
+# set for the row to hold a reference; a later one left NULL matches any
+# value, so the reference only needs the leading columns, a prefix of the
+# parent's primary key index, to resolve (weapon qualities of every grip)
+RELATIONSHIPS = [
+    ('advantage_types', ['advantage'], 'advantages_disadvantages', ['name'], None),
+    ('advantages_disadvantages', ['ring'], 'rings', ['name'], None),
+    ('armor_qualities', ['armor'], 'armor', ['name'], None),
+    ('armor_qualities', ['quality'], 'qualities', ['quality'], None),
+    ('armor_resistance', ['armor'], 'armor', ['name'], None),
+    ('clans', ['ring'], 'rings', ['name'], None),
+    ('clans', ['skill'], 'skills', ['skill'], None),
+    ('curriculum', ['school'], 'schools', ['name'], None),
+    ('curriculum', ['advance'], 'skills', ['skill'], "type = 'skill'"),
+    ('curriculum', ['advance'], 'techniques', ['name'], "type = 'technique'"),
+    ('families', ['clan'], 'clans', ['name'], None),
+    ('family_rings', ['family'], 'families', ['name'], None),
+    ('family_rings', ['ring'], 'rings', ['name'], None),
+    ('family_skills', ['family'], 'families', ['name'], None),
+    ('family_skills', ['skill'], 'skills', ['skill'], None),
+    ('heritage_effects', ['ancestor'], 'samurai_heritage', ['ancestor'], None),
+    ('personal_effect_qualities', ['personal_effect'], 'personal_effects', ['name'], None),
+    ('personal_effect_qualities', ['quality'], 'qualities', ['quality'], None),
+    ('school_rings', ['school'], 'schools', ['name'], None),
+    ('school_rings', ['ring'], 'rings', ['name'], "ring <> 'any'"),
+    ('school_roles', ['school'], 'schools', ['name'], None),
+    ('school_starting_outfit', ['school'], 'schools', ['name'], None),
+    ('school_starting_skills', ['school'], 'schools', ['name'], None),
+    ('school_starting_skills', ['skill'], 'skills', ['skill'], None),
+    ('school_starting_techniques', ['school'], 'schools', ['name'], None),
+    ('school_starting_techniques', ['technique'], 'techniques', ['name'], None),
+    ('school_techniques_available', ['school'], 'schools', ['name'], None),
+    ('schools', ['clan'], 'clans', ['name'], None),
+    ('schools', ['advantage_disadvantage'], 'advantages_disadvantages', ['name'], None),
+    ('title_advancements', ['title'], 'titles', ['name'], None),
+    ('title_advancements', ['name'], 'skills', ['skill'], "type = 'skill'"),
+    ('title_advancements', ['name'], 'techniques', ['name'], "type = 'technique'"),
+    ('title_awards', ['title'], 'titles', ['name'], None),
+    ('weapon_qualities', ['weapon', 'grip'], 'weapons', ['name', 'grip'], None),
+    ('weapon_qualities', ['quality'], 'qualities', ['quality'], None)
+]
+
+# Tables whose rows are entities in their own right; repair never deletes
+# them for a dangling reference, as it does the rows of the link tables
+ENTITY_TABLES = ['advantages_disadvantages', 'clans', 'families', 'schools']
+
+
+# Names of the tables and views; base_ and user_ tables are views over
+# their storage in dbs built with interned strings or for a locale
+def existing_tables(db_conn):
+    return {name for name, in db_conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+
+
+# PRAGMA quick_check, or the slower integrity_check which also verifies
+# that indexes match their tables; returns the problems found
+def integrity_errors(db_conn, full = False):
+    rows = db_conn.execute('PRAGMA {}'.format('integrity_check' if full else 'quick_check')).fetchall()
+    return [message for message, in rows if message != 'ok']
+
+
+# WHERE clause selecting the rows of {prefix}_{child} whose reference
+# resolves in neither the base_ nor the user_ parent table
+def dangling_condition(prefix, relationship, tables):
+    child, child_columns, parent, parent_columns, condition = relationship
+    child_table = '{}_{}'.format(prefix, child)
+    terms = ['{}.{} IS NOT NULL'.format(child_table, child_columns[0])]
+    if condition is not None:
+        terms.append(condition)
+    for parent_prefix in ['base', 'user']:
+        parent_table = '{}_{}'.format(parent_prefix, parent)
+        if parent_table in tables:
+            matches = ['{}.{} = {}.{}'.format(parent_table, parent_columns[0], child_table, child_columns[0])]
+            matches += [
+                '({child_table}.{child_column} IS NULL OR {parent_table}.{parent_column} = {child_table}.{child_column})'.format(
+                    child_table = child_table,
+                    child_column = child_column,
+                    parent_table = parent_table,
+                    parent_column = parent_column
+                )
+                for parent_column, child_column in zip(parent_columns[1:], child_columns[1:])
+            ]
+            terms.append('NOT EXISTS (SELECT 1 FROM {parent_table} WHERE {matches})'.format(
+                parent_table = parent_table,
+                matches = ' AND '.join(matches)
+            ))
+
+    return ' AND '.join(terms)
+
+
+# Whether the base_ or user_ parent table of a relationship exists, as
+# without either its references cannot be checked
+def has_parent(relationship, tables):
+    return any('{}_{}'.format(prefix, relationship[2]) in tables for prefix in ['base', 'user'])
+
+
+# Dangling references of the tables with the given prefixes, as
+# (table, child columns, parent stem, row count, distinct missing values)
+def find_dangling(db_conn, prefixes = ('base', 'user')):
+    tables = existing_tables(db_conn)
+    dangling = []
+    for relationship in RELATIONSHIPS:
+        child, child_columns, parent, _, _ = relationship
+        for prefix in prefixes:
+            table = '{}_{}'.format(prefix, child)
+            if table not in tables or not has_parent(relationship, tables):
+                continue
+            missing = db_conn.execute('SELECT {columns}, count(*) FROM {table} WHERE {condition} GROUP BY {columns}'.format(
+                columns = ', '.join(child_columns),
+                table = table,
+                condition = dangling_condition(prefix, relationship, tables)
+            )).fetchall()
+            if missing:
+                dangling.append((table, child_columns, parent, sum(row[-1] for row in missing), [row[:-1] for row in missing]))
+
+    return dangling
+
+
+# Delete the user_ link table rows whose references dangle; base_ tables
+# are rebuilt from the json and entities are left for the user to fix.
+# Returns the number of rows deleted from each table, counted beforehand as
+# deletes through the triggers of views do not report their changes
+def repair_dangling(db_conn):
+    tables = existing_tables(db_conn)
+    deleted = {}
+    for relationship in RELATIONSHIPS:
+        child = relationship[0]
+        table = 'user_' + child
+        if child in ENTITY_TABLES or table not in tables or not has_parent(relationship, tables):
+            continue
+        condition = dangling_condition('user', relationship, tables)
+        count, = db_conn.execute('SELECT count(*) FROM {} WHERE {}'.format(table, condition)).fetchone()
+        db_conn.execute('DELETE FROM {} WHERE {}'.format(table, condition))
+        if count:
+            deleted[table] = deleted.get(table, 0) + count
+
+    return deleted
+
+
+def print_dangling(dangling, limit = 5):
+    for table, child_columns, parent, count, missing in dangling:
+        print('{} rows of {} refer to missing {} by {}: {}{}'.format(
+            count,
+            table,
+            parent,
+            ', '.join(child_columns),
+            '; '.join(', '.join(map(str, values)) for values in missing[:limit]),
+            ' and {} more'.format(len(missing) - limit) if len(missing) > limit else ''
+        ))
+
+
+# Check the open db: integrity, then dangling references in the tables with
+# the given prefixes, deleting dangling user_ link rows if repair is set.
+# Returns whether the db is healthy, after any repair
+def check(db_conn, full = False, repair = False, prefixes = ('base', 'user')):
+    errors = integrity_errors(db_conn, full)
+    for message in errors:
+        print('Integrity:', message)
+    if errors:
+        return False
+
+    dangling = find_dangling(db_conn, prefixes)
+    print_dangling(dangling)
+    if dangling and repair:
+        for table, count in repair_dangling(db_conn).items():
+            print('Deleted {} dangling rows from {}'.format(count, table))
+        db_conn.commit()
+        dangling = find_dangling(db_conn, prefixes)
+        print_dangling(dangling)
+
+    return not dangling
+
+
+def main(db_file, full = False, repair = False, user_only = False):
+    start = time.perf_counter()
+    db_conn = sqlite3.connect(db_file)
+    try:
+        healthy = check(db_conn, full, repair, ('user',) if user_only else ('base', 'user'))
+    finally:
+        db_conn.close()
+    print('{} {} in {:.1f} ms'.format(db_file, 'is healthy' if healthy else 'has problems', 1000 * (time.perf_counter() - start)))
+
+    return healthy
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Check a paperblossoms db for corruption and for rows referring to entries that exist in neither the base nor the user tables.')
+    parser.add_argument('db', help = 'Filepath for the paperblossoms db to check')
+    parser.add_argument('--full', action = 'store_true', help = 'Run PRAGMA integrity_check instead of the faster quick_check')
+    parser.add_argument('--repair', action = 'store_true', help = 'Delete user link rows, such as family rings or weapon qualities, whose references dangle')
+    parser.add_argument('--user-only', action = 'store_true', help = 'Only check the references of the user tables')
+    args = parser.parse_args()
+
+    if not main(args.db, args.full, args.repair, args.user_only):
+        sys.exit(1)
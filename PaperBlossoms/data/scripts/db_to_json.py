@@ -0,0 +1,558 @@
+import argparse
+import itertools
+import json
+import os
+import sqlite3
+import types
+
+import json_to_db
+
+
+INDENT = ' ' * 4
+
+
+# Write value as indented json, as json.dump(value, f, indent = 4) would,
+# except that generators are written as arrays item by item while they are
+# produced, and dicts holding generators are opened around them, so a
+# document is never held in memory as a whole
+def write_json(f, value, level = 0):
+    if isinstance(value, types.GeneratorType):
+        items = ((None, item) for item in value)
+        brackets = '[]'
+    elif isinstance(value, dict) and any(isinstance(item, types.GeneratorType) for item in value.values()):
+        items = value.items()
+        brackets = '{}'
+    else:
+        f.write(json.dumps(value, indent = 4).replace('\n', '\n' + INDENT * level))
+        return
+
+    f.write(brackets[0])
+    empty = True
+    for key, item in items:
+        f.write(('\n' if empty else ',\n') + INDENT * (level + 1))
+        if key is not None:
+            f.write(json.dumps(key) + ': ')
+        write_json(f, item, level + 1)
+        empty = False
+    f.write(brackets[1] if empty else '\n' + INDENT * level + brackets[1])
+
+
+# Read the rows of a base or user table with their insertion order as a
+# position column. Interned tables are compatibility views without a rowid,
+# so their position is read from the interned_ storage table they select from;
+# where that table's key is a single interned column the rowid is the string
+# id, and its rows come out in string order rather than insertion order
+def table_source(db_conn, table):
+    object_type, sql = db_conn.execute(
+        "SELECT type, sql FROM sqlite_master WHERE name = ? AND type IN ('table', 'view')",
+        (table,)
+    ).fetchone()
+    if object_type == 'table':
+        return '(SELECT *, rowid AS position FROM {table})'.format(table = table)
+
+    select = sql.split('\n', 1)[1]
+    return '({})'.format(select.replace('\nFROM ', ', t.rowid AS position\nFROM ', 1))
+
+
+# Number the distinct keys returned by key_query, in the order it returns
+# them, in an indexed temporary table; parent and child tables are then both
+# read in that order by joining on it, so children can be merged into their
+# parents from a single cursor per table
+def create_order(db_conn, name, key_query):
+    db_conn.execute('DROP TABLE IF EXISTS temp.order_' + name)
+    db_conn.execute(
+        '''CREATE TEMP TABLE order_{name} (
+            seq INTEGER PRIMARY KEY,
+            key UNIQUE
+        )'''.format(name = name)
+    )
+    db_conn.execute('INSERT INTO temp.order_{name} (key) {key_query}'.format(name = name, key_query = key_query))
+
+
+# Rows of source whose key_column is in the named order, sorted by that order
+# and then by position
+def ordered_rows(db_conn, source, key_column, order):
+    return db_conn.execute(
+        '''SELECT t.* FROM {source} t
+        JOIN temp.order_{order} o ON t.{key_column} = o.key
+        ORDER BY o.seq, t.position'''.format(source = source, key_column = key_column, order = order)
+    )
+
+
+# Rows of a child table read in the order of their parents, handed out one
+# parent at a time while the parents are visited in that same order
+class ChildRows:
+
+    def __init__(self, db_conn, source, key_column, order):
+        self.rows = ordered_rows(db_conn, source, key_column, order)
+        self.key_column = key_column
+        self.next_row = next(self.rows, None)
+
+    def take(self, key):
+        rows = []
+        while self.next_row is not None and self.next_row[self.key_column] == key:
+            rows.append(self.next_row)
+            self.next_row = next(self.rows, None)
+
+        return rows
+
+
+def reference(row):
+    return {
+        'book': row['reference_book'],
+        'page': row['reference_page']
+    }
+
+
+def price(row):
+    return {
+        'value': row['price_value'],
+        'unit': row['price_unit']
+    }
+
+
+def rings_document(db_conn, source):
+    for row in db_conn.execute('SELECT * FROM {} ORDER BY position'.format(source('rings'))):
+        yield {
+            'name': row['name'],
+            'outstanding_quality': row['outstanding_quality']
+        }
+
+
+# Group rows of a flat table into {'name': ..., group_key: [...]} documents by
+# group_column, ordering the groups by their first row and keeping rows of a
+# group in position order
+def grouped_rows(db_conn, source, group_column):
+    return itertools.groupby(
+        db_conn.execute(
+            '''SELECT * FROM (
+                SELECT *, MIN(position) OVER (PARTITION BY {group_column}) AS group_position FROM {source}
+            ) ORDER BY group_position, position'''.format(source = source, group_column = group_column)
+        ),
+        key = lambda row: row[group_column]
+    )
+
+
+def skills_document(db_conn, source):
+    for skill_group, rows in grouped_rows(db_conn, source('skills'), 'skill_group'):
+        yield {
+            'name': skill_group,
+            'skills': [row['skill'] for row in rows]
+        }
+
+
+def qualities_document(db_conn, source):
+    for row in db_conn.execute('SELECT * FROM {} ORDER BY position'.format(source('qualities'))):
+        yield {
+            'name': row['quality'],
+            'reference': reference(row)
+        }
+
+
+def personal_effects_document(db_conn, source):
+    create_order(db_conn, 'personal_effects', 'SELECT name FROM {} ORDER BY position'.format(source('personal_effects')))
+    qualities = ChildRows(db_conn, source('personal_effect_qualities'), 'personal_effect', 'personal_effects')
+
+    for row in ordered_rows(db_conn, source('personal_effects'), 'name', 'personal_effects'):
+        item = {
+            'name': row['name'],
+            'reference': reference(row)
+        }
+        if row['price_value'] is not None:
+            item['price'] = price(row)
+        if row['rarity'] is not None:
+            item['rarity'] = row['rarity']
+        item_qualities = [quality_row['quality'] for quality_row in qualities.take(row['name'])]
+        if item_qualities:
+            item['qualities'] = item_qualities
+        yield item
+
+
+def armor_document(db_conn, source):
+    create_order(db_conn, 'armor', 'SELECT name FROM {} ORDER BY position'.format(source('armor')))
+    resistances = ChildRows(db_conn, source('armor_resistance'), 'armor', 'armor')
+    qualities = ChildRows(db_conn, source('armor_qualities'), 'armor', 'armor')
+
+    for row in ordered_rows(db_conn, source('armor'), 'name', 'armor'):
+        yield {
+            'name': row['name'],
+            'reference': reference(row),
+            'resistance_values': [
+                {
+                    'category': resistance_row['resistance_category'],
+                    'value': resistance_row['resistance_value']
+                }
+                for resistance_row in resistances.take(row['name'])
+            ],
+            'qualities': [quality_row['quality'] for quality_row in qualities.take(row['name'])],
+            'rarity': row['rarity'],
+            'price': price(row)
+        }
+
+
+# The weapons tables hold one row per grip with the values in effect for that
+# grip; the first grip is taken as the weapon's base values, and each grip
+# gets effects for the attributes in which it differs from them. Damage and
+# deadliness are stored as increases, so the base is their lowest value
+def weapon_entry(grip_rows, grip_qualities, weapon_qualities):
+    first = grip_rows[0]
+    damage = min(row['damage'] for row in grip_rows)
+    deadliness = min(row['deadliness'] for row in grip_rows)
+
+    grips = []
+    for row in grip_rows:
+        effects = []
+        if row['skill'] != first['skill']:
+            effects.append({'attribute': 'skill', 'value': row['skill']})
+        if (row['range_min'], row['range_max']) != (first['range_min'], first['range_max']):
+            effects.append({'attribute': 'range', 'value': {'min': row['range_min'], 'max': row['range_max']}})
+        if row['damage'] != damage:
+            effects.append({'attribute': 'damage', 'value_increase': row['damage'] - damage})
+        if row['deadliness'] != deadliness:
+            effects.append({'attribute': 'deadliness', 'value_increase': row['deadliness'] - deadliness})
+        effects += [
+            {'attribute': 'quality', 'value': quality_row['quality']}
+            for quality_row in grip_qualities
+            if quality_row['grip'] == row['grip']
+        ]
+        grips.append({
+            'name': row['grip'],
+            'effects': effects
+        })
+
+    return {
+        'name': first['name'],
+        'reference': reference(first),
+        'skill': first['skill'],
+        'range': {
+            'min': first['range_min'],
+            'max': first['range_max']
+        },
+        'damage': damage,
+        'deadliness': deadliness,
+        'grips': grips,
+        'qualities': [quality_row['quality'] for quality_row in weapon_qualities],
+        'rarity': first['rarity'],
+        'price': price(first)
+    }
+
+
+def weapons_document(db_conn, source):
+    create_order(
+        db_conn,
+        'weapons',
+        '''SELECT name FROM (
+            SELECT name, position, MIN(position) OVER (PARTITION BY category) AS category_position FROM {}
+        ) GROUP BY name ORDER BY MIN(category_position), MIN(position)'''.format(source('weapons'))
+    )
+    qualities = ChildRows(db_conn, source('weapon_qualities'), 'weapon', 'weapons')
+
+    def entries(weapon_rows):
+        for name, grip_rows in itertools.groupby(weapon_rows, key = lambda row: row['name']):
+            quality_rows = qualities.take(name)
+            yield weapon_entry(
+                list(grip_rows),
+                [quality_row for quality_row in quality_rows if quality_row['grip'] is not None],
+                [quality_row for quality_row in quality_rows if quality_row['grip'] is None]
+            )
+
+    rows = ordered_rows(db_conn, source('weapons'), 'name', 'weapons')
+    for category, weapon_rows in itertools.groupby(rows, key = lambda row: row['category']):
+        yield {
+            'name': category,
+            'entries': entries(weapon_rows)
+        }
+
+
+def techniques_document(db_conn, source):
+
+    def techniques(rows):
+        for row in rows:
+            technique = {
+                'name': row['name'],
+                'rank': row['rank'],
+                'reference': reference(row),
+                'xp': row['xp']
+            }
+            if row['restriction'] is not None:
+                technique['restriction'] = row['restriction']
+            yield technique
+
+    def subcategories(rows):
+        for subcategory, subcategory_rows in itertools.groupby(rows, key = lambda row: row['subcategory']):
+            yield {
+                'name': subcategory,
+                'techniques': techniques(subcategory_rows)
+            }
+
+    rows = db_conn.execute(
+        '''SELECT * FROM (
+            SELECT *,
+                MIN(position) OVER (PARTITION BY category) AS category_position,
+                MIN(position) OVER (PARTITION BY category, subcategory) AS subcategory_position
+            FROM {}
+        ) ORDER BY category_position, subcategory_position, position'''.format(source('techniques'))
+    )
+    for category, category_rows in itertools.groupby(rows, key = lambda row: row['category']):
+        yield {
+            'name': category,
+            'subcategories': subcategories(category_rows)
+        }
+
+
+def advantages_document(db_conn, source):
+
+    def entries(rows):
+        for row in rows:
+            yield {
+                'name': row['name'],
+                'reference': reference(row),
+                'ring': row['ring'],
+                'types': row['types'].split(', ') if row['types'] else [],
+                'effects': row['effects']
+            }
+
+    for category, rows in grouped_rows(db_conn, source('advantages_disadvantages'), 'category'):
+        yield {
+            'name': category,
+            'entries': entries(rows)
+        }
+
+
+def titles_document(db_conn, source):
+    create_order(db_conn, 'titles', 'SELECT name FROM {} ORDER BY position'.format(source('titles')))
+    advancements = ChildRows(db_conn, source('title_advancements'), 'title', 'titles')
+    awards = ChildRows(db_conn, source('title_awards'), 'title', 'titles')
+
+    def advancement(row):
+        entry = {
+            'name': row['name'],
+            'type': row['type'],
+            'special_access': bool(row['special_access'])
+        }
+        if row['rank'] is not None:
+            entry['rank'] = row['rank']
+        return entry
+
+    def award(row):
+        entry = {'base_award': row['base_award']}
+        if row['constraint_type'] is not None:
+            entry['constraint'] = {'type': row['constraint_type']}
+            if row['constraint_value'] is not None:
+                entry['constraint']['value'] = row['constraint_value']
+            if row['constraint_min'] is not None:
+                entry['constraint']['range'] = [row['constraint_min'], row['constraint_max']]
+        entry['award_attribute'] = row['social_attribute']
+        return entry
+
+    for row in ordered_rows(db_conn, source('titles'), 'name', 'titles'):
+        yield {
+            'name': row['name'],
+            'reference': reference(row),
+            'xp_to_completion': row['xp_to_completion'],
+            'title_ability': row['title_ability_name'],
+            'advancements': [advancement(advancement_row) for advancement_row in advancements.take(row['name'])],
+            'social_awards': [award(award_row) for award_row in awards.take(row['name'])]
+        }
+
+
+def patterns_document(db_conn, source):
+    for row in db_conn.execute('SELECT * FROM {} ORDER BY position'.format(source('item_patterns'))):
+        yield {
+            'name': row['name'],
+            'reference': reference(row),
+            'xp_cost': row['xp_cost'],
+            'rarity_modifier': row['rarity_modifier']
+        }
+
+
+def clans_document(db_conn, source):
+    create_order(db_conn, 'clans', 'SELECT name FROM {} ORDER BY position'.format(source('clans')))
+    create_order(
+        db_conn,
+        'families',
+        '''SELECT f.name FROM {} f
+        JOIN temp.order_clans o ON f.clan = o.key
+        ORDER BY o.seq, f.position'''.format(source('families'))
+    )
+    families = ChildRows(db_conn, source('families'), 'clan', 'clans')
+    family_rings = ChildRows(db_conn, source('family_rings'), 'family', 'families')
+    family_skills = ChildRows(db_conn, source('family_skills'), 'family', 'families')
+
+    for row in ordered_rows(db_conn, source('clans'), 'name', 'clans'):
+        yield {
+            'name': row['name'],
+            'reference': reference(row),
+            'type': row['type'],
+            'ring_increase': row['ring'],
+            'skill_increase': row['skill'],
+            'status': row['status'],
+            'families': [
+                {
+                    'name': family_row['name'],
+                    'reference': reference(family_row),
+                    'ring_increase': [ring_row['ring'] for ring_row in family_rings.take(family_row['name'])],
+                    'skill_increase': [skill_row['skill'] for skill_row in family_skills.take(family_row['name'])],
+                    'glory': int(family_row['glory']),
+                    'wealth': int(family_row['wealth'])
+                }
+                for family_row in families.take(row['name'])
+            ]
+        }
+
+
+# heritage_rolls is derived from the roll ranges and is not exported
+def heritage_document(db_conn, source):
+    create_order(db_conn, 'heritage', 'SELECT ancestor FROM {} ORDER BY position'.format(source('samurai_heritage')))
+    effects = ChildRows(db_conn, source('heritage_effects'), 'ancestor', 'heritage')
+
+    def outcome(row):
+        entry = {}
+        if row['roll_min'] is not None:
+            entry['roll'] = {
+                'min': row['roll_min'],
+                'max': row['roll_max']
+            }
+        entry['outcome'] = row['outcome']
+        return entry
+
+    for row in ordered_rows(db_conn, source('samurai_heritage'), 'ancestor', 'heritage'):
+        yield {
+            'roll': {
+                'min': row['roll_min'],
+                'max': row['roll_max']
+            },
+            'result': row['ancestor'],
+            'modifiers': {
+                'glory': row['modifier_glory'],
+                'honor': row['modifier_honor'],
+                'status': row['modifier_status']
+            },
+            'other_effects': {
+                'type': row['effect_type'],
+                'instructions': row['effect_instructions'],
+                'outcomes': [outcome(effect_row) for effect_row in effects.take(row['ancestor'])]
+            },
+            'source': row['source']
+        }
+
+
+# Choice sets are stored one row per choice, numbered by set_id
+def choice_sets(rows, choice_column):
+    return [
+        {
+            'size': set_rows[0]['set_size'],
+            'set': [row[choice_column] for row in set_rows]
+        }
+        for set_rows in (
+            list(set_rows) for _, set_rows in itertools.groupby(rows, key = lambda row: row['set_id'])
+        )
+    ]
+
+
+def schools_document(db_conn, source):
+    create_order(db_conn, 'schools', 'SELECT name FROM {} ORDER BY position'.format(source('schools')))
+    children = {
+        table_stem: ChildRows(db_conn, source(table_stem), 'school', 'schools')
+        for table_stem in [
+            'school_rings',
+            'school_starting_skills',
+            'school_techniques_available',
+            'school_starting_techniques',
+            'school_starting_outfit',
+            'curriculum'
+        ]
+    }
+
+    for row in ordered_rows(db_conn, source('schools'), 'name', 'schools'):
+        rows = {table_stem: child_rows.take(row['name']) for table_stem, child_rows in children.items()}
+        school = {
+            'name': row['name'],
+            'reference': reference(row),
+            'role': row['role'].split(', ') if row['role'] else []
+        }
+        if row['clan'] is not None:
+            school['clan'] = row['clan']
+        school['ring_increase'] = [ring_row['ring'] for ring_row in rows['school_rings']]
+        school['starting_skills'] = {
+            'size': row['starting_skills_size'],
+            'set': [skill_row['skill'] for skill_row in rows['school_starting_skills']]
+        }
+        school['honor'] = row['honor']
+        if row['advantage_disadvantage'] is not None:
+            school['advantage_disadvantage'] = row['advantage_disadvantage']
+        school['techniques_available'] = [technique_row['technique'] for technique_row in rows['school_techniques_available']]
+        school['starting_techniques'] = choice_sets(rows['school_starting_techniques'], 'technique')
+        school['school_ability'] = row['school_ability_name']
+        school['starting_outfit'] = choice_sets(rows['school_starting_outfit'], 'equipment')
+        school['curriculum'] = [
+            {
+                'rank': advancement_row['rank'],
+                'advance': advancement_row['advance'],
+                'type': advancement_row['type'],
+                'special_access': bool(advancement_row['special_access'])
+            }
+            for advancement_row in rows['curriculum']
+        ]
+        school['mastery_ability'] = row['mastery_ability_name']
+        yield school
+
+
+# Document generator and main table of every exportable data source, keyed as
+# in json_to_db.SOURCES; question 8 keeps only part of its document in the db
+DOCUMENTS = {
+    'rings': (rings_document, 'rings'),
+    'skills': (skills_document, 'skills'),
+    'techniques': (techniques_document, 'techniques'),
+    'advantages': (advantages_document, 'advantages_disadvantages'),
+    'titles': (titles_document, 'titles'),
+    'patterns': (patterns_document, 'item_patterns'),
+    'qualities': (qualities_document, 'qualities'),
+    'personal_effects': (personal_effects_document, 'personal_effects'),
+    'armor': (armor_document, 'armor'),
+    'weapons': (weapons_document, 'weapons'),
+    'clans': (clans_document, 'clans'),
+    'heritage': (heritage_document, 'samurai_heritage'),
+    'schools': (schools_document, 'schools')
+}
+
+
+def main(db_file, output_dir, prefix = 'user', sources = None):
+
+    db_conn = sqlite3.connect(db_file)
+    db_conn.row_factory = sqlite3.Row
+
+    def source(table_stem):
+        return table_source(db_conn, prefix + '_' + table_stem)
+
+    os.makedirs(output_dir, exist_ok = True)
+    for source_name in sources if sources else DOCUMENTS:
+        document, main_table = DOCUMENTS[source_name]
+        filename = json_to_db.SOURCES[source_name][0]
+
+        # Only write documents that have entries
+        if db_conn.execute('SELECT 1 FROM {}_{} LIMIT 1'.format(prefix, main_table)).fetchone() is None:
+            print('No {}_{} rows, skipping {}'.format(prefix, main_table, filename))
+            continue
+
+        with open(os.path.join(output_dir, filename), 'w', encoding = 'utf8') as f:
+            write_json(f, document(db_conn, source))
+        print('Exported', os.path.join(output_dir, filename))
+
+    db_conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Export the base or user tables of a paperblossoms db back into json files laid out like data/json.')
+    parser.add_argument('db', help = 'Filepath for the paperblossoms db to export from')
+    parser.add_argument('output_dir', help = 'Folder to write the json files to, usable as a content pack')
+    parser.add_argument(
+        '--tables',
+        choices = ['user', 'base'],
+        default = 'user',
+        help = 'Export the user tables (homebrew, the default) or the base tables'
+    )
+    parser.add_argument('--source', nargs = '+', choices = list(DOCUMENTS), help = 'Only export these data sources')
+    args = parser.parse_args()
+
+    main(args.db, args.output_dir, args.tables, args.source)
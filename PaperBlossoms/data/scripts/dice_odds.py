@@ -0,0 +1,244 @@
+import argparse
+import collections
+import functools
+import json
+import math
+
+
+# Faces of the ring die (d6) and skill die (d12) as (name, weight,
+# successes, opportunities, strife, explosive); an explosive success also
+# counts as a success
+RING_FACES = [
+    ('blank', 1, 0, 0, 0, False),
+    ('opportunity and strife', 1, 0, 1, 1, False),
+    ('opportunity', 1, 0, 1, 0, False),
+    ('success and strife', 1, 1, 0, 1, False),
+    ('success', 1, 1, 0, 0, False),
+    ('explosive success and strife', 1, 1, 0, 1, True)
+]
+SKILL_FACES = [
+    ('blank', 2, 0, 0, 0, False),
+    ('opportunity', 3, 0, 1, 0, False),
+    ('success and strife', 2, 1, 0, 1, False),
+    ('success', 2, 1, 0, 0, False),
+    ('success and opportunity', 1, 1, 1, 0, False),
+    ('explosive success and strife', 1, 1, 0, 1, True),
+    ('explosive success', 1, 1, 0, 0, True)
+]
+
+# Explosions are followed until the chance of a longer chain is below this
+EXPLOSION_TOLERANCE = 1e-12
+
+# Outcomes less likely than this are dropped from convolved distributions,
+# which long explosion chains would otherwise fill with vanishing tails
+NEGLIGIBLE_PROBABILITY = 1e-15
+
+
+# Whether the keep policy keeps a face: any success, and opportunities that
+# come without strife. Blanks and strife-bearing opportunities are only kept
+# when nothing else is, as at least one die must be
+def worth_keeping(face):
+    _, _, successes, opportunities, strife, _ = face
+    return successes > 0 or (opportunities > 0 and strife == 0)
+
+
+# Order in which the keep policy takes dice, best first: explosions, which
+# may add successes, then successes, opportunities and the least strife, and
+# skill dice over ring dice, as their explosions carry less strife
+def keep_priority(die_face):
+    is_skill, (_, _, successes, opportunities, strife, explosive) = die_face
+    return (explosive, successes, opportunities, -strife, is_skill)
+
+
+def add(outcome, other):
+    return (outcome[0] + other[0], outcome[1] + other[1], outcome[2] + other[2])
+
+
+# Distribution of the sum of two independent (successes, opportunities,
+# strife) outcomes, as dicts of outcome to probability
+def convolve(distribution, other):
+    result = collections.defaultdict(float)
+    for (successes, opportunities, strife), probability in distribution.items():
+        for (other_successes, other_opportunities, other_strife), other_probability in other.items():
+            result[(successes + other_successes, opportunities + other_opportunities, strife + other_strife)] += probability * other_probability
+
+    return {outcome: probability for outcome, probability in result.items() if probability >= NEGLIGIBLE_PROBABILITY}
+
+
+# Distribution of what the extra die rolled for a kept explosion adds: its
+# own face if worth keeping, plus its own explosion, and so on, computed by
+# iterating to a fixed point until unfollowed chains are negligible
+@functools.lru_cache(maxsize = None)
+def explosion_distribution(is_skill):
+    faces = SKILL_FACES if is_skill else RING_FACES
+    total = sum(face[1] for face in faces)
+    explosive = sum(face[1] for face in faces if face[5] and worth_keeping(face)) / total
+
+    distribution = {(0, 0, 0): 1.0}
+    unfollowed = 1.0
+    while unfollowed > EXPLOSION_TOLERANCE:
+        result = collections.defaultdict(float)
+        for face in faces:
+            probability = face[1] / total
+            if not worth_keeping(face):
+                result[(0, 0, 0)] += probability
+            elif face[5]:
+                for outcome, chain_probability in distribution.items():
+                    result[add(face[2:5], outcome)] += probability * chain_probability
+            else:
+                result[face[2:5]] += probability
+        distribution = dict(result)
+        unfollowed *= explosive
+
+    return distribution
+
+
+# Distribution added by ring_explosions ring and skill_explosions skill
+# explosion dice
+@functools.lru_cache(maxsize = None)
+def explosions_distribution(ring_explosions, skill_explosions):
+    if ring_explosions > 0:
+        return convolve(explosion_distribution(False), explosions_distribution(ring_explosions - 1, skill_explosions))
+    if skill_explosions > 0:
+        return convolve(explosion_distribution(True), explosions_distribution(0, skill_explosions - 1))
+    return {(0, 0, 0): 1.0}
+
+
+# Faces of both dice in the order the keep policy takes them: the faces worth
+# keeping by priority, then the others by least strife, of which one die is
+# kept only when no other is
+def keep_order():
+    die_faces = [(False, face) for face in RING_FACES] + [(True, face) for face in SKILL_FACES]
+    return (
+        sorted([die_face for die_face in die_faces if worth_keeping(die_face[1])], key = keep_priority, reverse = True) +
+        sorted([die_face for die_face in die_faces if not worth_keeping(die_face[1])], key = lambda die_face: (die_face[1][4], -die_face[1][3]))
+    )
+
+
+# Exact distribution of (successes, opportunities, strife) of a check
+# rolling ring ring dice and skill skill dice and keeping up to ring of them
+# by the keep policy. Faces are visited in keep order, drawing how many of
+# the dice not yet accounted for show each one, binomially given that they
+# show none of the faces visited before, and keeping as many as slots allow.
+# The state counts the explosions kept, whose distribution is convolved once
+# with the outcomes of all the states sharing the same explosions
+@functools.lru_cache(maxsize = None)
+def check_distribution(ring, skill):
+    remaining_weight = {
+        False: sum(face[1] for face in RING_FACES),
+        True: sum(face[1] for face in SKILL_FACES)
+    }
+
+    # (ring dice left, skill dice left, keep slots left, outcome, ring
+    # explosions, skill explosions) to probability
+    states = {(ring, skill, ring, (0, 0, 0), 0, 0): 1.0}
+    for is_skill, face in keep_order():
+        share = face[1] / remaining_weight[is_skill]
+        remaining_weight[is_skill] -= face[1]
+        next_states = collections.defaultdict(float)
+        for (ring_left, skill_left, slots, outcome, ring_explosions, skill_explosions), probability in states.items():
+            dice = skill_left if is_skill else ring_left
+            for count in range(dice + 1):
+                count_probability = math.comb(dice, count) * share ** count * (1 - share) ** (dice - count)
+                if count_probability == 0:
+                    continue
+                if worth_keeping(face):
+                    kept = min(count, slots)
+                else:
+                    kept = min(count, 1) if slots == ring else 0
+                next_states[(
+                    ring_left - (0 if is_skill else count),
+                    skill_left - (count if is_skill else 0),
+                    slots - kept,
+                    add(outcome, (kept * face[2], kept * face[3], kept * face[4])),
+                    ring_explosions + (kept if face[5] and not is_skill else 0),
+                    skill_explosions + (kept if face[5] and is_skill else 0)
+                )] += probability * count_probability
+        states = next_states
+
+    kept_outcomes = collections.defaultdict(lambda: collections.defaultdict(float))
+    for (_, _, _, outcome, ring_explosions, skill_explosions), probability in states.items():
+        kept_outcomes[(ring_explosions, skill_explosions)][outcome] += probability
+
+    distribution = collections.defaultdict(float)
+    for explosions, outcomes in kept_outcomes.items():
+        for outcome, probability in convolve(outcomes, explosions_distribution(*explosions)).items():
+            distribution[outcome] += probability
+
+    return dict(distribution)
+
+
+# Odds of a check against tn: the chance of success, the expected bonus
+# successes over tn when successful, and the expected opportunities and
+# strife kept
+@functools.lru_cache(maxsize = None)
+def check_odds(ring, skill, tn):
+    distribution = check_distribution(ring, skill)
+    success = sum(probability for (successes, _, _), probability in distribution.items() if successes >= tn)
+    bonus = sum(probability * (successes - tn) for (successes, _, _), probability in distribution.items() if successes >= tn)
+    return {
+        'ring': ring,
+        'skill': skill,
+        'tn': tn,
+        'success': success,
+        'bonus_successes': bonus / success if success > 0 else 0.0,
+        'opportunities': sum(probability * opportunities for (_, opportunities, _), probability in distribution.items()),
+        'strife': sum(probability * strife for (_, _, strife), probability in distribution.items())
+    }
+
+
+# Odds of many checks at once, given as (ring, skill, tn) tuples; each
+# distinct ring and skill is computed once however many checks share it
+def batch_odds(checks):
+    return [check_odds(ring, skill, tn) for ring, skill, tn in checks]
+
+
+# Odds of every character of a party making the same check, where each
+# character is a dict with a name and rings and skills dicts of values;
+# skills a character lacks are rolled unskilled
+def party_odds(party, ring_name, skill_name, tn):
+    odds = batch_odds(
+        (character['rings'][ring_name], character['skills'].get(skill_name, 0), tn)
+        for character in party
+    )
+    return [dict(character_odds, name = character['name']) for character, character_odds in zip(party, odds)]
+
+
+def print_grid(tn, rings, skills):
+    print('Chance of success at TN {}'.format(tn))
+    print('{:>6}'.format('ring') + ''.join('{:>8}'.format('skill ' + str(skill)) for skill in skills))
+    for ring in rings:
+        print('{:>6}'.format(ring) + ''.join(
+            '{:>8.1%}'.format(odds['success'])
+            for odds in batch_odds((ring, skill, tn) for skill in skills)
+        ))
+
+
+def print_party(party, ring_name, skill_name, tn):
+    print('{} ({}) at TN {}'.format(skill_name, ring_name, tn))
+    print('{:25}{:>10}{:>8}{:>8}{:>8}'.format('character', 'success', 'bonus', 'opp.', 'strife'))
+    for odds in party_odds(party, ring_name, skill_name, tn):
+        print('{:25}{:>10.1%}{:>8.2f}{:>8.2f}{:>8.2f}'.format(
+            odds['name'],
+            odds['success'],
+            odds['bonus_successes'],
+            odds['opportunities'],
+            odds['strife']
+        ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Exact odds of roll and keep checks, keeping successes first, for a grid of ring and skill values or a whole party.')
+    parser.add_argument('--tn', type = int, default = 2, help = 'Target number of the check (defaults to 2)')
+    parser.add_argument('--rings', type = int, nargs = '+', default = [1, 2, 3, 4, 5], help = 'Ring values of the grid (defaults to 1 to 5)')
+    parser.add_argument('--skills', type = int, nargs = '+', default = [0, 1, 2, 3, 4, 5], help = 'Skill ranks of the grid (defaults to 0 to 5)')
+    parser.add_argument('--party', help = 'Json file of characters, each with a name and rings and skills objects, to give the odds of instead of the grid')
+    parser.add_argument('--ring', default = 'Air', help = 'Ring rolled by the party (defaults to Air)')
+    parser.add_argument('--skill', default = 'Courtesy', help = 'Skill rolled by the party (defaults to Courtesy)')
+    args = parser.parse_args()
+
+    if args.party is not None:
+        with open(args.party, encoding = 'utf8') as f:
+            print_party(json.load(f), args.ring, args.skill, args.tn)
+    else:
+        print_grid(args.tn, args.rings, args.skills)
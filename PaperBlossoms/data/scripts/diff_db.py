@@ -0,0 +1,231 @@
+import argparse
+import hashlib
+import json
+import pathlib
+import sqlite3
+import sys
+
+
+# sqlite orders NULL before numbers, numbers before text and text before
+# blobs; text is compared as UTF-8 bytes, which orders like Python strings
+SQLITE_TYPE_ORDER = {type(None): 0, int: 1, float: 1, str: 2, bytes: 3}
+
+
+def connect_read_only(db_file):
+    return sqlite3.connect(pathlib.Path(db_file).resolve().as_uri() + '?mode=ro', uri = True)
+
+
+# Tables to compare, and the base_ and user_ views, which hold the text of
+# the data in dbs built with interned strings or for a locale
+def table_names(db_conn, all_tables = False):
+    return [
+        name for name, object_type in db_conn.execute(
+            "SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\' ORDER BY name"
+        )
+        if name.startswith('base_') or name.startswith('user_') or (all_tables and object_type == 'table')
+    ]
+
+
+# The columns of table in order, and the columns identifying its rows: the
+# primary key, or every column for tables without one. base_ and user_ views
+# take the primary key of the interned_ or translated_ table they read
+def table_columns(db_conn, table):
+    info = list(db_conn.execute('PRAGMA table_info({})'.format(table)))
+    columns = [column[1] for column in info]
+    key_columns = [column[1] for column in sorted(info, key = lambda column: column[5]) if column[5] > 0]
+    for storage in ['interned_' + table, 'translated_' + table]:
+        if key_columns:
+            break
+        if db_conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (storage,)).fetchone():
+            storage_info = db_conn.execute('PRAGMA table_info({})'.format(storage))
+            key_columns = [column[1] for column in sorted(storage_info, key = lambda column: column[5]) if column[5] > 0]
+    return columns, key_columns or columns
+
+
+def quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+# Rows of the given columns of table, ordered by the key columns then the
+# rest, so the same contents always come in the same order
+def ordered_rows(db_conn, table, columns, key_columns):
+    order = key_columns + [column for column in columns if column not in key_columns]
+    return db_conn.execute('SELECT {columns} FROM {table} ORDER BY {order}'.format(
+        columns = ','.join(quote(column) for column in columns),
+        table = quote(table),
+        order = ','.join(quote(column) for column in order)
+    ))
+
+
+# sha256 over the ordered rows, which repr keeps 1, 1.0 and '1' apart in
+def table_checksum(db_conn, table, columns, key_columns):
+    checksum = hashlib.sha256()
+    for row in ordered_rows(db_conn, table, columns, key_columns):
+        checksum.update(repr(row).encode('utf8'))
+        checksum.update(b'\n')
+
+    return checksum.hexdigest()
+
+
+def sort_key(values):
+    return tuple((SQLITE_TYPE_ORDER[type(value)], value) for value in values)
+
+
+# Consecutive rows sharing a key, as (sort key, key values, rows) tuples
+def row_groups(rows, key_indexes):
+    group_key = None
+    group = []
+    for row in rows:
+        key = tuple(row[index] for index in key_indexes)
+        if group and key != group_key:
+            yield sort_key(group_key), group_key, group
+            group = []
+        group_key = key
+        group.append(row)
+
+    if group:
+        yield sort_key(group_key), group_key, group
+
+
+# Merge the ordered rows of table in the two dbs by key, returning the keys
+# of the rows only in db_a (removed), only in db_b (added) and of those
+# differing between them (changed), by repr as in the checksum. Tables
+# without a primary key are keyed on the whole row, so a changed row shows
+# as removed and added
+def diff_rows(conn_a, conn_b, table, columns, key_columns):
+    key_indexes = [columns.index(column) for column in key_columns]
+    groups_a = row_groups(ordered_rows(conn_a, table, columns, key_columns), key_indexes)
+    groups_b = row_groups(ordered_rows(conn_b, table, columns, key_columns), key_indexes)
+    diff = {'removed': [], 'added': [], 'changed': []}
+    group_a = next(groups_a, None)
+    group_b = next(groups_b, None)
+    while group_a is not None or group_b is not None:
+        if group_b is None or (group_a is not None and group_a[0] < group_b[0]):
+            diff['removed'].extend(group_a[1] for _ in group_a[2])
+            group_a = next(groups_a, None)
+        elif group_a is None or group_b[0] < group_a[0]:
+            diff['added'].extend(group_b[1] for _ in group_b[2])
+            group_b = next(groups_b, None)
+        else:
+            rows_a, rows_b = group_a[2], group_b[2]
+            if len(rows_a) == len(rows_b) and repr(rows_a) != repr(rows_b):
+                diff['changed'].append(group_a[1])
+            elif len(rows_a) > len(rows_b):
+                diff['removed'].extend(group_a[1] for _ in range(len(rows_a) - len(rows_b)))
+            elif len(rows_b) > len(rows_a):
+                diff['added'].extend(group_b[1] for _ in range(len(rows_b) - len(rows_a)))
+            group_a = next(groups_a, None)
+            group_b = next(groups_b, None)
+
+    return diff
+
+
+# Views, triggers and indexes whose definitions were added, removed or changed
+def diff_schema(conn_a, conn_b):
+    query = "SELECT type, name, sql FROM sqlite_master WHERE type IN ('view', 'trigger', 'index') AND sql IS NOT NULL"
+    schema_a = {(object_type, name): sql for object_type, name, sql in conn_a.execute(query)}
+    schema_b = {(object_type, name): sql for object_type, name, sql in conn_b.execute(query)}
+    return {
+        'removed': sorted(schema_a.keys() - schema_b.keys()),
+        'added': sorted(schema_b.keys() - schema_a.keys()),
+        'changed': sorted(key for key in schema_a.keys() & schema_b.keys() if schema_a[key] != schema_b[key])
+    }
+
+
+# Compare the tables of db_a and db_b, from db_a to db_b. Each table's
+# checksum is computed in one streaming pass over each db, and only tables
+# whose checksums differ are merged row by row
+def diff_dbs(db_a, db_b, all_tables = False):
+    conn_a = connect_read_only(db_a)
+    conn_b = connect_read_only(db_b)
+    tables_a = table_names(conn_a, all_tables)
+    tables_b = table_names(conn_b, all_tables)
+    report = {
+        'tables': {
+            'removed': sorted(set(tables_a) - set(tables_b)),
+            'added': sorted(set(tables_b) - set(tables_a)),
+            'identical': [],
+            'changed': {}
+        },
+        'schema': diff_schema(conn_a, conn_b)
+    }
+
+    for table in sorted(set(tables_a) & set(tables_b)):
+        columns_a, keys_a = table_columns(conn_a, table)
+        columns_b, keys_b = table_columns(conn_b, table)
+        if columns_a != columns_b or keys_a != keys_b:
+            report['tables']['changed'][table] = {
+                'columns': {
+                    'removed': [column for column in columns_a if column not in columns_b],
+                    'added': [column for column in columns_b if column not in columns_a]
+                },
+                'primary_key': {'before': keys_a, 'after': keys_b}
+            }
+            continue
+        if table_checksum(conn_a, table, columns_a, keys_a) == table_checksum(conn_b, table, columns_b, keys_b):
+            report['tables']['identical'].append(table)
+            continue
+        report['tables']['changed'][table] = diff_rows(conn_a, conn_b, table, columns_a, keys_a)
+        report['tables']['changed'][table]['key'] = keys_a
+
+    conn_a.close()
+    conn_b.close()
+    return report
+
+
+def print_report(report, limit):
+    tables = report['tables']
+    print('{} identical tables'.format(len(tables['identical'])))
+    for change in ['removed', 'added']:
+        for table in tables[change]:
+            print('Table {} {}'.format(table, change))
+    for table, diff in tables['changed'].items():
+        if 'columns' in diff:
+            print('Table {} changed columns: removed {}, added {}, primary key {} -> {}'.format(
+                table,
+                diff['columns']['removed'],
+                diff['columns']['added'],
+                diff['primary_key']['before'],
+                diff['primary_key']['after']
+            ))
+            continue
+        print('Table {}: {} added, {} removed, {} changed rows'.format(
+            table,
+            len(diff['added']),
+            len(diff['removed']),
+            len(diff['changed'])
+        ))
+        for change, sign in [('added', '+'), ('removed', '-'), ('changed', '~')]:
+            for key in diff[change][:limit]:
+                print('  {} {}'.format(sign, dict(zip(diff['key'], key))))
+            if len(diff[change]) > limit:
+                print('  {} ... {} more'.format(sign, len(diff[change]) - limit))
+    for change in ['removed', 'added', 'changed']:
+        for object_type, name in report['schema'][change]:
+            print('{} {} {}'.format(object_type.capitalize(), name, change))
+
+
+def main(db_a, db_b, all_tables = False, limit = 10, output = None):
+    report = diff_dbs(db_a, db_b, all_tables)
+    print_report(report, limit)
+    if output is not None:
+        with open(output, 'w', encoding = 'utf8') as f:
+            json.dump(report, f, indent = 4, ensure_ascii = False, default = repr)
+
+    return not (
+        report['tables']['removed'] or report['tables']['added'] or report['tables']['changed']
+        or any(report['schema'].values())
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Report the rows added, removed and changed in each base_ and user_ table, and the changed view, trigger and index definitions, between two paperblossoms db builds.')
+    parser.add_argument('db_a', help = 'Filepath of the older db')
+    parser.add_argument('db_b', help = 'Filepath of the newer db')
+    parser.add_argument('--all-tables', action = 'store_true', help = 'Compare every table, not only the base_ and user_ ones')
+    parser.add_argument('--limit', type = int, default = 10, help = 'Number of row keys listed per table and kind of change (defaults to 10)')
+    parser.add_argument('--output', help = 'Filepath to write the full report to as json')
+    args = parser.parse_args()
+
+    if not main(args.db_a, args.db_b, args.all_tables, args.limit, args.output):
+        sys.exit(1)
@@ -1,7 +1,13 @@
 import argparse
+import datetime
+import glob
 import os
+import pathlib
+import re
 import sqlite3
 
+import check_db
+
 
 # Connect to original and custom dbs
 def connect_db(action, orig_file, custom_file):
@@ -59,7 +65,66 @@ def import_user_tables(conn, cursor):
     conn.commit()
 
 
-def main(action, orig_file, custom_file):
+# Copy the whole db to a timestamped snapshot in backup_dir while other
+# connections keep using it: the backup API copies pages_per_step pages at a
+# time and, between steps, lets writers in, restarting if they change the
+# db. The copy is written to a temporary file and renamed into place only
+# once complete. Returns the snapshot filepath
+def backup_db(orig_file, backup_dir, pages_per_step = 256):
+    os.makedirs(backup_dir, exist_ok = True)
+    stem = os.path.splitext(os.path.basename(orig_file))[0]
+    snapshot = os.path.join(
+        backup_dir,
+        '{}-{}.db'.format(stem, datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f'))
+    )
+    temp_file = snapshot + '.tmp'
+
+    def progress(status, remaining, total):
+        print('Copied {} of {} pages'.format(total - remaining, total))
+
+    conn = sqlite3.connect(pathlib.Path(orig_file).resolve().as_uri() + '?mode=ro', uri = True)
+    target = sqlite3.connect(temp_file)
+    try:
+        conn.backup(target, pages = pages_per_step, progress = progress, sleep = 0.005)
+        target.close()
+        os.replace(temp_file, snapshot)
+    except:
+        target.close()
+        os.remove(temp_file)
+        raise
+    finally:
+        conn.close()
+
+    return snapshot
+
+
+# Remove all but the newest keep snapshots of orig_file in backup_dir. Only
+# files named as backup_db names them count, not the snapshots of other dbs
+# whose names start with the same stem
+def prune_backups(orig_file, backup_dir, keep):
+    if keep < 1:
+        raise ValueError('At least the newest backup snapshot must be kept')
+    stem = os.path.splitext(os.path.basename(orig_file))[0]
+    pattern = re.compile(re.escape(stem) + r'-\d{8}-\d{6}-\d{6}\.db')
+    snapshots = sorted(
+        snapshot for snapshot in glob.glob(os.path.join(glob.escape(backup_dir), glob.escape(stem) + '-*.db'))
+        if pattern.fullmatch(os.path.basename(snapshot))
+    )
+    for snapshot in snapshots[:len(snapshots) - keep]:
+        os.remove(snapshot)
+        print('Deleted old backup', snapshot)
+
+
+def main(action, orig_file, custom_file, pages_per_step = 256, keep = 10, repair = False):
+
+    # Back up the whole db into the custom_file folder
+    if action == 'backup':
+        if keep < 1:
+            raise ValueError('At least the newest backup snapshot must be kept')
+        snapshot = backup_db(orig_file, custom_file, pages_per_step)
+        print('Backed up', orig_file, 'to', snapshot)
+        prune_backups(orig_file, custom_file, keep)
+        return
 
     # Open database connections
     conn = connect_db(action, orig_file, custom_file)
@@ -72,14 +137,28 @@ def main(action, orig_file, custom_file):
         export_user_tables(conn, cursor)
     else:
         import_user_tables(conn, cursor)
+
+        # Check the imported rows refer to entries that exist
+        conn.execute('DETACH DATABASE custom')
+        if check_db.check(conn, repair = repair, prefixes = ('user',)):
+            print('Imported user tables are consistent')
     
     conn.close()
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description = 'Utility to export and import the custom user tables in the paperblossoms db via another sqlite file.')
-    parser.add_argument('action', choices = ['export', 'import'], help = 'Which action you want to take, either "export" from or "import" into the paperblossoms db')
+    parser.add_argument(
+        'action',
+        choices = ['export', 'import', 'backup'],
+        help = 'Which action you want to take, either "export" from or "import" into the paperblossoms db, or "backup" the whole db to a snapshot'
+    )
     parser.add_argument('orig_db', help = 'Filepath for original db, paperblossoms.db')
-    parser.add_argument('custom_db', help = 'Filepath for exported db with custom user tables')
+    parser.add_argument('custom_db', help = 'Filepath for exported db with custom user tables, or the folder for snapshots when backing up')
+    parser.add_argument('--pages', type = int, default = 256, help = 'Pages copied per backup step, between which the db stays usable (defaults to 256)')
+    parser.add_argument('--keep', type = int, default = 10, help = 'Number of newest backup snapshots to keep (defaults to 10)')
+    parser.add_argument('--repair', action = 'store_true', help = 'After importing, delete user link rows whose references dangle')
     args = parser.parse_args()
+    if args.keep < 1:
+        parser.error('--keep must be at least 1, to keep the snapshot just made')
 
-    main(args.action, args.orig_db, args.custom_db)
+    main(args.action, args.orig_db, args.custom_db, args.pages, args.keep, args.repair)
@@ -0,0 +1,97 @@
+import argparse
+import collections
+import pathlib
+import random
+import sqlite3
+import time
+
+
+# Load the dense heritage roll tables from the heritage_rolls view, keyed by
+# roll table (heritage source for ancestor rolls, ancestor for their follow-up
+# rolls), as lists indexed by roll - 1
+def load_roll_tables(db_conn):
+    tables = {}
+    query = db_conn.execute(
+        'SELECT roll_table, die_size, roll, outcome FROM heritage_rolls ORDER BY roll_table, roll'
+    )
+    for roll_table, die_size, roll, outcome in query:
+        tables.setdefault(roll_table, [None] * die_size)[roll - 1] = outcome
+
+    return tables
+
+
+# Roll count times on a single dense roll table; every face is equally likely,
+# so this is a uniform pick from the list
+def roll_table(table, count = 1, rng = random):
+    return rng.choices(table, k = count)
+
+
+# Roll count ancestors on the source table and the follow-up roll for each
+# ancestor that has one; returns a list of (ancestor, outcome) pairs where
+# outcome is None if the ancestor has no rolled effect
+def roll_heritage(tables, source, count = 1, rng = random):
+    ancestors = roll_table(tables[source], count, rng)
+
+    # Batch the follow-up rolls per ancestor table
+    followups = {
+        ancestor: iter(roll_table(tables[ancestor], ancestor_count, rng))
+        for ancestor, ancestor_count in collections.Counter(ancestors).items()
+        if ancestor in tables
+    }
+
+    return [
+        (ancestor, next(followups[ancestor]) if ancestor in followups else None)
+        for ancestor in ancestors
+    ]
+
+
+# Count the (ancestor, outcome) pairs of count simulated heritage rolls without
+# materialising the individual results
+def heritage_distribution(tables, source, count, rng = random):
+    distribution = collections.Counter()
+    ancestors = collections.Counter(roll_table(tables[source], count, rng))
+    for ancestor, ancestor_count in ancestors.items():
+        if ancestor in tables:
+            for outcome, outcome_count in collections.Counter(roll_table(tables[ancestor], ancestor_count, rng)).items():
+                distribution[(ancestor, outcome)] += outcome_count
+        else:
+            distribution[(ancestor, None)] += ancestor_count
+
+    return distribution
+
+
+def main(db_file, source, count, seed):
+    db_conn = sqlite3.connect(db_file)
+    tables = load_roll_tables(db_conn)
+    db_conn.close()
+
+    if source not in tables:
+        raise SystemExit('Unknown heritage source ' + source)
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    distribution = heritage_distribution(tables, source, count, rng)
+    elapsed = time.perf_counter() - start
+
+    for (ancestor, outcome), outcome_count in sorted(distribution.items(), key = lambda item: -item[1]):
+        print('{:8.4%}  {}{}'.format(
+            outcome_count / count,
+            ancestor,
+            ' -> ' + outcome if outcome is not None else ''
+        ))
+    print('Simulated {:,} rolls in {:.3f}s ({:,.0f} rolls/s)'.format(count, elapsed, count / elapsed))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Simulate samurai heritage rolls from the dense roll tables in the paperblossoms db.')
+    parser.add_argument(
+        '--db',
+        default = str(pathlib.Path(__file__).parents[1].joinpath('paperblossoms.db')),
+        help = 'Filepath for the paperblossoms db (defaults to the one in the data folder)'
+    )
+    parser.add_argument('--source', default = 'Core', help = 'Heritage table to roll on, e.g. Core, SL or CoS')
+    parser.add_argument('--count', type = int, default = 1000000, help = 'Number of heritage rolls to simulate')
+    parser.add_argument('--seed', type = int, help = 'Seed for the random number generator')
+    args = parser.parse_args()
+
+    main(args.db, args.source, args.count, args.seed)
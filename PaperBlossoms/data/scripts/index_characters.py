@@ -0,0 +1,283 @@
+import argparse
+import concurrent.futures
+import os
+import pathlib
+import sqlite3
+import time
+
+import pbc_reader
+
+
+def create_catalog(db_conn):
+    db_conn.executescript(
+        '''CREATE TABLE IF NOT EXISTS characters (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER,
+            size INTEGER,
+            version INTEGER,
+            locale TEXT,
+            name TEXT,
+            family TEXT,
+            clan TEXT,
+            school TEXT,
+            rank INTEGER,
+            total_xp INTEGER,
+            spent_xp INTEGER,
+            honor INTEGER,
+            glory INTEGER,
+            status INTEGER,
+            koku INTEGER,
+            bu INTEGER,
+            zeni INTEGER,
+            heritage TEXT,
+            ninjo TEXT,
+            giri TEXT,
+            portrait_size INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS characters_clan ON characters (clan);
+        CREATE INDEX IF NOT EXISTS characters_school ON characters (school, rank);
+
+        CREATE TABLE IF NOT EXISTS character_titles (
+            path TEXT,
+            title TEXT
+        );
+        CREATE INDEX IF NOT EXISTS character_titles_path ON character_titles (path);
+        CREATE INDEX IF NOT EXISTS character_titles_title ON character_titles (title);
+
+        CREATE TABLE IF NOT EXISTS character_rings (
+            path TEXT,
+            ring TEXT,
+            base INTEGER,
+            ranks INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS character_rings_path ON character_rings (path);
+
+        CREATE TABLE IF NOT EXISTS character_skills (
+            path TEXT,
+            skill TEXT,
+            base INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS character_skills_path ON character_skills (path);
+
+        CREATE TABLE IF NOT EXISTS character_techniques (
+            path TEXT,
+            technique TEXT
+        );
+        CREATE INDEX IF NOT EXISTS character_techniques_path ON character_techniques (path);
+        CREATE INDEX IF NOT EXISTS character_techniques_technique ON character_techniques (technique);
+
+        CREATE TABLE IF NOT EXISTS character_advantages (
+            path TEXT,
+            name TEXT
+        );
+        CREATE INDEX IF NOT EXISTS character_advantages_path ON character_advantages (path);
+
+        CREATE TABLE IF NOT EXISTS character_advances (
+            path TEXT,
+            seq INTEGER,
+            type TEXT,
+            advance TEXT,
+            track TEXT,
+            cost INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS character_advances_path ON character_advances (path);
+
+        CREATE TABLE IF NOT EXISTS character_equipment (
+            path TEXT,
+            type TEXT,
+            name TEXT
+        );
+        CREATE INDEX IF NOT EXISTS character_equipment_path ON character_equipment (path);'''
+    )
+
+
+# Tables holding rows of a character besides the characters table
+CHILD_TABLES = [
+    'character_titles',
+    'character_rings',
+    'character_skills',
+    'character_techniques',
+    'character_advantages',
+    'character_advances',
+    'character_equipment'
+]
+
+
+# Advances are saved as 'type|advance|track|cost' strings
+def split_advance(advance):
+    cells = advance.split('|')
+    cells += [None] * (4 - len(cells))
+    cost = int(cells[3]) if cells[3] and cells[3].lstrip('-').isdigit() else None
+    return cells[0], cells[1], cells[2], cost
+
+
+# Parse one character file in a worker process into its catalog rows, keyed
+# by table; only plain tuples cross back to the indexing process
+def character_rows(path, mtime_ns, size):
+    try:
+        character = pbc_reader.read_character_file(path)
+    except (OSError, ValueError) as err:
+        return path, None, str(err)
+
+    advances = [split_advance(advance) for advance in character['advanceStack']]
+    portrait = character['portrait']
+    rows = {
+        'characters': [(
+            path,
+            mtime_ns,
+            size,
+            character['version'],
+            character['locale'],
+            character['name'],
+            character['family'],
+            character['clan'],
+            character['school'],
+            character['rank'],
+            character['totalXP'],
+            sum(cost for _, _, _, cost in advances if cost is not None),
+            character['honor'],
+            character['glory'],
+            character['status'],
+            character['koku'],
+            character['bu'],
+            character['zeni'],
+            character['heritage'],
+            character['ninjo'],
+            character['giri'],
+            None if portrait is None else len(portrait)
+        )],
+        'character_titles': [(path, title) for title in character['titles']],
+        'character_rings': [
+            (path, ring, base, character['ringranks'].get(ring, 0))
+            for ring, base in character['baserings'].items()
+        ],
+        'character_skills': [(path, skill, base) for skill, base in character['baseskills'].items()],
+        'character_techniques': [(path, technique) for technique in character['techniques']],
+        'character_advantages': [(path, name) for name in character['adv_disadv']],
+        'character_advances': [(path, seq) + advance for seq, advance in enumerate(advances)],
+        'character_equipment': [
+            (path, item[0] if item else None, item[1] if len(item) > 1 else None)
+            for item in character['equipment']
+        ]
+    }
+
+    return path, rows, None
+
+
+# The .pbc files below directory with their modification time and size
+def scan_directory(directory):
+    files = {}
+    for path in sorted(pathlib.Path(directory).rglob('*.pbc')):
+        stat = path.stat()
+        files[str(path.resolve())] = (stat.st_mtime_ns, stat.st_size)
+
+    return files
+
+
+def delete_character(db_conn, path):
+    for table in ['characters'] + CHILD_TABLES:
+        db_conn.execute('DELETE FROM {} WHERE path = ?'.format(table), (path,))
+
+
+# Resolve the characters against the game data, matching the translated
+# names the app saves characters with; names not found in the game db
+# (homebrew since deleted, another locale) are kept with NULL details
+def build_overview(db_conn, game_db):
+    db_conn.execute('ATTACH DATABASE ? AS game', (game_db,))
+    db_conn.execute('DROP TABLE IF EXISTS character_overview')
+    db_conn.execute(
+        '''CREATE TABLE character_overview AS
+        SELECT
+            c.path,
+            c.name,
+            c.family,
+            c.clan,
+            cl.type AS clan_type,
+            c.school,
+            s.role AS school_role,
+            s.clan AS school_clan,
+            c.rank,
+            c.total_xp,
+            c.spent_xp,
+            (SELECT group_concat(ct.title, ', ') FROM character_titles ct WHERE ct.path = c.path) AS titles,
+            (
+                SELECT sum(t.xp_to_completion)
+                FROM character_titles ct
+                JOIN game.titles t ON t.name_tr = ct.title
+                WHERE ct.path = c.path
+            ) AS titles_xp_to_completion
+        FROM characters c
+        LEFT JOIN game.clans cl ON cl.name_tr = c.clan
+        LEFT JOIN game.schools s ON s.name_tr = c.school'''
+    )
+    db_conn.execute('CREATE INDEX character_overview_school ON character_overview (school, rank)')
+    db_conn.commit()
+    db_conn.execute('DETACH DATABASE game')
+
+
+def main(directory, catalog_file, game_db, jobs):
+
+    db_conn = sqlite3.connect(catalog_file)
+    create_catalog(db_conn)
+
+    # Only parse files that are new or changed since the last run
+    start = time.perf_counter()
+    files = scan_directory(directory)
+    indexed = {
+        path: (mtime_ns, size)
+        for path, mtime_ns, size in db_conn.execute('SELECT path, mtime_ns, size FROM characters')
+    }
+    changed = [path for path, stamp in files.items() if indexed.get(path) != stamp]
+    removed = [path for path in indexed if path not in files]
+
+    failed = 0
+    db_conn.execute('BEGIN')
+    for path in removed:
+        delete_character(db_conn, path)
+    with concurrent.futures.ProcessPoolExecutor(max_workers = jobs) as executor:
+        results = executor.map(
+            character_rows,
+            changed,
+            [files[path][0] for path in changed],
+            [files[path][1] for path in changed],
+            chunksize = 16
+        )
+        for path, rows, error in results:
+            delete_character(db_conn, path)
+            if rows is None:
+                print('Could not read {}: {}'.format(path, error))
+                failed += 1
+                continue
+            for table, table_rows in rows.items():
+                if table_rows:
+                    db_conn.executemany(
+                        'INSERT INTO {} VALUES ({})'.format(table, ','.join('?' * len(table_rows[0]))),
+                        table_rows
+                    )
+    db_conn.commit()
+
+    build_overview(db_conn, game_db)
+    db_conn.close()
+
+    print('Indexed {} of {} character files ({} removed, {} unreadable) in {:.2f} s'.format(
+        len(changed) - failed,
+        len(files),
+        len(removed),
+        failed,
+        time.perf_counter() - start
+    ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Index a folder of Paper Blossoms .pbc character files into a queryable sqlite catalog.')
+    parser.add_argument('directory', help = 'Folder to search for .pbc files, including subfolders')
+    parser.add_argument('--catalog', default = 'characters.db', help = 'Filepath for the catalog db, updated in place (defaults to characters.db)')
+    parser.add_argument(
+        '--game-db',
+        default = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'paperblossoms.db'),
+        help = 'Filepath for the paperblossoms db to resolve clans, schools and titles against (defaults to the one in data)'
+    )
+    parser.add_argument('--jobs', type = int, default = os.cpu_count(), help = 'Number of processes parsing files')
+    args = parser.parse_args()
+
+    main(args.directory, args.catalog, args.game_db, args.jobs)
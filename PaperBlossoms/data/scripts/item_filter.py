@@ -0,0 +1,189 @@
+import argparse
+import pathlib
+import sqlite3
+import time
+
+import json_to_db
+from lookup_cache import LookupCache
+
+
+# Every item or weapon grip of the items catalog with its quality mask
+CATALOG_SQL = '''SELECT i.item_type, i.name, i.grip, i.rarity, i.price_zeni, m.quality_mask
+FROM items i
+JOIN item_quality_masks m ON m.item_type = i.item_type AND m.name = i.name AND m.grip IS i.grip
+ORDER BY i.rowid'''
+
+# Every quality of the qualities tables, in the order json_to_db gives them
+# bits: qualities.json, the user qualities, then those only named by items
+QUALITIES_SQL = '\nUNION ALL\n'.join(
+    'SELECT quality FROM {}_{} WHERE quality IS NOT NULL'.format(prefix, table_stem)
+    for table_stem in ['qualities'] + [qualities_stem for _, _, qualities_stem, _ in json_to_db.QUALITY_ITEMS.values()]
+    for prefix in ['base', 'user']
+)
+
+# Qualities of every item or weapon grip that have no bit in quality_bits,
+# read through the quality tables as the masks are computed; the quality
+# rows are scanned once and their items found by index
+UNMASKED_SQL = '\nUNION ALL\n'.join(
+    '''SELECT m.item_type, m.name, m.grip, q.quality
+    FROM {qualities} q
+    CROSS JOIN item_quality_masks m ON m.item_type = '{item_type}' AND m.name = q.{item_column}{grip_condition}
+    WHERE q.quality NOT IN (SELECT quality FROM quality_bits)'''.format(
+        qualities = json_to_db.base_and_user(qualities_stem),
+        item_column = item_column,
+        grip_condition = '' if grip_column is None else ' AND (q.{0} IS NULL OR q.{0} = m.grip)'.format(grip_column),
+        item_type = item_type
+    )
+    for item_type, (_, grip_column, qualities_stem, item_column) in json_to_db.QUALITY_ITEMS.items()
+)
+
+# User tables the catalog and quality bits are read from
+CATALOG_TABLES = [
+    'user_qualities',
+    'user_weapons',
+    'user_weapon_qualities',
+    'user_armor',
+    'user_armor_qualities',
+    'user_personal_effects',
+    'user_personal_effect_qualities'
+]
+
+
+# Filters equipment by quality predicates, rarity and price over the items
+# and item_quality_masks tables built by json_to_db. The catalog is held in
+# memory and only reloaded when data_versions shows a user table it reads
+# from has changed, so a filter is a pass of bitwise tests over a list.
+# Qualities beyond the json_to_db.MAX_QUALITY_BITS a stored mask holds get
+# the next bits here, set from the quality tables, as Python ints are not
+# limited to 64 bits
+class ItemFilter:
+
+    def __init__(self, db_conn, cache = None):
+        self.cache = cache if cache is not None else LookupCache(db_conn)
+        self.rows = None
+        self.unmasked_rows = None
+        self.items = []
+        self.bit_rows = None
+        self.quality_rows = None
+        self.quality_bits = {}
+
+    def bits(self):
+        bit_rows = self.cache.query('SELECT quality, bit FROM quality_bits', (), CATALOG_TABLES)
+        quality_rows = self.cache.query(QUALITIES_SQL, (), CATALOG_TABLES)
+        if bit_rows is not self.bit_rows or quality_rows is not self.quality_rows:
+            self.bit_rows = bit_rows
+            self.quality_rows = quality_rows
+            self.quality_bits = dict(bit_rows)
+            unmasked = [quality for quality, in dict.fromkeys(quality_rows) if quality not in self.quality_bits]
+            self.quality_bits.update((quality, json_to_db.MAX_QUALITY_BITS + index) for index, quality in enumerate(unmasked))
+
+        return self.quality_bits
+
+    # Bitmask of qualities. Every quality of the qualities tables or named by
+    # an item has a bit, so one without is unknown and raises ValueError
+    # rather than being matched by no item
+    def mask(self, qualities):
+        bits = self.bits()
+        unknown = sorted(set(qualities) - set(bits))
+        if unknown:
+            raise ValueError('Unknown qualities: ' + ', '.join(unknown))
+
+        return sum(1 << bits[quality] for quality in set(qualities))
+
+    def catalog(self):
+        rows = self.cache.query(CATALOG_SQL, (), CATALOG_TABLES)
+        bits = self.bits()
+        unmasked_rows = (
+            self.cache.query(UNMASKED_SQL, (), CATALOG_TABLES)
+            if any(bit >= json_to_db.MAX_QUALITY_BITS for bit in bits.values()) else ()
+        )
+        if rows is not self.rows or unmasked_rows is not self.unmasked_rows:
+            self.rows = rows
+            self.unmasked_rows = unmasked_rows
+            unmasked = {}
+            for item_type, name, grip, quality in unmasked_rows:
+                key = (item_type, name, grip)
+                unmasked[key] = unmasked.get(key, 0) | 1 << bits[quality]
+            self.items = [tuple(row[:5]) + (row[5] | unmasked.get(tuple(row[:3]), 0),) for row in rows]
+
+        return self.items
+
+    # Items (item_type, name, grip, rarity, price in zeni, quality mask) having
+    # every quality in all_of, at least one in any_of if given and none in
+    # none_of, with rarity and price in zeni within the inclusive (min, max)
+    # ranges given; either end of a range may be None
+    def filter(self, all_of = (), any_of = (), none_of = (), rarity = None, price = None, item_types = None):
+        all_mask = self.mask(all_of)
+        any_mask = self.mask(any_of)
+        none_mask = self.mask(none_of)
+        rarity_min, rarity_max = rarity if rarity is not None else (None, None)
+        price_min, price_max = price if price is not None else (None, None)
+
+        return [
+            item for item in self.catalog()
+            if item[5] & all_mask == all_mask
+            and (not any_mask or item[5] & any_mask)
+            and not item[5] & none_mask
+            and (item_types is None or item[0] in item_types)
+            and (rarity_min is None or (item[3] is not None and item[3] >= rarity_min))
+            and (rarity_max is None or (item[3] is not None and item[3] <= rarity_max))
+            and (price_min is None or (item[4] is not None and item[4] >= price_min))
+            and (price_max is None or (item[4] is not None and item[4] <= price_max))
+        ]
+
+
+# Items priced between price_min and price_max zeni, cheapest first, and at
+# most rarity_max rare if given, as (item_type, name, grip, name_tr, price in
+# zeni, rarity); a range scan of the items_price covering index
+def priced_items(db_conn, price_min, price_max, rarity_max = None):
+    sql = '''SELECT item_type, name, grip, name_tr, price_zeni, rarity FROM items
+    WHERE price_zeni BETWEEN ? AND ?'''
+    params = [price_min, price_max]
+    if rarity_max is not None:
+        sql += ' AND rarity <= ?'
+        params.append(rarity_max)
+
+    return db_conn.execute(sql + ' ORDER BY price_zeni', params).fetchall()
+
+
+def main(db_file, all_of, any_of, none_of, rarity, price, item_types):
+    item_filter = ItemFilter(sqlite3.connect(db_file))
+
+    start = time.perf_counter()
+    try:
+        items = item_filter.filter(all_of, any_of, none_of, rarity, price, item_types)
+    except ValueError as err:
+        print(err)
+        return
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    item_filter.filter(all_of, any_of, none_of, rarity, price, item_types)
+    repeat = time.perf_counter() - start
+
+    for item_type, name, grip, item_rarity, price_zeni, _ in items:
+        print('{:16}{:32}{:10}{:>8}{:>10}'.format(
+            item_type,
+            name,
+            grip or '',
+            '' if item_rarity is None else item_rarity,
+            '' if price_zeni is None else price_zeni
+        ))
+    print('{} items; first filter {:.2f} ms, repeated {:.3f} ms'.format(len(items), 1000 * first, 1000 * repeat))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Filter weapons, armor and personal effects by qualities, rarity and price.')
+    parser.add_argument(
+        '--db',
+        default = str(pathlib.Path(__file__).parents[1].joinpath('paperblossoms.db')),
+        help = 'Filepath for the paperblossoms db (defaults to the one in the data folder)'
+    )
+    parser.add_argument('--all', nargs = '+', default = [], metavar = 'QUALITY', help = 'Qualities items must all have')
+    parser.add_argument('--any', nargs = '+', default = [], metavar = 'QUALITY', help = 'Qualities items must have at least one of')
+    parser.add_argument('--none', nargs = '+', default = [], metavar = 'QUALITY', help = 'Qualities items must not have')
+    parser.add_argument('--rarity', nargs = 2, type = int, metavar = ('MIN', 'MAX'), help = 'Inclusive rarity range')
+    parser.add_argument('--price', nargs = 2, type = int, metavar = ('MIN', 'MAX'), help = 'Inclusive price range in zeni (1 bu = 10 zeni, 1 koku = 5 bu)')
+    parser.add_argument('--type', nargs = '+', choices = ['weapon', 'armor', 'personal_effect'], help = 'Only these kinds of item')
+    args = parser.parse_args()
+
+    main(args.db, args.all, args.any, args.none, args.rarity, args.price, args.type)
@@ -1,6 +1,12 @@
+import argparse
+import contextlib
+import csv
 import os
+import re
 import sqlite3
 import json
+import time
+import tracemalloc
 
 
 def connect_db(db_file):
@@ -14,6 +20,21 @@ def connect_db(db_file):
     return conn
 
 
+# Description and translation fields and indexes of every table stem created
+# by create_tables, in creation order, so later build steps can regenerate
+# views and indexes
+TABLE_SPECS = {}
+
+# Translated fields holding a ', ' separated list, keyed by table stem and
+# field, with the stem of the junction table storing the values one per row,
+# its columns naming the row and the value, and the field of the row they
+# are keyed on
+LIST_FIELDS = {
+    ('advantages_disadvantages', 'types'): ('advantage_types', 'advantage', 'type', 'name'),
+    ('schools', 'role'): ('school_roles', 'school', 'role', 'name')
+}
+
+
 # Create base_{table_stem} and user_{table_stem} from create_stmt
 # Define a {table_stem} view with description fields for desc_fields
 # and translation fields for tr_fields
@@ -22,7 +43,8 @@ def connect_db(db_file):
 # if the latter, the key should be the name of the field to be described
 # and the value should be the prefix of the description fields;
 # if the former, no prefix is assumed to be present
-def create_tables(db_conn, table_stem, create_stmt, desc_fields = None, tr_fields = None):
+# indexes should be a list of lists of columns to index in both tables
+def create_tables(db_conn, table_stem, create_stmt, desc_fields = None, tr_fields = None, indexes = None):
 
     # Set names of base and user tables, respectively
     base_table = 'base_' + table_stem
@@ -31,54 +53,203 @@ def create_tables(db_conn, table_stem, create_stmt, desc_fields = None, tr_field
     # Create tables using the same statements
     db_conn.execute(create_stmt.format(base_table))
     db_conn.execute(create_stmt.format(user_table))
+    for columns in indexes or []:
+        db_conn.execute(index_definition(base_table, columns))
+        db_conn.execute(index_definition(user_table, columns))
+
+    # Remember the view fields and indexes for this table stem
+    if type(desc_fields) == str:
+        desc_fields = { desc_fields: '' }
+    TABLE_SPECS[table_stem] = {
+        'desc_fields': desc_fields,
+        'tr_fields': tr_fields,
+        'indexes': indexes
+    }
+
+    # Create views in db
+    create_views(db_conn, table_stem, TABLE_SPECS[table_stem])
+
+
+# Narrow views of table_stem, as (view name, desc_fields, tr_fields to
+# select), each joining only what its own columns need: one per translated
+# field, selecting its {tr_field}_tr, and one selecting the descriptions.
+# Stems whose view has a single translation or description are left with it
+def narrow_views(table_stem, desc_fields = None, tr_fields = None):
+    views = [('{}_{}_tr'.format(table_stem, tr_field), None, [tr_field]) for tr_field in tr_fields or []]
+    if desc_fields:
+        views.append(('{}_desc'.format(table_stem), desc_fields, []))
+
+    return views if len(views) > 1 else []
+
+
+# Create the {table_stem} view and its narrow views from the spec of
+# table_stem; interned_columns and translated_columns are as for
+# view_definition
+def create_views(db_conn, table_stem, spec, interned_columns = None, translated_columns = None):
+    tr_fields = spec['tr_fields'] if spec['tr_fields'] is not None else []
+    db_conn.execute(view_definition(table_stem, spec['desc_fields'], tr_fields, interned_columns, translated_columns))
+    for view_name, desc_fields, tr_selected in narrow_views(table_stem, spec['desc_fields'], tr_fields):
+        db_conn.execute(view_definition(table_stem, desc_fields, tr_fields, interned_columns, translated_columns, view_name, tr_selected))
+
+
+def drop_views(db_conn, table_stem, spec):
+    db_conn.execute('DROP VIEW ' + table_stem)
+    for view_name, _, _ in narrow_views(table_stem, spec['desc_fields'], spec['tr_fields']):
+        db_conn.execute('DROP VIEW ' + view_name)
+
+
+# Name of the description column of a view, for a desc_fields prefix
+def desc_column(prefix, column):
+    return column if prefix == '' else '_'.join([prefix, column])
+
+
+def index_definition(table, columns):
+    return 'CREATE INDEX {table}_{name} ON {table} ({columns})'.format(
+        table = table,
+        name = '_'.join(columns),
+        columns = ', '.join(columns)
+    )
+
+
+# SQL for the translation of tr_field in a row of table_stem, from the SQL
+# for the field's text, for its translation in i18n and a function giving
+# the SQL for the text of another field of the row. Lists without a
+# translation of the whole list join the translations of their values
+def tr_expression(table_stem, tr_field, text, string_tr, text_of):
+    if (table_stem, tr_field) not in LIST_FIELDS:
+        return 'COALESCE({string_tr}, {text})'.format(string_tr = string_tr, text = text)
+
+    junction, key, value, key_field = LIST_FIELDS[(table_stem, tr_field)]
+    return '''COALESCE({string_tr}, (
+            SELECT group_concat(COALESCE(l_i18n.string_tr, l.{value}), ', ')
+            FROM (SELECT {value} FROM {junction} WHERE {key} = {key_text} ORDER BY seq) l
+            LEFT JOIN i18n l_i18n ON l.{value} = l_i18n.string
+        ), {text})'''.format(
+        string_tr = string_tr,
+        value = value,
+        junction = junction,
+        key = key,
+        key_text = text_of(key_field),
+        text = text
+    )
+
+
+# Build the CREATE VIEW statement for {table_stem} from the combination of
+# user and base tables, descriptions and translations
+# If interned_columns is given, it should list every column of the base table
+# in order; the view then reads the interned_ storage tables, in which the
+# tr_fields hold ids into the strings table (see intern_strings)
+# If translated_columns is given instead, base rows are read with their
+# stored translations from translated_base_{table_stem} (see locale_db) and
+# only user rows are translated through i18n
+# view_name names a narrow view instead (see narrow_views), and tr_selected
+# lists the tr_fields whose translations it selects and joins, defaulting
+# to all of them
+def view_definition(table_stem, desc_fields = None, tr_fields = None, interned_columns = None, translated_columns = None, view_name = None, tr_selected = None):
+
+    tr_fields = tr_fields if tr_fields is not None else []
+    desc_fields = desc_fields if desc_fields is not None else {}
+    view_name = view_name if view_name is not None else table_stem
+    tr_selected = tr_selected if tr_selected is not None else tr_fields
+    interned = interned_columns is not None
+    translated = translated_columns is not None
+
+    # Expression for the text of a field, looked up in strings if interned
+    def text_of(field):
+        return 's_{field}.text'.format(field = field) if interned and field in tr_fields else 't.' + field
 
     # Dynamically create portions of view definition for translated fields
     tr_select = [
-        ', COALESCE(i18n_{tr_field}.string_tr, t.{tr_field}) AS {tr_field}_tr'.format(tr_field = tr_field)
-        for tr_field in tr_fields
-    ] if tr_fields is not None else []
-    
-    tr_join = [
-        'LEFT JOIN i18n i18n_{tr_field} ON t.{tr_field} = i18n_{tr_field}.string'.format(tr_field = tr_field)
-        for tr_field in tr_fields
-    ] if tr_fields is not None else []
+        ', {expression} AS {tr_field}_tr'.format(
+            expression = tr_expression(table_stem, tr_field, text_of(tr_field), 'i18n_{}.string_tr'.format(tr_field), text_of),
+            tr_field = tr_field
+        )
+        for tr_field in tr_selected
+    ]
+
+    # Interned views join the strings of every tr_field for the stored
+    # columns, but translations only for the selected ones
+    if interned:
+        tr_join = [
+            'LEFT JOIN strings s_{tr_field} ON t.{tr_field} = s_{tr_field}.id'.format(tr_field = tr_field) + (
+                '\nLEFT JOIN interned_i18n i18n_{tr_field} ON t.{tr_field} = i18n_{tr_field}.string'.format(tr_field = tr_field)
+                if tr_field in tr_selected else ''
+            )
+            for tr_field in tr_fields
+        ]
+    else:
+        tr_join = [
+            'LEFT JOIN i18n i18n_{tr_field} ON t.{tr_field} = i18n_{tr_field}.string'.format(tr_field = tr_field)
+            for tr_field in tr_selected
+        ]
 
     # Dynamically create portions of view definition for descriptions
-    if type(desc_fields) == str:
-        desc_fields = { desc_fields: '' }
     desc_select = [
-        ', {field}_desc.description AS '.format(field = field) + (
-            'description' if desc_fields[field] == '' else '_'.join([desc_fields[field], 'description'])
-        ) +
-        ', {field}_desc.short_desc AS '.format(field = field) + (
-            'short_desc' if desc_fields[field] == '' else '_'.join([desc_fields[field], 'short_desc'])
+        ', {field}_desc.description AS {description}, {field}_desc.short_desc AS {short_desc}'.format(
+            field = field,
+            description = desc_column(desc_fields[field], 'description'),
+            short_desc = desc_column(desc_fields[field], 'short_desc')
         )
         for field in desc_fields
-    ] if desc_fields is not None else []
-    
+    ]
+
     desc_join = [
-        'LEFT JOIN user_descriptions {desc_field}_desc ON t.{desc_field} = {desc_field}_desc.name'.format(desc_field = desc_field)
+        'LEFT JOIN user_descriptions {desc_field}_desc ON {text} = {desc_field}_desc.name'.format(desc_field = desc_field, text = text_of(desc_field))
         for desc_field in desc_fields
-    ] if desc_fields is not None else []
-    
+    ]
+
+    # Translated base rows carry their {tr_field}_tr columns; user rows get
+    # theirs from i18n inside the union
+    if translated:
+        return '\n'.join(
+            ['CREATE VIEW {view_name} AS'.format(view_name = view_name)] +
+            ['SELECT ' + ', '.join('t.' + column for column in translated_columns)] +
+            desc_select +
+            [', t.{tr_field}_tr'.format(tr_field = tr_field) for tr_field in tr_selected] +
+            ['''FROM (
+            SELECT {base_columns} FROM translated_base_{table_stem}
+            UNION ALL
+            SELECT t.*{user_tr_select} FROM user_{table_stem} t
+            {user_tr_join}
+        ) t'''.format(
+                base_columns = ', '.join(translated_columns + [tr_field + '_tr' for tr_field in tr_selected]),
+                table_stem = table_stem,
+                user_tr_select = ''.join(
+                    ', ' + tr_expression(table_stem, tr_field, 't.' + tr_field, 'i18n_{}.string_tr'.format(tr_field), text_of)
+                    for tr_field in tr_selected
+                ),
+                user_tr_join = '\n            '.join(tr_join)
+            )] +
+            desc_join
+        )
+
+    # Select the stored columns as they are, or their texts if interned
+    if interned:
+        columns_select = 'SELECT ' + ', '.join(
+            '{text} AS {column}'.format(text = text_of(column), column = column) if column in tr_fields else 't.' + column
+            for column in interned_columns
+        )
+        storage_prefix = 'interned_'
+    else:
+        columns_select = 'SELECT t.*'
+        storage_prefix = ''
+
     # Build view definition from combination of user and base tables, descriptions and translations
-    view_defn = '\n'.join(
-        ['CREATE VIEW {table_stem} AS'.format(table_stem = table_stem)] +
-        ['SELECT t.*'] +
+    return '\n'.join(
+        ['CREATE VIEW {view_name} AS'.format(view_name = view_name)] +
+        [columns_select] +
         desc_select + tr_select +
         ['''FROM (
-            SELECT * FROM {base_table}
+            SELECT * FROM {storage_prefix}base_{table_stem}
             UNION ALL
-            SELECT * FROM {user_table}
-        ) t'''.format(base_table = base_table, user_table = user_table)] +
-        desc_join + tr_join
+            SELECT * FROM {storage_prefix}user_{table_stem}
+        ) t'''.format(storage_prefix = storage_prefix, table_stem = table_stem)] +
+        # Interned description joins use the strings joined for translations
+        (tr_join + desc_join if interned else desc_join + tr_join)
     )
-    
-    # Create view in db
-    db_conn.execute(view_defn)
 
 
-def rings_to_db(db_conn):
+def rings_tables(db_conn):
 
     # Create rings table
     create_tables(
@@ -91,19 +262,15 @@ def rings_to_db(db_conn):
         tr_fields = ['name', 'outstanding_quality']
     )
 
-    # Read rings JSON
-    with open('json/rings.json', encoding = 'utf8') as f:
-        rings = json.load(f)
+
+def rings_rows(rings):
 
     # Write rings to rings table
     for ring in rings:
-        db_conn.execute(
-            'INSERT INTO base_rings VALUES (?,?)',
-            (ring['name'], ring['outstanding_quality'])
-        )
+        yield 'rings', (ring['name'], ring['outstanding_quality'])
 
 
-def skills_to_db(db_conn):
+def skills_tables(db_conn):
 
     # Create skills table
     create_tables(
@@ -116,20 +283,16 @@ def skills_to_db(db_conn):
         tr_fields = ['skill_group', 'skill']
     )
 
-    # Read skills JSON
-    with open('json/skill_groups.json', encoding = 'utf8') as f:
-        skill_groups = json.load(f)
+
+def skills_rows(skill_groups):
 
     # Write skills to skills table
     for skill_group in skill_groups:
         for skill in skill_group['skills']:
-            db_conn.execute(
-                'INSERT INTO base_skills VALUES (?,?)',
-                (skill_group['name'], skill)
-            )
+            yield 'skills', (skill_group['name'], skill)
 
 
-def qualities_to_db(db_conn):
+def qualities_tables(db_conn):
 
     # Create qualities table
     create_tables(
@@ -144,23 +307,19 @@ def qualities_to_db(db_conn):
         tr_fields = ['quality']
     )
 
-    # Read qualities JSON
-    with open('json/qualities.json', encoding = 'utf8') as f:
-        qualities = json.load(f)
+
+def qualities_rows(qualities):
 
     # Write qualities to qualities table
     for quality in qualities:
-        db_conn.execute(
-            'INSERT INTO base_qualities VALUES (?,?,?)',
-            (
-                quality['name'],
-                quality['reference']['book'],
-                quality['reference']['page']
-            )
+        yield 'qualities', (
+            quality['name'],
+            quality['reference']['book'],
+            quality['reference']['page']
         )
 
 
-def personal_effects_to_db(db_conn):
+def personal_effects_tables(db_conn):
 
     # Create personal effects table
     create_tables(
@@ -189,38 +348,29 @@ def personal_effects_to_db(db_conn):
         tr_fields = ['personal_effect', 'quality']
     )
 
-    # Read personal effects JSON
-    with open('json/personal_effects.json', encoding = 'utf8') as f:
-        personal_effects = json.load(f)
+
+def personal_effects_rows(personal_effects):
 
     # Write personal effects to personal effects tables
     for item in personal_effects:
 
         # Write personal effects to personal effects table
-        db_conn.execute(
-            'INSERT INTO base_personal_effects VALUES (?,?,?,?,?,?)',
-            (
-                item['name'],
-                item['reference']['book'],
-                item['reference']['page'],
-                item['price']['value'] if 'price' in item else None,
-                item['price']['unit'] if 'price' in item else None,
-                item['rarity'] if 'rarity' in item else None
-            )
+        yield 'personal_effects', (
+            item['name'],
+            item['reference']['book'],
+            item['reference']['page'],
+            item['price']['value'] if 'price' in item else None,
+            item['price']['unit'] if 'price' in item else None,
+            item['rarity'] if 'rarity' in item else None
         )
 
         # Write personal effect qualities
         if 'qualities' in item:
-            db_conn.executemany(
-                'INSERT INTO base_personal_effect_qualities VALUES (?,?)',
-                [
-                    (item['name'], quality)
-                    for quality in item['qualities']
-                ]
-            )
+            for quality in item['qualities']:
+                yield 'personal_effect_qualities', (item['name'], quality)
 
 
-def armor_to_db(db_conn):
+def armor_tables(db_conn):
 
     # Create armor table
     create_tables(
@@ -259,44 +409,34 @@ def armor_to_db(db_conn):
         tr_fields = ['armor', 'quality']
     )
 
-    # Read armor JSON
-    with open('json/armor.json', encoding = 'utf8') as f:
-        armor = json.load(f)
+
+def armor_rows(armor):
 
     # Write armor to armor, resistance values and qualities tables
     for piece in armor:
 
         # Write to armor table
-        db_conn.execute(
-            'INSERT INTO base_armor VALUES (?,?,?,?,?,?)',
-            (
-                piece['name'],
-                piece['reference']['book'],
-                piece['reference']['page'],
-                piece['rarity'],
-                piece['price']['value'],
-                piece['price']['unit']
-            )
+        yield 'armor', (
+            piece['name'],
+            piece['reference']['book'],
+            piece['reference']['page'],
+            piece['rarity'],
+            piece['price']['value'],
+            piece['price']['unit']
         )
         # Write to resistance values table
         for resistance_value in piece['resistance_values']:
-            db_conn.execute(
-                'INSERT INTO base_armor_resistance VALUES (?,?,?)',
-                (
-                    piece['name'],
-                    resistance_value['category'],
-                    resistance_value['value']
-                )
+            yield 'armor_resistance', (
+                piece['name'],
+                resistance_value['category'],
+                resistance_value['value']
             )
         # Write to qualities table
         for quality in piece['qualities']:
-            db_conn.execute(
-                'INSERT INTO base_armor_qualities VALUES (?,?)',
-                (piece['name'], quality)
-            )
+            yield 'armor_qualities', (piece['name'], quality)
 
 
-def weapons_to_db(db_conn):
+def weapons_tables(db_conn):
 
     # Create weapons table
     create_tables(
@@ -333,9 +473,8 @@ def weapons_to_db(db_conn):
         tr_fields = ['weapon', 'quality']
     )
 
-    # Read weapons JSON
-    with open('json/weapons.json', encoding = 'utf8') as f:
-        weapon_categories = json.load(f)
+
+def weapons_rows(weapon_categories):
 
     # Write weapons to weapons and qualities tables
     for category in weapon_categories:
@@ -343,102 +482,88 @@ def weapons_to_db(db_conn):
             for grip in weapon['grips']:
 
                 # Write to weapons table
-                db_conn.execute(
-                    'INSERT INTO base_weapons VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)',
+                yield 'weapons', (
+                    category['name'],
+                    weapon['name'],
+                    weapon['reference']['book'],
+                    weapon['reference']['page'],
                     (
-                        category['name'],
-                        weapon['name'],
-                        weapon['reference']['book'],
-                        weapon['reference']['page'],
-                        (
-                            weapon['skill']
-                            if not any([
-                                effect['attribute'] == 'skill'
-                                for effect in grip['effects']
-                            ])
-                            else [
-                                effect['value']
-                                for effect in grip['effects']
-                                if effect['attribute'] == 'skill'
-                            ].pop()
-                        ),
-                        grip['name'],
-                        (
-                            weapon['range']['min']
-                            if not any([
-                                effect['attribute'] == 'range'
-                                for effect in grip['effects']
-                            ])
-                            else [
-                                effect['value']['min']
-                                for effect in grip['effects']
-                                if effect['attribute'] == 'range'
-                            ].pop()
-                        ),
-                        (
-                            weapon['range']['max']
-                            if not any([
-                                effect['attribute'] == 'range'
-                                for effect in grip['effects']
-                            ])
-                            else [
-                                effect['value']['max']
-                                for effect in grip['effects']
-                                if effect['attribute'] == 'range'
-                            ].pop()
-                        ),
-                        (
-                            weapon['damage']
-                            if not any([
-                                effect['attribute'] == 'damage'
-                                for effect in grip['effects']
-                            ])
-                            else [
-                                weapon['damage'] + effect['value_increase']
-                                for effect in grip['effects']
-                                if effect['attribute'] == 'damage'
-                            ].pop()
-                        ),
-                        (
-                            weapon['deadliness']
-                            if not any([
-                                effect['attribute'] == 'deadliness'
-                                for effect in grip['effects']
-                            ])
-                            else [
-                                weapon['deadliness'] + effect['value_increase']
-                                for effect in grip['effects']
-                                if effect['attribute'] == 'deadliness'
-                            ].pop()
-                        ),
-                        weapon['rarity'],
-                        weapon['price']['value'],
-                        weapon['price']['unit']
-                    )
+                        weapon['skill']
+                        if not any([
+                            effect['attribute'] == 'skill'
+                            for effect in grip['effects']
+                        ])
+                        else [
+                            effect['value']
+                            for effect in grip['effects']
+                            if effect['attribute'] == 'skill'
+                        ].pop()
+                    ),
+                    grip['name'],
+                    (
+                        weapon['range']['min']
+                        if not any([
+                            effect['attribute'] == 'range'
+                            for effect in grip['effects']
+                        ])
+                        else [
+                            effect['value']['min']
+                            for effect in grip['effects']
+                            if effect['attribute'] == 'range'
+                        ].pop()
+                    ),
+                    (
+                        weapon['range']['max']
+                        if not any([
+                            effect['attribute'] == 'range'
+                            for effect in grip['effects']
+                        ])
+                        else [
+                            effect['value']['max']
+                            for effect in grip['effects']
+                            if effect['attribute'] == 'range'
+                        ].pop()
+                    ),
+                    (
+                        weapon['damage']
+                        if not any([
+                            effect['attribute'] == 'damage'
+                            for effect in grip['effects']
+                        ])
+                        else [
+                            weapon['damage'] + effect['value_increase']
+                            for effect in grip['effects']
+                            if effect['attribute'] == 'damage'
+                        ].pop()
+                    ),
+                    (
+                        weapon['deadliness']
+                        if not any([
+                            effect['attribute'] == 'deadliness'
+                            for effect in grip['effects']
+                        ])
+                        else [
+                            weapon['deadliness'] + effect['value_increase']
+                            for effect in grip['effects']
+                            if effect['attribute'] == 'deadliness'
+                        ].pop()
+                    ),
+                    weapon['rarity'],
+                    weapon['price']['value'],
+                    weapon['price']['unit']
                 )
 
                 # Write grip effect to qualities table
-                if any([effect['attribute'] == 'quality' for effect in grip['effects']]):
-                    db_conn.executemany(
-                        'INSERT INTO base_weapon_qualities VALUES (?,?,?)',
-                        [
-                            (weapon['name'], grip['name'], effect['value'])
-                            for effect in grip['effects']
-                            if effect['attribute'] == 'quality'
-                        ]
-                    )
+                for effect in grip['effects']:
+                    if effect['attribute'] == 'quality':
+                        yield 'weapon_qualities', (weapon['name'], grip['name'], effect['value'])
 
             # Write to qualities table
-            db_conn.executemany(
-                'INSERT INTO base_weapon_qualities VALUES (?,?,?)',
-                [
-                    (weapon['name'], None, quality)
-                    for quality in weapon['qualities']
-                ]
-            )
+            for quality in weapon['qualities']:
+                yield 'weapon_qualities', (weapon['name'], None, quality)
 
 
-def techniques_to_db(db_conn):
+def techniques_tables(db_conn):
 
     # Create techniques table
     create_tables(
@@ -458,32 +583,42 @@ def techniques_to_db(db_conn):
         tr_fields = ['category', 'subcategory', 'name', 'restriction']
     )
 
-    # Read techniques JSON
-    with open('json/techniques.json', encoding = 'utf8') as f:
-        technique_categories = json.load(f)
+
+def techniques_rows(technique_categories):
 
     # Write techniques to techniques table
     for category in technique_categories:
         for subcategory in category['subcategories']:
             for technique in subcategory['techniques']:
-                db_conn.execute(
-                    'INSERT INTO base_techniques VALUES (?,?,?,?,?,?,?,?)',
-                    (
-                        category['name'],
-                        subcategory['name'],
-                        technique['name'],
-                        technique['restriction'] if 'restriction' in technique else None,
-                        technique['reference']['book'],
-                        technique['reference']['page'],
-                        technique['rank'],
-                        technique['xp']
-                    )
+                yield 'techniques', (
+                    category['name'],
+                    subcategory['name'],
+                    technique['name'],
+                    technique['restriction'] if 'restriction' in technique else None,
+                    technique['reference']['book'],
+                    technique['reference']['page'],
+                    technique['rank'],
+                    technique['xp']
                 )
 
 
-def advantages_to_db(db_conn):
+def advantages_tables(db_conn):
+
+    # Create advantage types table, one row per type of an advantage
+    create_tables(
+        db_conn,
+        'advantage_types',
+        '''CREATE TABLE {} (
+            advantage TEXT,
+            seq INTEGER,
+            type TEXT,
+            PRIMARY KEY (advantage, seq)
+        )''',
+        tr_fields = ['advantage', 'type'],
+        indexes = [['type']]
+    )
 
-    # Create advantages table
+    # Create advantages table; types holds the types as a ', ' separated list
     create_tables(
         db_conn,
         'advantages_disadvantages',
@@ -500,28 +635,26 @@ def advantages_to_db(db_conn):
         tr_fields = ['name', 'ring', 'types']
     )
 
-    # Read advantages JSON
-    with open('json/advantages_disadvantages.json', encoding = 'utf8') as f:
-        advantage_categories = json.load(f)
+
+def advantages_rows(advantage_categories):
 
     # Write advantages to advantages table
     for category in advantage_categories:
         for entry in category['entries']:
-            db_conn.execute(
-                'INSERT INTO base_advantages_disadvantages VALUES (?,?,?,?,?,?,?)',
-                (
-                    category['name'],
-                    entry['name'],
-                    entry['reference']['book'],
-                    entry['reference']['page'],
-                    entry['ring'],
-                    ', '.join(entry['types']),
-                    entry['effects']
-                )
+            yield 'advantages_disadvantages', (
+                category['name'],
+                entry['name'],
+                entry['reference']['book'],
+                entry['reference']['page'],
+                entry['ring'],
+                ', '.join(entry['types']),
+                entry['effects']
             )
+            for seq, advantage_type in enumerate(entry['types']):
+                yield 'advantage_types', (entry['name'], seq, advantage_type)
 
 
-def q8_to_db(db_conn):
+def q8_tables(db_conn):
 
     # Create question 8 table
     db_conn.execute(
@@ -530,18 +663,15 @@ def q8_to_db(db_conn):
         )'''
     )
 
-    # Read question 8 JSON
-    with open('json/question_8.json', encoding = 'utf8') as f:
-        question_8 = json.load(f)
+
+def q8_rows(question_8):
 
     # Write question 8 to table
-    db_conn.executemany(
-        'INSERT INTO base_unorthodox_skills VALUES (?)',
-        [(skill,) for skill in question_8[1]['outcome']['values']]
-    )
+    for skill in question_8[1]['outcome']['values']:
+        yield 'unorthodox_skills', (skill,)
 
 
-def clans_to_db(db_conn):
+def clans_tables(db_conn):
 
     # Create clans, families, family rings and family skills tables
     create_tables(
@@ -592,62 +722,73 @@ def clans_to_db(db_conn):
         tr_fields = ['family', 'skill']
     )
 
-    # Read clans JSON
-    with open('json/clans.json', encoding = 'utf8') as f:
-        clans = json.load(f)
+
+def clans_rows(clans):
 
     # Write to tables
     for clan in clans:
 
         # Write to clans table
-        db_conn.execute(
-            'INSERT INTO base_clans VALUES (?,?,?,?,?,?,?)',
-            (
-                clan['name'],
-                clan['reference']['book'],
-                clan['reference']['page'],
-                clan['type'],
-                clan['ring_increase'],
-                clan['skill_increase'],
-                clan['status']
-            )
+        yield 'clans', (
+            clan['name'],
+            clan['reference']['book'],
+            clan['reference']['page'],
+            clan['type'],
+            clan['ring_increase'],
+            clan['skill_increase'],
+            clan['status']
         )
 
         for family in clan['families']:
 
             # Write to families table
-            db_conn.execute(
-                'INSERT INTO base_families VALUES (?,?,?,?,?,?)',
-                (
-                    clan['name'],
-                    family['name'],
-                    family['reference']['book'],
-                    family['reference']['page'],
-                    family['glory'],
-                    family['wealth']
-                )
+            yield 'families', (
+                clan['name'],
+                family['name'],
+                family['reference']['book'],
+                family['reference']['page'],
+                family['glory'],
+                family['wealth']
             )
 
             # Write to family rings table
-            db_conn.executemany(
-                'INSERT INTO base_family_rings VALUES (?,?)',
-                [
-                    (family['name'], ring)
-                    for ring in family['ring_increase']
-                ]
-            )
+            for ring in family['ring_increase']:
+                yield 'family_rings', (family['name'], ring)
 
             # Write to family skills table
-            db_conn.executemany(
-                'INSERT INTO base_family_skills VALUES (?,?)',
-                [
-                    (family['name'], skill)
-                    for skill in family['skill_increase']
-                ]
-            )
+            for skill in family['skill_increase']:
+                yield 'family_skills', (family['name'], skill)
+
+
+# Expand roll ranges into one row per die face so a roll resolves with a direct
+# (roll_table, roll) lookup instead of a range scan; entries are dicts with a
+# 'roll' range and the outcome stored under outcome_key. The die size is taken
+# from the highest roll_max, and every face up to it must be covered exactly once
+def dense_roll_table(roll_table, entries, outcome_key):
+
+    die_size = max(entry['roll']['max'] for entry in entries)
+    faces = {}
+    for entry in entries:
+        for roll in range(entry['roll']['min'], entry['roll']['max'] + 1):
+            if roll in faces:
+                raise ValueError(
+                    'Roll {roll} appears more than once in roll table {roll_table}'.format(roll = roll, roll_table = roll_table)
+                )
+            faces[roll] = entry[outcome_key]
+
+    missing = [roll for roll in range(1, die_size + 1) if roll not in faces]
+    if missing:
+        raise ValueError(
+            'Roll table {roll_table} does not cover rolls {missing}'.format(roll_table = roll_table, missing = missing)
+        )
 
+    return [
+        (roll_table, die_size, roll, faces[roll])
+        for roll in range(1, die_size + 1)
+    ]
 
-def heritage_to_db(db_conn):
+
+def heritage_tables(db_conn):
 
     # Create heritage, heritage modifier, heritage effects table
     create_tables(
@@ -677,49 +818,86 @@ def heritage_to_db(db_conn):
         )''',
         tr_fields = ['ancestor', 'outcome']
     )
+    create_tables(
+        db_conn,
+        'heritage_rolls',
+        '''CREATE TABLE {} (
+            roll_table TEXT,
+            die_size INTEGER,
+            roll INTEGER,
+            outcome TEXT,
+            PRIMARY KEY (roll_table, roll)
+        )''',
+        tr_fields = ['roll_table', 'outcome']
+    )
+
 
-    # Read samurai heritage from JSON
-    with open('json/samurai_heritage.json', encoding = 'utf8') as f:
-        samurai_heritage = json.load(f)
+def heritage_rows(samurai_heritage):
+
+    # Ancestor roll ranges of each heritage source
+    source_ancestors = {}
 
     # Write to heritage tables
     for ancestor in samurai_heritage:
 
         # Write to samurai heritage table
-        db_conn.execute(
-            'INSERT INTO base_samurai_heritage VALUES (?,?,?,?,?,?,?,?,?)',
-            (
-                ancestor['source'],
-                ancestor['roll']['min'],
-                ancestor['roll']['max'],
-                ancestor['result'],
-                ancestor['modifiers']['glory'],
-                ancestor['modifiers']['honor'],
-                ancestor['modifiers']['status'],
-                ancestor['other_effects']['type'],
-                ancestor['other_effects']['instructions']
-            )
+        yield 'samurai_heritage', (
+            ancestor['source'],
+            ancestor['roll']['min'],
+            ancestor['roll']['max'],
+            ancestor['result'],
+            ancestor['modifiers']['glory'],
+            ancestor['modifiers']['honor'],
+            ancestor['modifiers']['status'],
+            ancestor['other_effects']['type'],
+            ancestor['other_effects']['instructions']
+        )
+        source_ancestors.setdefault(ancestor['source'], []).append(
+            {'roll': ancestor['roll'], 'result': ancestor['result']}
         )
 
         # Write to heritage effects table
         if 'outcomes' in ancestor['other_effects']:
-            db_conn.executemany(
-                'INSERT INTO base_heritage_effects VALUES (?,?,?,?)',
-                [
-                    (
-                        ancestor['result'],
-                        effect['roll']['min'] if 'roll' in effect else None,
-                        effect['roll']['max'] if 'roll' in effect else None,
-                        effect['outcome']
-                    )
-                    for effect in ancestor['other_effects']['outcomes']
-                ]
-            )
+            for effect in ancestor['other_effects']['outcomes']:
+                yield 'heritage_effects', (
+                    ancestor['result'],
+                    effect['roll']['min'] if 'roll' in effect else None,
+                    effect['roll']['max'] if 'roll' in effect else None,
+                    effect['outcome']
+                )
+
+            # Write the rolled outcomes to the dense roll lookup
+            rolled_outcomes = [
+                effect for effect in ancestor['other_effects']['outcomes']
+                if 'roll' in effect
+            ]
+            if rolled_outcomes:
+                for row in dense_roll_table(ancestor['result'], rolled_outcomes, 'outcome'):
+                    yield 'heritage_rolls', row
+
+    # Write one dense ancestor roll lookup per heritage source
+    for source, ancestors in source_ancestors.items():
+        for row in dense_roll_table(source, ancestors, 'result'):
+            yield 'heritage_rolls', row
 
 
-def schools_to_db(db_conn):
+def schools_tables(db_conn):
 
-    # Create school tables
+    # Create school roles table, one row per role of a school
+    create_tables(
+        db_conn,
+        'school_roles',
+        '''CREATE TABLE {} (
+            school TEXT,
+            seq INTEGER,
+            role TEXT,
+            PRIMARY KEY (school, seq)
+        )''',
+        tr_fields = ['school', 'role'],
+        indexes = [['role']]
+    )
+
+    # Create school tables; role holds the roles as a ', ' separated list
     create_tables(
         db_conn,
         'schools',
@@ -767,7 +945,8 @@ def schools_to_db(db_conn):
             school TEXT,
             technique TEXT
         )''',
-        tr_fields = ['school', 'technique']
+        tr_fields = ['school', 'technique'],
+        indexes = [['school']]
     )
     create_tables(
         db_conn,
@@ -804,104 +983,74 @@ def schools_to_db(db_conn):
         tr_fields = ['school', 'advance']
     )
 
-    # Read schools JSON
-    with open('json/schools.json', encoding = 'utf8') as f:
-        schools = json.load(f)
+
+def schools_rows(schools):
 
     # Write to schools tables
     for school in schools:
 
         # Write to schools table
-        db_conn.execute(
-            'INSERT INTO base_schools VALUES (?,?,?,?,?,?,?,?,?,?)',
-            (
-                school['name'],
-                school['reference']['book'],
-                school['reference']['page'],
-                ', '.join(school['role']),
-                school['clan'] if 'clan' in school else None,
-                school['starting_skills']['size'],
-                school['honor'],
-                school['advantage_disadvantage'] if 'advantage_disadvantage' in school else None,
-                school['school_ability'],
-                school['mastery_ability'],
-            )
+        yield 'schools', (
+            school['name'],
+            school['reference']['book'],
+            school['reference']['page'],
+            ', '.join(school['role']),
+            school['clan'] if 'clan' in school else None,
+            school['starting_skills']['size'],
+            school['honor'],
+            school['advantage_disadvantage'] if 'advantage_disadvantage' in school else None,
+            school['school_ability'],
+            school['mastery_ability'],
         )
 
+        # Write to school roles table
+        for seq, role in enumerate(school['role']):
+            yield 'school_roles', (school['name'], seq, role)
+
         # Write to school rings table
-        db_conn.executemany(
-            'INSERT INTO base_school_rings VALUES (?,?)',
-            [
-                (school['name'], ring)
-                for ring in school['ring_increase']
-            ]
-        )
+        for ring in school['ring_increase']:
+            yield 'school_rings', (school['name'], ring)
 
         # Write to school starting skill table
-        db_conn.executemany(
-            'INSERT INTO base_school_starting_skills VALUES (?,?)',
-            [
-                (school['name'], skill)
-                for skill in school['starting_skills']['set']
-            ]
-        )
+        for skill in school['starting_skills']['set']:
+            yield 'school_starting_skills', (school['name'], skill)
 
         # Write to school techniques available table
-        db_conn.executemany(
-            'INSERT INTO base_school_techniques_available VALUES (?,?)',
-            [
-                (school['name'], technique)
-                for technique in school['techniques_available']
-            ]
-        )
+        for technique in school['techniques_available']:
+            yield 'school_techniques_available', (school['name'], technique)
 
         # Write to school starting techniques table
         for technique_set_id, technique_set in enumerate(school['starting_techniques']):
-            db_conn.executemany(
-                'INSERT INTO base_school_starting_techniques VALUES (?,?,?,?)',
-                [
-                    (
-                        school['name'],
-                        technique_set_id,
-                        technique_set['size'],
-                        technique
-                    )
-                    for technique in technique_set['set']
-                ]
-            )
+            for technique in technique_set['set']:
+                yield 'school_starting_techniques', (
+                    school['name'],
+                    technique_set_id,
+                    technique_set['size'],
+                    technique
+                )
 
         # Write to schools starting outfit table
         for equipment_set_id, equipment_set in enumerate(school['starting_outfit']):
-            db_conn.executemany(
-                'INSERT INTO base_school_starting_outfit VALUES (?,?,?,?)',
-                [
-                    (
-                        school['name'],
-                        equipment_set_id,
-                        equipment_set['size'],
-                        piece
-                    )
-                    for piece in equipment_set['set']
-                ]
-            )
-
-        # Write to curriculum table
-        db_conn.executemany(
-            'INSERT INTO base_curriculum VALUES (?,?,?,?,?)',
-            [
-                (
+            for piece in equipment_set['set']:
+                yield 'school_starting_outfit', (
                     school['name'],
-                    advancement['rank'],
-                    advancement['advance'],
-                    advancement['type'],
-                    int(advancement['special_access'])
+                    equipment_set_id,
+                    equipment_set['size'],
+                    piece
                 )
-                for advancement in school['curriculum']
-            ]
-        )
+
+        # Write to curriculum table
+        for advancement in school['curriculum']:
+            yield 'curriculum', (
+                school['name'],
+                advancement['rank'],
+                advancement['advance'],
+                advancement['type'],
+                int(advancement['special_access'])
+            )
 
 
-def titles_to_db(db_conn):
+def titles_tables(db_conn):
 
     # Create titles table
     create_tables(
@@ -951,60 +1100,46 @@ def titles_to_db(db_conn):
         tr_fields = ['title', 'name', 'type']
     )
 
-    # Read titles from JSON
-    with open('json/titles.json', encoding = 'utf8') as f:
-        titles = json.load(f)
+
+def titles_rows(titles):
 
     # Write to titles tables
     for title in titles:
 
         # Write to titles table
-        db_conn.execute(
-            'INSERT INTO base_titles VALUES (?,?,?,?,?)',
-            (
-                title['name'],
-                title['reference']['book'],
-                title['reference']['page'],
-                title['xp_to_completion'],
-                title['title_ability'],
-            )
+        yield 'titles', (
+            title['name'],
+            title['reference']['book'],
+            title['reference']['page'],
+            title['xp_to_completion'],
+            title['title_ability'],
         )
 
         # Write to title awards table
-        db_conn.executemany(
-            'INSERT INTO base_title_awards VALUES (?,?,?,?,?,?,?)',
-            [
-                (
-                    title['name'],
-                    award['award_attribute'],
-                    award['base_award'],
-                    award['constraint']['type'] if 'constraint' in award else None,
-                    award['constraint']['value'] if 'constraint' in award and 'value' in award['constraint'] else None,
-                    award['constraint']['range'][0] if 'constraint' in award and 'range' in award['constraint'] else None,
-                    award['constraint']['range'][1] if 'constraint' in award and 'range' in award['constraint'] else None
-                )
-                for award in title['social_awards']
-            ]
-        )
+        for award in title['social_awards']:
+            yield 'title_awards', (
+                title['name'],
+                award['award_attribute'],
+                award['base_award'],
+                award['constraint']['type'] if 'constraint' in award else None,
+                award['constraint']['value'] if 'constraint' in award and 'value' in award['constraint'] else None,
+                award['constraint']['range'][0] if 'constraint' in award and 'range' in award['constraint'] else None,
+                award['constraint']['range'][1] if 'constraint' in award and 'range' in award['constraint'] else None
+            )
 
         # Write to title advancement table
-        db_conn.executemany(
-            'INSERT INTO base_title_advancements VALUES (?,?,?,?,?)',
-            [
-                (
-                    title['name'],
-                    advancement['rank'] if 'rank' in advancement else None,
-                    advancement['name'],
-                    advancement['type'],
-                    advancement['special_access']
-                )
-                for advancement in title['advancements']
-            ]
-        )
+        for advancement in title['advancements']:
+            yield 'title_advancements', (
+                title['name'],
+                advancement['rank'] if 'rank' in advancement else None,
+                advancement['name'],
+                advancement['type'],
+                advancement['special_access']
+            )
+
 
+def patterns_tables(db_conn):
 
-def patterns_to_db(db_conn):
-    
     # Create item patterns table
     create_tables(
         db_conn,
@@ -1020,24 +1155,163 @@ def patterns_to_db(db_conn):
         tr_fields = ['name']
     )
 
-    # Read item patterns from JSON
-    with open('json/item_patterns.json', encoding = 'utf8') as f:
-        item_patterns = json.load(f)
-    
+
+def patterns_rows(item_patterns):
+
     # Write item patterns to item pattern table
     for pattern in item_patterns:
-        db_conn.execute(
-            'INSERT INTO base_item_patterns VALUES (?,?,?,?,?)',
-            (
-                pattern['name'],
-                pattern['reference']['book'],
-                pattern['reference']['page'],
-                pattern['xp_cost'],
-                pattern['rarity_modifier']
-            )
+        yield 'item_patterns', (
+            pattern['name'],
+            pattern['reference']['book'],
+            pattern['reference']['page'],
+            pattern['xp_cost'],
+            pattern['rarity_modifier']
         )
 
 
+# Data sources in build order: the json file each is read from, the function
+# creating its tables and the generator of (table_stem, row) pairs to insert
+SOURCES = {
+
+    # Easy tables
+    'rings': ('rings.json', rings_tables, rings_rows),
+    'skills': ('skill_groups.json', skills_tables, skills_rows),
+    'techniques': ('techniques.json', techniques_tables, techniques_rows),
+    'advantages': ('advantages_disadvantages.json', advantages_tables, advantages_rows),
+    'q8': ('question_8.json', q8_tables, q8_rows),
+    'titles': ('titles.json', titles_tables, titles_rows),
+    'patterns': ('item_patterns.json', patterns_tables, patterns_rows),
+
+    # Equipment
+    'qualities': ('qualities.json', qualities_tables, qualities_rows),
+    'personal_effects': ('personal_effects.json', personal_effects_tables, personal_effects_rows),
+    'armor': ('armor.json', armor_tables, armor_rows),
+    'weapons': ('weapons.json', weapons_tables, weapons_rows),
+
+    # The big guns
+    'clans': ('clans.json', clans_tables, clans_rows),
+    'heritage': ('samurai_heritage.json', heritage_tables, heritage_rows),
+    'schools': ('schools.json', schools_tables, schools_rows)
+}
+
+# Sources whose rows are generated in one pass over their top-level array,
+# which are parsed an element at a time instead of loaded whole
+STREAMED_SOURCES = [
+    'rings', 'skills', 'techniques', 'advantages', 'titles', 'patterns',
+    'qualities', 'personal_effects', 'armor', 'weapons',
+    'clans', 'heritage', 'schools'
+]
+
+
+# The separator following an element of a json array
+JSON_SEPARATOR = re.compile(r'[ \t\n\r]*[,\]]')
+
+
+def read_json(filepath):
+    with open(filepath, encoding = 'utf8') as f:
+        return json.load(f)
+
+
+# Yield the elements of the json array in filepath one at a time, reading
+# the file in chunks, so memory is bounded by the largest element rather
+# than the file. An element is only taken once the buffer holds the
+# separator after it, as a number cut off by the end of the buffer would
+# decode; incomplete elements are decoded again once more of the file is
+# read, growing the reads so that large elements take few attempts
+def iter_json_array(filepath, chunk_size = 65536):
+    decoder = json.JSONDecoder()
+    with open(filepath, encoding = 'utf8') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+
+        # Move pos to the next non-whitespace character, reading as needed;
+        # returns that character, or '' at the end of the file
+        def next_char():
+            nonlocal buffer, pos, eof
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\n\r':
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    return buffer[pos:pos + 1]
+                buffer = f.read(chunk_size)
+                pos = 0
+                eof = buffer == ''
+
+        if next_char() != '[':
+            raise ValueError(filepath + ' does not hold a json array')
+        pos += 1
+        if next_char() == ']':
+            return
+
+        while True:
+            next_char()
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+                complete = eof or JSON_SEPARATOR.match(buffer, end) is not None
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                chunk = f.read(max(chunk_size, len(buffer) - pos))
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                eof = chunk == ''
+                continue
+
+            yield element
+            pos = end
+            separator = next_char()
+            pos += 1
+            if separator == ']':
+                if next_char() != '':
+                    raise ValueError('Extra data after the array in ' + filepath)
+                return
+            if separator != ',':
+                raise ValueError('Expected , or ] after an element of {} but found {!r}'.format(filepath, separator))
+
+
+# Insert (table_stem, row) pairs into the {prefix}_{table_stem} tables,
+# batching consecutive rows for the same table into one executemany
+def write_rows(db_conn, rows, prefix = 'base', batch_size = 500):
+    batch_table = None
+    batch = []
+
+    for table_stem, row in rows:
+        if batch and (table_stem != batch_table or len(batch) >= batch_size):
+            write_batch(db_conn, prefix, batch_table, batch)
+            batch = []
+        batch_table = table_stem
+        batch.append(row)
+
+    if batch:
+        write_batch(db_conn, prefix, batch_table, batch)
+
+
+def write_batch(db_conn, prefix, table_stem, batch):
+    db_conn.executemany(
+        'INSERT INTO {prefix}_{table_stem} VALUES ({placeholders})'.format(
+            prefix = prefix,
+            table_stem = table_stem,
+            placeholders = ','.join('?' * len(batch[0]))
+        ),
+        batch
+    )
+
+
+# Create the tables of source and fill its base tables from data, the parsed
+# json document. If not given it is read from the source's json file in
+# data_dir, streamed an element at a time for the sources in STREAMED_SOURCES
+def source_to_db(db_conn, source, data = None, data_dir = '.'):
+    filename, create_source_tables, source_rows = SOURCES[source]
+    create_source_tables(db_conn)
+    if data is None:
+        filepath = os.path.join(data_dir, 'json', filename)
+        data = iter_json_array(filepath) if source in STREAMED_SOURCES else read_json(filepath)
+    write_rows(db_conn, source_rows(data))
+
+
 def desc_to_db(db_conn):
     db_conn.execute(
         '''CREATE TABLE user_descriptions (
@@ -1057,47 +1331,1274 @@ def translations_to_db(db_conn):
     )
 
 
-def main():
+# Rewrite table so the text stored in interned_fields is replaced by ids into
+# the shared strings table; the data moves to interned_{table} and table
+# becomes a view exposing the original text columns in their original order.
+# If writable, INSTEAD OF triggers let the view be inserted into, updated and
+# deleted from as if it were the original table. Returns the column names
+def intern_table(db_conn, table, interned_fields, writable = False):
+
+    storage = 'interned_' + table
+    table_info = db_conn.execute('PRAGMA table_info({})'.format(table)).fetchall()
+    columns = [column_info[1] for column_info in table_info]
+    primary_key = [
+        column_info[1]
+        for column_info in sorted(table_info, key = lambda column_info: column_info[5])
+        if column_info[5] > 0
+    ]
+
+    # Create storage table with integer ids in place of the interned fields
+    column_defs = [
+        '{name} {type}'.format(name = column_info[1], type = 'INTEGER' if column_info[1] in interned_fields else column_info[2])
+        for column_info in table_info
+    ]
+    if primary_key:
+        column_defs.append('PRIMARY KEY ({})'.format(', '.join(primary_key)))
+    db_conn.execute('CREATE TABLE {storage} ({column_defs})'.format(storage = storage, column_defs = ', '.join(column_defs)))
+
+    # Intern the strings and move the rows across in their original order
+    def id_of(expr):
+        return '(SELECT id FROM strings WHERE text = {})'.format(expr)
+
+    for field in interned_fields:
+        db_conn.execute(
+            'INSERT OR IGNORE INTO strings (text) SELECT {field} FROM {table} WHERE {field} IS NOT NULL ORDER BY rowid'.format(field = field, table = table)
+        )
+    db_conn.execute(
+        'INSERT INTO {storage} SELECT {values} FROM {table} t ORDER BY t.rowid'.format(
+            storage = storage,
+            table = table,
+            values = ', '.join(id_of('t.' + column) if column in interned_fields else 't.' + column for column in columns)
+        )
+    )
+    db_conn.execute('DROP TABLE ' + table)
+
+    # Compatibility view with the original text columns
+    db_conn.execute(
+        '\n'.join(
+            ['CREATE VIEW {table} AS'.format(table = table)] +
+            ['SELECT ' + ', '.join(
+                's_{column}.text AS {column}'.format(column = column) if column in interned_fields else 't.' + column
+                for column in columns
+            )] +
+            ['FROM {storage} t'.format(storage = storage)] +
+            [
+                'LEFT JOIN strings s_{field} ON t.{field} = s_{field}.id'.format(field = field)
+                for field in interned_fields
+            ]
+        )
+    )
+
+    if not writable:
+        return columns
+
+    # Write through the view, interning any new strings first
+    intern_new = ''.join(
+        'INSERT OR IGNORE INTO strings (text) SELECT NEW.{field} WHERE NEW.{field} IS NOT NULL;\n'.format(field = field)
+        for field in interned_fields
+    )
+    new_values = [id_of('NEW.' + column) if column in interned_fields else 'NEW.' + column for column in columns]
+    old_match = ' AND '.join(
+        '{column} IS {value}'.format(column = column, value = id_of('OLD.' + column) if column in interned_fields else 'OLD.' + column)
+        for column in columns
+    )
+    db_conn.execute(
+        '''CREATE TRIGGER {table}_insert INSTEAD OF INSERT ON {table}
+        BEGIN
+            {intern_new}INSERT INTO {storage} VALUES ({new_values});
+        END'''.format(table = table, storage = storage, intern_new = intern_new, new_values = ', '.join(new_values))
+    )
+    db_conn.execute(
+        '''CREATE TRIGGER {table}_delete INSTEAD OF DELETE ON {table}
+        BEGIN
+            DELETE FROM {storage} WHERE {old_match};
+        END'''.format(table = table, storage = storage, old_match = old_match)
+    )
+    db_conn.execute(
+        '''CREATE TRIGGER {table}_update INSTEAD OF UPDATE ON {table}
+        BEGIN
+            {intern_new}UPDATE {storage} SET {assignments} WHERE {old_match};
+        END'''.format(
+            table = table,
+            storage = storage,
+            intern_new = intern_new,
+            assignments = ', '.join('{} = {}'.format(column, value) for column, value in zip(columns, new_values)),
+            old_match = old_match
+        )
+    )
+
+    return columns
+
+
+# Optional build mode storing every translatable string once in a strings
+# table: the tr_fields of all base and user tables and the i18n source
+# strings hold integer ids, the original table names become compatibility
+# views, and the {table_stem} views join translations on integer ids
+def intern_strings(db_conn):
+    db_conn.execute(
+        '''CREATE TABLE strings (
+            id INTEGER PRIMARY KEY,
+            text TEXT NOT NULL UNIQUE
+        )'''
+    )
+
+    intern_table(db_conn, 'i18n', ['string'], writable = True)
+
+    for table_stem, spec in TABLE_SPECS.items():
+        tr_fields = spec['tr_fields'] if spec['tr_fields'] is not None else []
+        drop_views(db_conn, table_stem, spec)
+        columns = intern_table(db_conn, 'base_' + table_stem, tr_fields)
+        intern_table(db_conn, 'user_' + table_stem, tr_fields, writable = True)
+        for index_columns in spec['indexes'] or []:
+            db_conn.execute(index_definition('interned_base_' + table_stem, index_columns))
+            db_conn.execute(index_definition('interned_user_' + table_stem, index_columns))
+        create_views(db_conn, table_stem, spec, columns)
+
+
+# Catalog of the {table_stem} views and their narrow views, with the
+# translation and description columns each selects and the number of i18n
+# and description joins it makes, so lookups needing only some of those
+# columns can pick the view with the fewest joins. Safe to re-run
+def view_catalog_to_db(db_conn):
+    db_conn.execute('DROP TABLE IF EXISTS view_catalog')
+    db_conn.execute(
+        '''CREATE TABLE view_catalog (
+            view_name TEXT PRIMARY KEY,
+            table_stem TEXT NOT NULL,
+            columns TEXT NOT NULL,
+            joins INTEGER NOT NULL
+        )'''
+    )
+
+    def catalog_row(view_name, table_stem, desc_fields, tr_selected):
+        columns = [tr_field + '_tr' for tr_field in tr_selected]
+        for prefix in (desc_fields or {}).values():
+            columns += [desc_column(prefix, 'description'), desc_column(prefix, 'short_desc')]
+        return (view_name, table_stem, ', '.join(columns), len(tr_selected) + len(desc_fields or {}))
+
+    rows = []
+    for table_stem, spec in TABLE_SPECS.items():
+        rows.append(catalog_row(table_stem, table_stem, spec['desc_fields'], spec['tr_fields'] or []))
+        for view_name, desc_fields, tr_selected in narrow_views(table_stem, spec['desc_fields'], spec['tr_fields']):
+            rows.append(catalog_row(view_name, table_stem, desc_fields, tr_selected))
+    db_conn.executemany('INSERT INTO view_catalog VALUES (?, ?, ?, ?)', rows)
+
+
+# Keep a version counter per mutable table (translations, descriptions and
+# every user table), bumped by triggers on each insert, update and delete so
+# that readers caching query results can tell exactly which tables changed.
+# Safe to re-run after tables have been rebuilt; counters restart at 0
+def data_versions_to_db(db_conn):
+    db_conn.execute('DROP TABLE IF EXISTS data_versions')
+    db_conn.execute(
+        '''CREATE TABLE data_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )'''
+    )
+
+    # Interned tables are views over interned_{table}; track their storage
+    tracked_tables = db_conn.execute(
+        '''SELECT name, CASE type WHEN 'view' THEN 'interned_' || name ELSE name END
+        FROM sqlite_master
+        WHERE type IN ('table', 'view') AND (name = 'i18n' OR name LIKE 'user\\_%' ESCAPE '\\')
+        ORDER BY name'''
+    ).fetchall()
+
+    for table, storage in tracked_tables:
+        db_conn.execute('INSERT INTO data_versions VALUES (?, 0)', (table,))
+        for event in ['INSERT', 'UPDATE', 'DELETE']:
+            db_conn.execute(
+                '''CREATE TRIGGER IF NOT EXISTS {storage}_version_{event_lower} AFTER {event} ON {storage}
+                BEGIN
+                    UPDATE data_versions SET version = version + 1 WHERE table_name = '{table}';
+                END'''.format(table = table, storage = storage, event = event, event_lower = event.lower())
+            )
+
+
+# Table to create triggers on for changes to table, and a function giving
+# the SQL for the text of one of its columns in a trigger's NEW or OLD row.
+# In interned builds user tables are views over interned_ storage tables
+# whose translatable columns hold ids into strings (see intern_strings);
+# tr_fields defaults to those of the table's stem
+def trigger_table(db_conn, table, tr_fields = None):
+    storage = 'interned_' + table
+    if db_conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (storage,)).fetchone() is None:
+        return table, lambda row, column: '{}.{}'.format(row, column)
+
+    if tr_fields is None:
+        tr_fields = TABLE_SPECS[table.split('_', 1)[1]]['tr_fields'] or []
+    return storage, lambda row, column: (
+        '(SELECT text FROM strings WHERE id = {}.{})'.format(row, column) if column in tr_fields else '{}.{}'.format(row, column)
+    )
+
+
+# Item table families carrying qualities: the item table stem, its grip
+# column if qualities can apply to a single grip, and the qualities table
+# stem with the column naming the item
+QUALITY_ITEMS = {
+    'weapon': ('weapons', 'grip', 'weapon_qualities', 'weapon'),
+    'armor': ('armor', None, 'armor_qualities', 'armor'),
+    'personal_effect': ('personal_effects', None, 'personal_effect_qualities', 'personal_effect')
+}
+
+# Masks are stored as sqlite integers, which are signed 64 bit; qualities
+# past these bits have none, and item_filter matches them through the
+# quality tables instead
+MAX_QUALITY_BITS = 63
+
+
+# SQL for the quality mask of the item named name_expr (and grip grip_expr
+# for weapons): the sum of the distinct bits of its qualities, which for
+# single bits is their bitwise or
+def quality_mask_sql(item_type, name_expr, grip_expr = None):
+    _, grip_column, qualities_stem, item_column = QUALITY_ITEMS[item_type]
+
+    return """(
+        SELECT COALESCE(SUM(DISTINCT 1 << b.bit), 0)
+        FROM (
+            SELECT * FROM base_{qualities_stem}
+            UNION ALL
+            SELECT * FROM user_{qualities_stem}
+        ) q
+        JOIN quality_bits b ON b.quality = q.quality
+        WHERE q.{item_column} = {name_expr}{grip_condition}
+    )""".format(
+        qualities_stem = qualities_stem,
+        item_column = item_column,
+        name_expr = name_expr,
+        grip_condition = '' if grip_column is None else ' AND (q.{grip_column} IS NULL OR q.{grip_column} = {grip_expr})'.format(
+            grip_column = grip_column,
+            grip_expr = grip_expr
+        )
+    )
+
+
+# Give every quality a bit position, in the order of qualities.json, of the
+# user qualities and then of those only named by items, and store a quality
+# bitmask for every item (every grip, for weapons) of the base and user
+# tables in item_quality_masks, so quality filters are bitwise tests on one
+# table instead of joins through the quality views. Triggers on the user
+# tables assign bits to new qualities and keep the masks in step. Safe to
+# re-run after tables have been rebuilt
+def quality_masks_to_db(db_conn):
+    db_conn.execute('DROP TABLE IF EXISTS quality_bits')
+    db_conn.execute('DROP TABLE IF EXISTS item_quality_masks')
+    db_conn.execute(
+        '''CREATE TABLE quality_bits (
+            quality TEXT PRIMARY KEY,
+            bit INTEGER NOT NULL UNIQUE
+        )'''
+    )
+    db_conn.execute(
+        '''CREATE TABLE item_quality_masks (
+            item_type TEXT,
+            name TEXT,
+            grip TEXT,
+            quality_mask INTEGER NOT NULL
+        )'''
+    )
+    db_conn.execute('CREATE INDEX item_quality_masks_item ON item_quality_masks (item_type, name, grip)')
+
+    # Tables may be missing while the watch mode skips an invalid source
+    def exists(table_stem):
+        return db_conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", ('user_' + table_stem,)).fetchone() is not None
+
+    quality_stems = [
+        table_stem for table_stem in ['qualities'] + [qualities_stem for _, _, qualities_stem, _ in QUALITY_ITEMS.values()]
+        if exists(table_stem)
+    ]
+    if not quality_stems:
+        return
+
+    qualities = list(dict.fromkeys(
+        quality
+        for table_stem in quality_stems
+        for prefix in ['base', 'user']
+        for quality, in db_conn.execute('SELECT quality FROM {}_{} WHERE quality IS NOT NULL'.format(prefix, table_stem))
+    ))
+    if len(qualities) > MAX_QUALITY_BITS:
+        print('Only the first {} qualities get a quality mask bit; the rest are matched through the quality tables'.format(MAX_QUALITY_BITS))
+    db_conn.executemany(
+        'INSERT OR IGNORE INTO quality_bits (quality, bit) SELECT ?, COUNT(*) FROM quality_bits',
+        [(quality,) for quality in qualities[:MAX_QUALITY_BITS]]
+    )
+
+    # SQL giving a new quality the next free bit
+    def assign_bit(quality):
+        return '''INSERT OR IGNORE INTO quality_bits (quality, bit)
+            SELECT {quality}, COUNT(*) FROM quality_bits HAVING COUNT(*) < {max_bits} AND {quality} IS NOT NULL;'''.format(
+            quality = quality,
+            max_bits = MAX_QUALITY_BITS
+        )
+
+    # New user qualities get the next free bit, and items already naming
+    # them get their masks recomputed
+    if exists('qualities'):
+        qualities_table, qualities_value = trigger_table(db_conn, 'user_qualities')
+        recompute = ''.join(
+            '''UPDATE item_quality_masks SET quality_mask = {mask}
+                WHERE item_type = '{item_type}';
+                '''.format(
+                item_type = item_type,
+                mask = quality_mask_sql(item_type, 'item_quality_masks.name', 'item_quality_masks.grip')
+            )
+            for item_type, (item_stem, _, qualities_stem, _) in QUALITY_ITEMS.items()
+            if exists(item_stem) and exists(qualities_stem)
+        )
+        db_conn.execute(
+            '''CREATE TRIGGER IF NOT EXISTS {table}_quality_bit AFTER INSERT ON {table}
+            BEGIN
+                {assign_bit}
+                {recompute}
+            END'''.format(
+                table = qualities_table,
+                assign_bit = assign_bit(qualities_value('NEW', 'quality')),
+                recompute = recompute
+            )
+        )
+
+    for item_type, (item_stem, grip_column, qualities_stem, item_column) in QUALITY_ITEMS.items():
+        if not (exists(item_stem) and exists(qualities_stem)):
+            continue
+
+        grip_select = 'NULL' if grip_column is None else 'i.' + grip_column
+        db_conn.execute(
+            '''INSERT INTO item_quality_masks
+            SELECT '{item_type}', i.name, {grip_select}, {mask}
+            FROM (
+                SELECT * FROM base_{item_stem}
+                UNION ALL
+                SELECT * FROM user_{item_stem}
+            ) i'''.format(
+                item_type = item_type,
+                item_stem = item_stem,
+                grip_select = grip_select,
+                mask = quality_mask_sql(item_type, 'i.name', grip_select)
+            )
+        )
+
+        # Add, remove and replace the mask rows of user items
+        items_table, item_value = trigger_table(db_conn, 'user_' + item_stem)
+
+        def insert_mask(row):
+            grip = 'NULL' if grip_column is None else item_value(row, grip_column)
+            return "INSERT INTO item_quality_masks VALUES ('{item_type}', {name}, {grip}, {mask});".format(
+                item_type = item_type,
+                name = item_value(row, 'name'),
+                grip = grip,
+                mask = quality_mask_sql(item_type, item_value(row, 'name'), grip)
+            )
 
-    # Change working directory to data folder
-    os.chdir(
-        os.path.dirname(
-            os.path.dirname(
-                os.path.realpath(__file__)
-            ))
+        def delete_mask(row):
+            return "DELETE FROM item_quality_masks WHERE item_type = '{item_type}' AND name = {name} AND grip IS {grip};".format(
+                item_type = item_type,
+                name = item_value(row, 'name'),
+                grip = 'NULL' if grip_column is None else item_value(row, grip_column)
+            )
+
+        for event, statements in [
+            ('INSERT', [insert_mask('NEW')]),
+            ('DELETE', [delete_mask('OLD')]),
+            ('UPDATE', [delete_mask('OLD'), insert_mask('NEW')])
+        ]:
+            db_conn.execute(
+                '''CREATE TRIGGER IF NOT EXISTS {table}_quality_mask_{event_lower} AFTER {event} ON {table}
+                BEGIN
+                    {statements}
+                END'''.format(table = items_table, event = event, event_lower = event.lower(), statements = '\n'.join(statements))
+            )
+
+        # Recompute the masks of the items whose qualities changed
+        qualities_table, quality_value = trigger_table(db_conn, 'user_' + qualities_stem)
+
+        def recompute_masks(row):
+            return '''UPDATE item_quality_masks SET quality_mask = {mask}
+                WHERE item_type = '{item_type}' AND name = {name};'''.format(
+                item_type = item_type,
+                name = quality_value(row, item_column),
+                mask = quality_mask_sql(item_type, 'item_quality_masks.name', 'item_quality_masks.grip')
+            )
+
+        # Qualities named by items but by no qualities table also get a bit
+        for event, rows in [('INSERT', ['NEW']), ('DELETE', ['OLD']), ('UPDATE', ['OLD', 'NEW'])]:
+            db_conn.execute(
+                '''CREATE TRIGGER IF NOT EXISTS {table}_quality_mask_{event_lower} AFTER {event} ON {table}
+                BEGIN
+                    {assign_bit}
+                    {statements}
+                END'''.format(
+                    table = qualities_table,
+                    event = event,
+                    event_lower = event.lower(),
+                    assign_bit = assign_bit(quality_value('NEW', 'quality')) if 'NEW' in rows else '',
+                    statements = '\n'.join(recompute_masks(row) for row in rows)
+                )
+            )
+
+
+# Value of each price unit in zeni
+ZENI_PER_UNIT = {
+    'zeni': 1,
+    'bu': 10,
+    'koku': 50
+}
+
+# Item table families making up the items catalog, with the SQL for their
+# grip and category
+CATALOG_ITEMS = {
+    'weapon': ('weapons', 'grip', 'category'),
+    'armor': ('armor', 'NULL', 'NULL'),
+    'personal_effect': ('personal_effects', 'NULL', 'NULL')
+}
+
+
+# Collect weapons (one row per grip), armor and personal effects of the base
+# and user tables into one items catalog, with prices converted to zeni and
+# names translated, and covering indexes for price, rarity and category
+# queries. Triggers on the user item tables and i18n keep it in step. Safe to
+# re-run after tables have been rebuilt
+def items_to_db(db_conn):
+    db_conn.execute('DROP TABLE IF EXISTS items')
+    db_conn.execute(
+        '''CREATE TABLE items (
+            item_type TEXT,
+            name TEXT,
+            grip TEXT,
+            category TEXT,
+            name_tr TEXT,
+            reference_book TEXT,
+            reference_page INTEGER,
+            rarity INTEGER,
+            price_zeni INTEGER
+        )'''
     )
+    for index_name, columns in [
+        ('items_price', 'price_zeni, rarity, item_type, category, name_tr, name, grip'),
+        ('items_rarity', 'rarity, price_zeni, item_type, category, name_tr, name, grip'),
+        ('items_category', 'item_type, category, price_zeni, rarity, name_tr, name, grip'),
+        ('items_name', 'name, grip')
+    ]:
+        db_conn.execute('CREATE INDEX {} ON items ({})'.format(index_name, columns))
+
+    def price_zeni(value, unit):
+        return '{value} * CASE {unit} {cases} END'.format(
+            value = value,
+            unit = unit,
+            cases = ' '.join("WHEN '{}' THEN {}".format(price_unit, zeni) for price_unit, zeni in ZENI_PER_UNIT.items())
+        )
+
+    def translated(name):
+        return 'COALESCE((SELECT string_tr FROM i18n WHERE string = {name}), {name})'.format(name = name)
+
+    for item_type, (item_stem, grip, category) in CATALOG_ITEMS.items():
+
+        # Tables may be missing while the watch mode skips an invalid source
+        if db_conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", ('user_' + item_stem,)).fetchone() is None:
+            continue
+
+        db_conn.execute(
+            '''INSERT INTO items
+            SELECT '{item_type}', name, {grip}, {category}, {name_tr}, reference_book, reference_page, rarity, {price_zeni}
+            FROM (
+                SELECT * FROM base_{item_stem}
+                UNION ALL
+                SELECT * FROM user_{item_stem}
+            )'''.format(
+                item_type = item_type,
+                item_stem = item_stem,
+                grip = grip,
+                category = category,
+                name_tr = translated('name'),
+                price_zeni = price_zeni('price_value', 'price_unit')
+            )
+        )
+
+        # Add, remove and replace the catalog rows of user items
+        items_table, item_value = trigger_table(db_conn, 'user_' + item_stem)
+
+        def insert_item(row):
+            return "INSERT INTO items VALUES ('{item_type}', {name}, {grip}, {category}, {name_tr}, {book}, {page}, {rarity}, {price_zeni});".format(
+                item_type = item_type,
+                name = item_value(row, 'name'),
+                grip = grip if grip == 'NULL' else item_value(row, grip),
+                category = category if category == 'NULL' else item_value(row, category),
+                name_tr = translated(item_value(row, 'name')),
+                book = item_value(row, 'reference_book'),
+                page = item_value(row, 'reference_page'),
+                rarity = item_value(row, 'rarity'),
+                price_zeni = price_zeni(item_value(row, 'price_value'), item_value(row, 'price_unit'))
+            )
+
+        def delete_item(row):
+            return "DELETE FROM items WHERE item_type = '{item_type}' AND name = {name} AND grip IS {grip};".format(
+                item_type = item_type,
+                name = item_value(row, 'name'),
+                grip = grip if grip == 'NULL' else item_value(row, grip)
+            )
+
+        for event, statements in [
+            ('INSERT', [insert_item('NEW')]),
+            ('DELETE', [delete_item('OLD')]),
+            ('UPDATE', [delete_item('OLD'), insert_item('NEW')])
+        ]:
+            db_conn.execute(
+                '''CREATE TRIGGER IF NOT EXISTS {table}_items_{event_lower} AFTER {event} ON {table}
+                BEGIN
+                    {statements}
+                END'''.format(table = items_table, event = event, event_lower = event.lower(), statements = '\n'.join(statements))
+            )
+
+    # Retranslate names when translations are loaded, changed or removed
+    i18n_table, i18n_value = trigger_table(db_conn, 'i18n', ['string'])
+    for event, rows in [('INSERT', ['NEW']), ('DELETE', ['OLD']), ('UPDATE', ['OLD', 'NEW'])]:
+        db_conn.execute(
+            '''CREATE TRIGGER IF NOT EXISTS {table}_items_{event_lower} AFTER {event} ON {table}
+            BEGIN
+                {statements}
+            END'''.format(
+                table = i18n_table,
+                event = event,
+                event_lower = event.lower(),
+                statements = '\n'.join(
+                    'UPDATE items SET name_tr = {name_tr} WHERE name = {string};'.format(
+                        name_tr = translated('items.name'),
+                        string = i18n_value(row, 'string')
+                    )
+                    for row in rows
+                )
+            )
+        )
+
+
+# Technique categories every character may learn from, as in
+# DataAccessLayer::qsm_gettechniquetable
+OPEN_TECHNIQUE_CATEGORIES = ['Mahō', 'Item Patterns', 'Signature Scrolls']
+
+
+def base_and_user(table_stem):
+    return '(SELECT * FROM base_{table_stem} UNION ALL SELECT * FROM user_{table_stem})'.format(table_stem = table_stem)
+
+
+# SELECT of the (technique_group, rank, technique) rows of technique groups:
+# every technique with a rank under its category and under its subcategory,
+# at its lowest rank should a name be given twice. Techniques without a rank are never eligible by group, as the app's
+# rank = NULL never matches. technique, if given, is an SQL expression
+# restricting the rows to one technique
+def technique_groups_sql(technique = None):
+    technique_filter = '' if technique is None else ' AND name = ' + technique
+
+    return """SELECT technique_group, MIN(rank), name
+    FROM (
+        SELECT category AS technique_group, rank, name FROM {techniques}
+        WHERE category IS NOT NULL AND rank IS NOT NULL{technique_filter}
+        UNION ALL
+        SELECT subcategory, rank, name FROM {techniques}
+        WHERE subcategory IS NOT NULL AND rank IS NOT NULL{technique_filter}
+    )
+    GROUP BY technique_group, name""".format(
+        techniques = base_and_user('techniques'),
+        technique_filter = technique_filter
+    )
+
+
+# SELECT of the (school, rank, technique) rows of school special access,
+# following DataAccessLayer::qsm_gettechniquetable: the special access
+# techniques and the techniques of the special access groups up to the rank
+# of each curriculum row. school and technique, if given, are SQL
+# expressions restricting the rows to one school or technique
+def school_special_access_sql(school = None, technique = None):
+    school_filter = '' if school is None else ' AND c.school = ' + school
+
+    return """SELECT c.school, c.rank, g.technique
+    FROM {curriculum} c
+    JOIN technique_groups g ON g.technique_group = c.advance AND g.rank <= c.rank
+    WHERE c.type = 'technique_group' AND c.special_access = 1{school_filter}{group_filter}
+    UNION
+    SELECT c.school, c.rank, t.name
+    FROM {curriculum} c
+    JOIN {techniques} t ON t.name = c.advance
+    WHERE c.type = 'technique' AND c.special_access = 1{school_filter}{name_filter}""".format(
+        curriculum = base_and_user('curriculum'),
+        techniques = base_and_user('techniques'),
+        school_filter = school_filter,
+        group_filter = '' if technique is None else ' AND g.technique = ' + technique,
+        name_filter = '' if technique is None else ' AND t.name = ' + technique
+    )
+
+
+# SELECT of the (school, rank) rows of the ranks each school's curriculum has
+def school_ranks_sql(school = None):
+    school_filter = '' if school is None else ' AND school = ' + school
+
+    return """SELECT DISTINCT school, rank FROM {curriculum}
+    WHERE school IS NOT NULL AND rank IS NOT NULL{school_filter}""".format(
+        curriculum = base_and_user('curriculum'),
+        school_filter = school_filter
+    )
+
+
+# SELECT of the (school, technique_group) rows of the groups each school
+# has available
+def school_technique_groups_sql(school = None):
+    school_filter = '' if school is None else ' AND school = ' + school
+
+    return """SELECT DISTINCT school, technique FROM {techniques_available}
+    WHERE school IS NOT NULL AND technique IS NOT NULL{school_filter}""".format(
+        techniques_available = base_and_user('school_techniques_available'),
+        school_filter = school_filter
+    )
+
+
+# SELECT of the (title, technique) rows of title technique eligibility: the
+# special access techniques of a title, and the techniques of its special
+# access groups up to the title's rank. The app's i_gettitletechgrouprank
+# takes the rank of the last advancement of the title that has one, or 0;
+# the highest rank is used here, as rows have no order, which is the same
+# while a title's advancements list ranks in ascending order
+def title_eligibility_sql(title = None, technique = None):
+    title_filter = '' if title is None else ' AND ta.title = ' + title
+
+    return """SELECT ta.title, g.technique
+    FROM {title_advancements} ta
+    JOIN technique_groups g ON g.technique_group = ta.name AND g.rank <= (
+        SELECT COALESCE(MAX(tr.rank), 0) FROM {title_advancements} tr WHERE tr.title = ta.title
+    )
+    WHERE ta.type = 'technique_group' AND ta.special_access = 1{title_filter}{group_filter}
+    UNION
+    SELECT ta.title, t.name
+    FROM {title_advancements} ta
+    JOIN {techniques} t ON t.name = ta.name
+    WHERE ta.type = 'technique' AND ta.special_access = 1{title_filter}{name_filter}""".format(
+        title_advancements = base_and_user('title_advancements'),
+        techniques = base_and_user('techniques'),
+        title_filter = title_filter,
+        group_filter = '' if technique is None else ' AND g.technique = ' + technique,
+        name_filter = '' if technique is None else ' AND t.name = ' + technique
+    )
+
+
+# Which techniques a school allows at each of its ranks, following
+# DataAccessLayer::qsm_gettechniquetable: at every curriculum rank a school
+# has, the techniques of its available groups and of the open categories up
+# to that rank, plus the special access techniques of that rank. Only the
+# special access is stored per school rank; the groups are joined when the
+# view is read. A technique is listed once, with special access if it has
+# it and otherwise under the first of the school's groups holding it. The
+# parts are only ever UNION ALL, so sqlite pushes a school and rank filter
+# into each of them and a lookup stays a few index searches
+SCHOOL_ELIGIBILITY_VIEW = """CREATE VIEW school_rank_technique_eligibility AS
+SELECT sr.school, sr.rank, g.technique, 0 AS special_access
+FROM school_ranks sr
+JOIN school_technique_groups a ON a.school = sr.school
+JOIN technique_groups g ON g.technique_group = a.technique_group AND g.rank <= sr.rank
+WHERE {not_special} AND {not_earlier}
+UNION ALL
+SELECT sr.school, sr.rank, g.technique, 0
+FROM school_ranks sr
+JOIN technique_groups g ON g.technique_group IN ({open_categories}) AND g.rank <= sr.rank
+WHERE {not_special} AND {not_earlier} AND NOT EXISTS (
+    SELECT 1 FROM school_technique_groups a
+    WHERE a.school = sr.school AND a.technique_group = g.technique_group
+)
+UNION ALL
+SELECT school, rank, technique, 1 FROM school_special_access"""
+
+# Conditions of the group parts of the view: the technique has no special
+# access at the school rank, and no earlier group of the school gives it
+SCHOOL_ELIGIBILITY_NOT_SPECIAL = """NOT EXISTS (
+    SELECT 1 FROM school_special_access s
+    WHERE s.school = sr.school AND s.rank = sr.rank AND s.technique = g.technique
+)"""
+SCHOOL_ELIGIBILITY_NOT_EARLIER = """NOT EXISTS (
+    SELECT 1 FROM technique_groups e
+    WHERE e.technique = g.technique AND e.technique_group < g.technique_group AND e.rank <= sr.rank AND (
+        e.technique_group IN ({open_categories})
+        OR EXISTS (SELECT 1 FROM school_technique_groups ea WHERE ea.school = sr.school AND ea.technique_group = e.technique_group)
+    )
+)"""
+
+
+# Materialize the technique groups, school ranks, available groups and
+# special access the school_rank_technique_eligibility view joins, and which techniques each
+# title allows, keyed for index lookups by the advancement screens; each
+# grows with the techniques or the curricula, not with their product.
+# Triggers on the user techniques, curricula, techniques available and title
+# advancements recompute the rows of the technique, school or title that changed. Safe
+# to re-run after tables have been rebuilt
+def technique_eligibility_to_db(db_conn):
+    db_conn.execute('DROP VIEW IF EXISTS school_rank_technique_eligibility')
+    for table in ['technique_groups', 'school_ranks', 'school_technique_groups', 'school_special_access', 'title_technique_eligibility']:
+        db_conn.execute('DROP TABLE IF EXISTS ' + table)
+    db_conn.execute(
+        '''CREATE TABLE technique_groups (
+            technique_group TEXT,
+            rank INTEGER,
+            technique TEXT,
+            PRIMARY KEY (technique_group, rank, technique)
+        ) WITHOUT ROWID'''
+    )
+    db_conn.execute(
+        '''CREATE TABLE school_ranks (
+            school TEXT,
+            rank INTEGER,
+            PRIMARY KEY (school, rank)
+        ) WITHOUT ROWID'''
+    )
+    db_conn.execute(
+        '''CREATE TABLE school_technique_groups (
+            school TEXT,
+            technique_group TEXT,
+            PRIMARY KEY (school, technique_group)
+        ) WITHOUT ROWID'''
+    )
+    db_conn.execute(
+        '''CREATE TABLE school_special_access (
+            school TEXT,
+            rank INTEGER,
+            technique TEXT,
+            PRIMARY KEY (school, rank, technique)
+        ) WITHOUT ROWID'''
+    )
+    db_conn.execute(
+        '''CREATE TABLE title_technique_eligibility (
+            title TEXT,
+            technique TEXT,
+            PRIMARY KEY (title, technique)
+        ) WITHOUT ROWID'''
+    )
+    db_conn.execute('CREATE INDEX technique_groups_technique ON technique_groups (technique)')
+    db_conn.execute('CREATE INDEX school_special_access_technique ON school_special_access (technique)')
+    db_conn.execute('CREATE INDEX title_technique_eligibility_technique ON title_technique_eligibility (technique)')
+
+    # Tables may be missing while the watch mode skips an invalid source
+    def exists(table_stem):
+        return db_conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", ('user_' + table_stem,)).fetchone() is not None
+
+    techniques = exists('techniques')
+    schools = techniques and exists('curriculum') and exists('school_techniques_available')
+    titles = techniques and exists('title_advancements')
+
+    if techniques:
+        db_conn.execute('INSERT INTO technique_groups ' + technique_groups_sql())
+    if schools:
+        db_conn.execute('INSERT INTO school_ranks ' + school_ranks_sql())
+        db_conn.execute('INSERT INTO school_technique_groups ' + school_technique_groups_sql())
+        db_conn.execute('INSERT INTO school_special_access ' + school_special_access_sql())
+        open_categories = ', '.join("'{}'".format(category) for category in OPEN_TECHNIQUE_CATEGORIES)
+        db_conn.execute(
+            SCHOOL_ELIGIBILITY_VIEW.format(
+                open_categories = open_categories,
+                not_special = SCHOOL_ELIGIBILITY_NOT_SPECIAL,
+                not_earlier = SCHOOL_ELIGIBILITY_NOT_EARLIER.format(open_categories = open_categories)
+            )
+        )
+    if titles:
+        db_conn.execute('INSERT INTO title_technique_eligibility ' + title_eligibility_sql())
+
+    def refresh_school(school):
+        return '''DELETE FROM school_ranks WHERE school = {school};
+            INSERT INTO school_ranks {ranks};
+            DELETE FROM school_special_access WHERE school = {school};
+            INSERT INTO school_special_access {special_access};'''.format(
+            school = school,
+            ranks = school_ranks_sql(school = school),
+            special_access = school_special_access_sql(school = school)
+        )
+
+    def refresh_school_groups(school):
+        return '''DELETE FROM school_technique_groups WHERE school = {school};
+            INSERT INTO school_technique_groups {select};'''.format(school = school, select = school_technique_groups_sql(school = school))
+
+    def refresh_title(title):
+        return '''DELETE FROM title_technique_eligibility WHERE title = {title};
+            INSERT INTO title_technique_eligibility {select};'''.format(title = title, select = title_eligibility_sql(title = title))
+
+    # The groups of the technique are refreshed first, as the rest join them
+    def refresh_technique(technique):
+        statements = '''DELETE FROM technique_groups WHERE technique = {technique};
+            INSERT INTO technique_groups {select};'''.format(technique = technique, select = technique_groups_sql(technique = technique))
+        if schools:
+            statements += '''DELETE FROM school_special_access WHERE technique = {technique};
+            INSERT INTO school_special_access {select};'''.format(
+                technique = technique,
+                select = school_special_access_sql(technique = technique)
+            )
+        if titles:
+            statements += '''DELETE FROM title_technique_eligibility WHERE technique = {technique};
+            INSERT INTO title_technique_eligibility {select};'''.format(
+                technique = technique,
+                select = title_eligibility_sql(technique = technique)
+            )
+        return statements
+
+    # Table stem, column naming the school, title or technique, and refresh
+    triggers = []
+    if schools:
+        triggers += [
+            ('curriculum', 'school', refresh_school),
+            ('school_techniques_available', 'school', refresh_school_groups)
+        ]
+    if titles:
+        triggers += [('title_advancements', 'title', refresh_title)]
+    if techniques:
+        triggers += [('techniques', 'name', refresh_technique)]
+
+    for table_stem, column, refresh in triggers:
+        table, value = trigger_table(db_conn, 'user_' + table_stem)
+        for event, rows in [('INSERT', ['NEW']), ('DELETE', ['OLD']), ('UPDATE', ['OLD', 'NEW'])]:
+            db_conn.execute(
+                '''CREATE TRIGGER IF NOT EXISTS {table}_eligibility_{event_lower} AFTER {event} ON {table}
+                BEGIN
+                    {statements}
+                END'''.format(
+                    table = table,
+                    event = event,
+                    event_lower = event.lower(),
+                    statements = '\n'.join(refresh(value(row, column)) for row in rows)
+                )
+            )
+
+
+# SQL selecting the rows of the junction table of a list field for the list
+# list_expr of the row keyed key_expr, one per value numbered from 0
+def list_values_sql(key_expr, list_expr):
+    return """SELECT * FROM (
+            WITH RECURSIVE split(key, seq, value, rest) AS (
+                SELECT {key}, -1, NULL, {list} || ', ' WHERE {list} <> ''
+                UNION ALL
+                SELECT key, seq + 1, substr(rest, 1, instr(rest, ', ') - 1), substr(rest, instr(rest, ', ') + 2)
+                FROM split WHERE rest <> ''
+            )
+            SELECT key, seq, value FROM split WHERE seq >= 0
+        )""".format(key = key_expr, list = list_expr)
+
+
+# Triggers on the user tables with list fields keeping the user junction
+# tables (see LIST_FIELDS) in step with their lists, so writers only need
+# to fill the list fields. Rows already in the junction table for a new row
+# are replaced, as imports may copy them before the row itself
+def list_fields_to_db(db_conn):
+    for (table_stem, tr_field), (junction, key, _, key_field) in LIST_FIELDS.items():
+        if not db_conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", ('user_' + table_stem,)).fetchone():
+            continue
+
+        table, value = trigger_table(db_conn, 'user_' + table_stem)
+
+        def delete_values(row):
+            return 'DELETE FROM user_{junction} WHERE {key} = {key_text};'.format(
+                junction = junction,
+                key = key,
+                key_text = value(row, key_field)
+            )
+
+        def insert_values(row):
+            return 'INSERT INTO user_{junction} {values};'.format(
+                junction = junction,
+                values = list_values_sql(value(row, key_field), value(row, tr_field))
+            )
+
+        for event, statements in [
+            ('INSERT', [delete_values('NEW'), insert_values('NEW')]),
+            ('DELETE', [delete_values('OLD')]),
+            ('UPDATE', [delete_values('OLD'), delete_values('NEW'), insert_values('NEW')])
+        ]:
+            db_conn.execute(
+                '''CREATE TRIGGER IF NOT EXISTS {table}_{junction}_{event_lower} AFTER {event} ON {table}
+                BEGIN
+                    {statements}
+                END'''.format(
+                    table = table,
+                    junction = junction,
+                    event = event,
+                    event_lower = event.lower(),
+                    statements = '\n'.join(statements)
+                )
+            )
+
+
+# Builders of the tables derived from the source tables, with the sources
+# whose tables each reads or puts triggers on, so the watch mode reruns only
+# the builders reading a rebuilt source
+DERIVED_BUILDERS = [
+    (items_to_db, ['weapons', 'armor', 'personal_effects']),
+    (quality_masks_to_db, ['qualities', 'weapons', 'armor', 'personal_effects']),
+    (technique_eligibility_to_db, ['techniques', 'schools', 'titles']),
+    (list_fields_to_db, ['advantages', 'schools'])
+]
+
+
+# Tables and views the derived builders create, with the tracked tables
+# (see data_versions_to_db) their rows are computed from, so readers caching
+# them know which changes make them stale
+QUALITY_MASK_TABLES = ['user_qualities'] + [
+    'user_' + table_stem
+    for item_stem, _, qualities_stem, _ in QUALITY_ITEMS.values()
+    for table_stem in [item_stem, qualities_stem]
+]
+DERIVED_TABLES = {
+    'items': ['user_weapons', 'user_armor', 'user_personal_effects', 'i18n'],
+    'quality_bits': QUALITY_MASK_TABLES,
+    'item_quality_masks': QUALITY_MASK_TABLES,
+    'technique_groups': ['user_techniques'],
+    'school_ranks': ['user_curriculum'],
+    'school_technique_groups': ['user_school_techniques_available'],
+    'school_special_access': ['user_curriculum', 'user_techniques'],
+    'school_rank_technique_eligibility': ['user_curriculum', 'user_techniques', 'user_school_techniques_available'],
+    'title_technique_eligibility': ['user_title_advancements', 'user_techniques']
+}
+
+
+# Read an i18n csv as the app's DataAccessLayer::importCSV does: empty
+# translations are NULL and %0A stands for a line break. Later rows win
+def read_i18n(i18n_file):
+    with open(i18n_file, encoding = 'utf8', newline = '') as f:
+        rows = {}
+        for row in csv.reader(f):
+            if row:
+                string_tr = row[1].replace('%0A', '\n') if len(row) > 1 and row[1] != '' else None
+                rows[row[0].replace('%0A', '\n')] = string_tr
+
+    return rows
+
+
+# Copy the built db_file to locale_file with the i18n table loaded from
+# i18n_file and the translations of the base rows stored: each base_ table
+# with translated fields moves to translated_base_{table_stem} with a
+# {tr_field}_tr column per field and becomes a view over it, so the app's
+# views read base rows without joining i18n. Triggers on i18n keep the
+# stored translations in step with edits from the localisation editor.
+# table_specs is TABLE_SPECS of the build, passed in as workers may not
+# share the building process's memory
+def locale_db(db_file, locale_file, locale, i18n_file, table_specs, release = False, page_sizes = (1024, 2048, 4096)):
+    start = time.perf_counter()
+
+    source_conn = sqlite3.connect(db_file)
+    db_conn = connect_db(locale_file)
+    source_conn.backup(db_conn)
+    source_conn.close()
+
+    db_conn.executemany('INSERT INTO i18n VALUES (?, ?)', read_i18n(i18n_file).items())
+    db_conn.execute('CREATE TABLE build_locale (locale TEXT PRIMARY KEY)')
+    db_conn.execute('INSERT INTO build_locale VALUES (?)', (locale,))
+
+    for table_stem, spec in table_specs.items():
+        tr_fields = spec['tr_fields']
+        if not tr_fields:
+            continue
+        base_table = 'base_' + table_stem
+        storage = 'translated_' + base_table
+        create_stmt, = db_conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (base_table,)).fetchone()
+        columns = [column_info[1] for column_info in db_conn.execute('PRAGMA table_info({})'.format(base_table))]
+
+        drop_views(db_conn, table_stem, spec)
+        db_conn.execute(create_stmt.replace(base_table, storage, 1))
+        for tr_field in tr_fields:
+            db_conn.execute('ALTER TABLE {} ADD COLUMN {}_tr TEXT'.format(storage, tr_field))
+        db_conn.execute(
+            '''INSERT INTO {storage}
+            SELECT t.*{tr_select} FROM {base_table} t
+            {tr_join}
+            ORDER BY t.rowid'''.format(
+                storage = storage,
+                base_table = base_table,
+                tr_select = ''.join(
+                    ', ' + tr_expression(table_stem, tr_field, 't.' + tr_field, 'i18n_{}.string_tr'.format(tr_field), lambda field: 't.' + field)
+                    for tr_field in tr_fields
+                ),
+                tr_join = '\n'.join(
+                    'LEFT JOIN i18n i18n_{tr_field} ON t.{tr_field} = i18n_{tr_field}.string'.format(tr_field = tr_field)
+                    for tr_field in tr_fields
+                )
+            )
+        )
+        db_conn.execute('DROP TABLE ' + base_table)
+        for index_columns in spec['indexes'] or []:
+            db_conn.execute(index_definition(storage, index_columns))
+        db_conn.execute(
+            'CREATE VIEW {base_table} AS\nSELECT {columns}\nFROM {storage} t'.format(
+                base_table = base_table,
+                columns = ', '.join('t.' + column for column in columns),
+                storage = storage
+            )
+        )
+        create_views(db_conn, table_stem, spec, translated_columns = columns)
+
+        # The i18n triggers below find the rows holding a string by each
+        # tr_field; list values are found through the value column index
+        # every junction table has
+        indexed = {
+            db_conn.execute('PRAGMA index_info({})'.format(index_name)).fetchone()[2]
+            for _, index_name, *_ in db_conn.execute('PRAGMA index_list({})'.format(storage))
+        }
+        for tr_field in tr_fields:
+            if tr_field not in indexed:
+                db_conn.execute(index_definition(storage, [tr_field]))
+
+        # Rows whose translation of tr_field depends on the i18n string of row:
+        # those holding the string and, for lists, those having it as a value
+        def depends_on(tr_field, row):
+            condition = '{tr_field} = {row}.string'.format(tr_field = tr_field, row = row)
+            if (table_stem, tr_field) in LIST_FIELDS:
+                junction, key, value, key_field = LIST_FIELDS[(table_stem, tr_field)]
+                condition += ' OR {key_field} IN (SELECT {key} FROM {junction} WHERE {value} = {row}.string)'.format(
+                    key_field = key_field,
+                    key = key,
+                    junction = junction,
+                    value = value,
+                    row = row
+                )
+            return condition
+
+        for tr_field in tr_fields:
+            for event, rows in [('INSERT', ['NEW']), ('DELETE', ['OLD']), ('UPDATE', ['OLD', 'NEW'])]:
+                db_conn.execute(
+                    '''CREATE TRIGGER {storage}_{tr_field}_tr_{event_lower} AFTER {event} ON i18n
+                    BEGIN
+                        {statements}
+                    END'''.format(
+                        storage = storage,
+                        tr_field = tr_field,
+                        event = event,
+                        event_lower = event.lower(),
+                        statements = '\n'.join(
+                            'UPDATE {storage} SET {tr_field}_tr = {expression} WHERE {condition};'.format(
+                                storage = storage,
+                                tr_field = tr_field,
+                                expression = tr_expression(
+                                    table_stem,
+                                    tr_field,
+                                    '{}.{}'.format(storage, tr_field),
+                                    '(SELECT string_tr FROM i18n WHERE string = {}.{})'.format(storage, tr_field),
+                                    lambda field: '{}.{}'.format(storage, field)
+                                ),
+                                condition = depends_on(tr_field, row)
+                            )
+                            for row in rows
+                        )
+                    )
+                )
+
+    db_conn.commit()
+    db_conn.close()
+    if release:
+        release_db(locale_file, page_sizes)
+
+    return locale, time.perf_counter() - start
+
+
+# Build a db per locale from the built db_file in parallel worker processes,
+# each named after db_file with the locale appended and loading its
+# translations from i18n_dir
+def locale_dbs_to_files(db_file, locales, release = False, page_sizes = (1024, 2048, 4096), jobs = None, i18n_dir = 'i18n'):
+    import concurrent.futures
+
+    stem, extension = os.path.splitext(db_file)
+    with concurrent.futures.ProcessPoolExecutor(max_workers = jobs) as executor:
+        futures = [
+            executor.submit(
+                locale_db,
+                db_file,
+                '{}_{}{}'.format(stem, locale, extension),
+                locale,
+                os.path.join(i18n_dir, 'i18n_{}.csv'.format(locale)),
+                TABLE_SPECS,
+                release,
+                page_sizes
+            )
+            for locale in locales
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            locale, seconds = future.result()
+            print('Built {}_{}{} in {:.2f} s'.format(stem, locale, extension, seconds))
+
+
+# Prepare the built db for distribution: ANALYZE so the planner statistics
+# (sqlite_stat1) ship with it, then VACUUM INTO a fresh file for each
+# candidate page size, dropping free pages, and keep the smallest artifact.
+# Artifact size and the lookup benchmark are reported before and after
+def release_db(db_file, page_sizes):
+    import lookup_benchmark
+
+    candidates = {'built': db_file}
+    results = {'built': (os.path.getsize(db_file), lookup_benchmark.run_benchmark(db_file))}
+
+    db_conn = sqlite3.connect(db_file)
+    db_conn.execute('ANALYZE')
+    db_conn.commit()
+    for page_size in page_sizes:
+        candidate = '{}.{}'.format(db_file, page_size)
+        if os.path.exists(candidate):
+            os.remove(candidate)
+        db_conn.execute('PRAGMA page_size = {:d}'.format(page_size))
+        db_conn.execute('VACUUM INTO ?', (candidate,))
+        candidates[str(page_size)] = candidate
+        results[str(page_size)] = (os.path.getsize(candidate), lookup_benchmark.run_benchmark(candidate))
+    db_conn.close()
+
+    chosen = min(
+        [label for label in candidates if label != 'built'],
+        key = lambda label: results[label][0]
+    )
+
+    print('Artifact size (bytes): ' + ', '.join(
+        '{} {:,}'.format(label, results[label][0]) for label in candidates
+    ))
+    lookup_benchmark.print_benchmark(
+        list(candidates),
+        [results[label][1] for label in candidates]
+    )
+    print('Keeping page size', chosen)
+
+    for label, candidate in candidates.items():
+        if label not in ('built', chosen):
+            os.remove(candidate)
+    os.replace(candidates[chosen], db_file)
+
+
+# Times the stages of a build and, through tracemalloc, records the peak
+# memory allocated by Python during each; does nothing unless enabled
+class BuildProfiler:
+
+    def __init__(self, enabled = False):
+        self.enabled = enabled
+        self.stages = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        start_memory, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            self.stages.append((name, time.perf_counter() - start, peak - start_memory))
+
+    def report(self):
+        if not self.enabled:
+            return
+        print('{:30}{:>10}{:>10}'.format('stage', 'ms', 'peak KB'))
+        for name, seconds, peak in self.stages:
+            print('{:30}{:>10.1f}{:>10.0f}'.format(name, 1000 * seconds, peak / 1024))
+        print('{:30}{:>10.1f}{:>10.0f}'.format(
+            'total',
+            1000 * sum(seconds for _, seconds, _ in self.stages),
+            max((peak for _, _, peak in self.stages), default = 0) / 1024
+        ))
+        tracemalloc.stop()
+
+
+def main(interned = False, release = False, page_sizes = (1024, 2048, 4096), locales = (), jobs = None, data_dir = None, profile = False):
+
+    # Read from and write to the data folder
+    if data_dir is None:
+        data_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+    db_file = os.path.join(data_dir, 'paperblossoms.db')
 
     # Open connection
-    db_conn = connect_db('paperblossoms.db')
+    db_conn = connect_db(db_file)
+    profiler = BuildProfiler(profile)
 
     # Descriptions and translations
-    desc_to_db(db_conn)
-    translations_to_db(db_conn)
+    with profiler.stage('descriptions and translations'):
+        desc_to_db(db_conn)
+        translations_to_db(db_conn)
 
-    # Easy tables
-    rings_to_db(db_conn)
-    skills_to_db(db_conn)
-    techniques_to_db(db_conn)
-    advantages_to_db(db_conn)
-    q8_to_db(db_conn)
-    titles_to_db(db_conn)
-    patterns_to_db(db_conn)
+    # Data sources
+    for source in SOURCES:
+        with profiler.stage(source):
+            source_to_db(db_conn, source, data_dir = data_dir)
 
-    # Equipment
-    qualities_to_db(db_conn)
-    personal_effects_to_db(db_conn)
-    armor_to_db(db_conn)
-    weapons_to_db(db_conn)
+    # Optionally store translatable strings once, by id
+    if interned:
+        with profiler.stage('intern strings'):
+            intern_strings(db_conn)
 
-    # The big guns
-    clans_to_db(db_conn)
-    heritage_to_db(db_conn)
-    schools_to_db(db_conn)
+    # Unified item catalog and quality bitmasks for equipment filtering
+    with profiler.stage('items'):
+        items_to_db(db_conn)
+        quality_masks_to_db(db_conn)
+
+    # Techniques each school rank and title gives access to
+    with profiler.stage('technique eligibility'):
+        technique_eligibility_to_db(db_conn)
+
+    # User advantage types and school roles follow their lists
+    with profiler.stage('list fields'):
+        list_fields_to_db(db_conn)
+
+    # Change tracking for the mutable tables
+    with profiler.stage('data versions'):
+        data_versions_to_db(db_conn)
+
+    # Which views select which translations and descriptions
+    with profiler.stage('view catalog'):
+        view_catalog_to_db(db_conn)
 
     # Commit and close connection
-    db_conn.commit()
+    with profiler.stage('commit'):
+        db_conn.commit()
     db_conn.close()
 
+    # Per-locale dbs with the translations applied, from this build
+    if locales:
+        with profiler.stage('locale dbs'):
+            locale_dbs_to_files(db_file, locales, release, page_sizes, jobs, os.path.join(data_dir, 'i18n'))
+
+    # Optimise the artifact for shipping
+    if release:
+        with profiler.stage('release'):
+            release_db(db_file, page_sizes)
+
+    profiler.report()
+
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description = 'Utility to build the paperblossoms db from the json data files.')
+    parser.add_argument(
+        '--intern-strings',
+        action = 'store_true',
+        help = 'Store each translatable string once in a strings table and refer to it by id, keeping compatibility views over the text columns'
+    )
+    parser.add_argument(
+        '--release',
+        action = 'store_true',
+        help = 'Ship planner statistics and rewrite the db without free pages at the page size giving the smallest file'
+    )
+    parser.add_argument(
+        '--page-size',
+        type = int,
+        nargs = '+',
+        default = [1024, 2048, 4096],
+        help = 'Candidate page sizes for --release (defaults to 1024 2048 4096)'
+    )
+    parser.add_argument(
+        '--watch',
+        action = 'store_true',
+        help = 'Keep running, revalidating and rebuilding the affected tables whenever the json, schemas or translations change'
+    )
+    parser.add_argument(
+        '--locales',
+        nargs = '+',
+        default = [],
+        metavar = 'LOCALE',
+        help = 'Also build paperblossoms_<locale>.db for each locale, with the i18n table loaded and the translations of the base rows stored'
+    )
+    parser.add_argument('--jobs', type = int, help = 'Number of processes building locale dbs (defaults to the number of processors)')
+    parser.add_argument('--data-dir', help = 'Data folder holding json and i18n, where the db is written (defaults to the one this script is in)')
+    parser.add_argument('--profile', action = 'store_true', help = 'Report the time and peak Python memory of each build stage')
+    args = parser.parse_args()
+    if args.locales and args.intern_strings:
+        parser.error('--locales builds from the text db and cannot be combined with --intern-strings')
+
+    if args.watch:
+        import watch_data
+        watch_data.main(data_dir = args.data_dir)
+    else:
+        main(args.intern_strings, args.release, args.page_size, args.locales, args.jobs, args.data_dir, args.profile)
@@ -0,0 +1,198 @@
+import argparse
+import json
+import pathlib
+import sqlite3
+import sys
+
+import jsonschema
+
+import check_db
+import json_to_db
+
+
+# Find the data source of each pack file; a pack is a folder laid out like
+# data/json, or individual files named like the data/json files
+def pack_sources(paths):
+    sources_by_file = {
+        filename: source for source, (filename, _, _) in json_to_db.SOURCES.items()
+    }
+    pack_files = []
+    for path in map(pathlib.Path, paths):
+        for pack_file in sorted(path.glob('*.json')) if path.is_dir() else [path]:
+            if pack_file.name not in sources_by_file:
+                raise SystemExit('Do not know which tables ' + str(pack_file) + ' belongs to')
+            pack_files.append((sources_by_file[pack_file.name], pack_file))
+
+    # Load in build order so parents are loaded before the tables using them
+    order = list(json_to_db.SOURCES)
+    return sorted(pack_files, key = lambda pack_file: order.index(pack_file[0]))
+
+
+# Recursively remove enum constraints, which list only the base game names and
+# so reject homebrew entries referring to other homebrew
+def strip_enums(schema_object):
+    if isinstance(schema_object, dict):
+        return {
+            key: strip_enums(value)
+            for key, value in schema_object.items()
+            if key != 'enum'
+        }
+    if isinstance(schema_object, list):
+        return [strip_enums(value) for value in schema_object]
+
+    return schema_object
+
+
+# Validate a pack file against the schema of the data file it mirrors
+def validate_pack_file(data_dir, pack_file, data, relax_enums):
+    schema_filepath = data_dir.joinpath('json_schema', pack_file.stem + '.schema.json')
+    if not schema_filepath.exists():
+        return True
+    with open(schema_filepath, encoding = 'utf8') as f:
+        schema = json.load(f)
+    if relax_enums:
+        schema = strip_enums(schema)
+
+    try:
+        jsonschema.validate(data, schema)
+        print('Validated ' + str(pack_file))
+    except jsonschema.exceptions.ValidationError as err:
+        print('Could not validate ' + str(pack_file) + '!')
+        print(err.message)
+        return False
+
+    return True
+
+
+def primary_key(db_conn, table):
+
+    # Interned tables keep their primary key on the storage table
+    if db_conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'view' AND name = ?", (table,)).fetchone():
+        table = 'interned_' + table
+
+    return [
+        column_info[1]
+        for column_info in sorted(db_conn.execute('PRAGMA table_info({})'.format(table)), key = lambda column_info: column_info[5])
+        if column_info[5] > 0
+    ]
+
+
+# Flatten a pack document with the source's row generator into temporary
+# pack_{table_stem} tables shaped like the base tables; returns the stems
+def stage_source(db_conn, source, data, staged_stems):
+
+    # The list field triggers of the user tables fill their junction tables
+    junctions = [junction for junction, _, _, _ in json_to_db.LIST_FIELDS.values()]
+
+    def create_staging_tables(rows):
+        for table_stem, row in rows:
+            if table_stem in junctions:
+                continue
+            if table_stem not in staged_stems:
+                if not db_conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", ('user_' + table_stem,)).fetchone():
+                    raise SystemExit('There is no user table for ' + table_stem + ' data')
+                db_conn.execute(
+                    'CREATE TEMP TABLE pack_{table_stem} AS SELECT * FROM base_{table_stem} WHERE 0'.format(table_stem = table_stem)
+                )
+                staged_stems.append(table_stem)
+            yield table_stem, row
+
+    json_to_db.write_rows(db_conn, create_staging_tables(json_to_db.SOURCES[source][2](data)), prefix = 'pack')
+
+
+# Rows of the staged packs whose primary key is already taken in the base or
+# user tables, one indexed join per table, or given more than once by the
+# packs, as (table, key, problem). Keys with a NULL column never conflict,
+# as sqlite primary keys allow repeating them
+def find_conflicts(db_conn, staged_stems):
+    conflicts = []
+    for table_stem in staged_stems:
+        key = primary_key(db_conn, 'base_' + table_stem)
+        if not key:
+            continue
+        for prefix in ['base', 'user']:
+            conflicts += [
+                (prefix + '_' + table_stem, row, 'already exists')
+                for row in db_conn.execute(
+                    'SELECT {columns} FROM pack_{table_stem} p JOIN {prefix}_{table_stem} t USING ({key})'.format(
+                        columns = ', '.join('p.' + column for column in key),
+                        table_stem = table_stem,
+                        prefix = prefix,
+                        key = ', '.join(key)
+                    )
+                )
+            ]
+        conflicts += [
+            ('pack_' + table_stem, row[:-1], 'is given {} times by the packs'.format(row[-1]))
+            for row in db_conn.execute(
+                'SELECT {key}, count(*) FROM pack_{table_stem} WHERE {not_null} GROUP BY {key} HAVING count(*) > 1'.format(
+                    key = ', '.join(key),
+                    table_stem = table_stem,
+                    not_null = ' AND '.join(column + ' IS NOT NULL' for column in key)
+                )
+            )
+        ]
+
+    return conflicts
+
+
+def main(db_file, paths, relax_enums):
+
+    # Get path to data directory
+    data_dir = pathlib.Path(__file__).resolve().parents[1]
+
+    # Read and validate every file before touching the db
+    documents = []
+    for source, pack_file in pack_sources(paths):
+        with open(pack_file, encoding = 'utf8') as f:
+            data = json.load(f)
+        if not validate_pack_file(data_dir, pack_file, data, relax_enums):
+            return 1
+        documents.append((source, data))
+
+    db_conn = sqlite3.connect(db_file)
+    db_conn.execute('BEGIN')
+    try:
+        staged_stems = []
+        for source, data in documents:
+            stage_source(db_conn, source, data, staged_stems)
+
+        conflicts = find_conflicts(db_conn, staged_stems)
+        if conflicts:
+            for table, key, problem in conflicts:
+                print('Conflict in {}: {} {}'.format(table, ', '.join(map(str, key)), problem))
+            print('Nothing was loaded')
+            db_conn.rollback()
+            return 1
+
+        for table_stem in staged_stems:
+            count = db_conn.execute(
+                'INSERT INTO user_{table_stem} SELECT * FROM pack_{table_stem} ORDER BY rowid'.format(table_stem = table_stem)
+            ).rowcount
+            print('Loaded {} rows into user_{}'.format(count, table_stem))
+
+        # Packs may refer to entries of other packs not loaded yet, so
+        # dangling references are reported without failing the load
+        check_db.print_dangling(check_db.find_dangling(db_conn, ('user',)))
+        db_conn.commit()
+    except BaseException:
+        db_conn.rollback()
+        raise
+    finally:
+        db_conn.close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Load homebrew content packs, json files shaped like data/json, into the user tables of a paperblossoms db.')
+    parser.add_argument('db', help = 'Filepath for the paperblossoms db to load into')
+    parser.add_argument('pack', nargs = '+', help = 'Pack folders or json files, named like the files in data/json')
+    parser.add_argument(
+        '--relax-enums',
+        action = 'store_true',
+        help = 'Ignore the enum constraints of the schemas, so packs can refer to their own entries'
+    )
+    args = parser.parse_args()
+
+    sys.exit(main(args.db, args.pack, args.relax_enums))
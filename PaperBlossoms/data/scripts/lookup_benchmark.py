@@ -0,0 +1,64 @@
+import argparse
+import pathlib
+import sqlite3
+import time
+
+
+# Lookups the app runs while building a character, as issued by
+# dataaccesslayer.cpp, with sample parameters from the core data
+LOOKUPS = [
+    ('clans', 'SELECT name_tr FROM clans ORDER BY name_tr', ()),
+    ('families by clan', 'SELECT name_tr FROM families WHERE clan_tr = ? ORDER BY name_tr', ('Lion',)),
+    ('family rings', 'SELECT ring_tr FROM family_rings WHERE family_tr = ?', ('Akodo',)),
+    ('schools by clan', 'SELECT name_tr FROM schools WHERE clan_tr = ?', ('Lion',)),
+    ('school reference', 'SELECT reference_book, reference_page FROM schools WHERE name_tr = ?', ('Akodo Commander School',)),
+    ('school starting skills', 'SELECT skill_tr FROM school_starting_skills WHERE school_tr = ?', ('Akodo Commander School',)),
+    ('school starting techniques', 'SELECT set_size, technique_tr FROM school_starting_techniques WHERE school_tr = ? AND set_id = ?', ('Akodo Commander School', 0)),
+    ('curriculum', 'SELECT rank, advance_tr, type, special_access FROM curriculum WHERE school_tr = ?', ('Akodo Commander School',)),
+    ('techniques by subcategory', 'SELECT name_tr FROM techniques WHERE subcategory LIKE ? AND rank <= ?', ('General Kata', 3)),
+    ('technique', 'SELECT * FROM techniques WHERE name_tr = ?', ('Striking as Air',)),
+    ('weapon', 'SELECT * FROM weapons WHERE name_tr = ?', ('Katana',)),
+    ('weapon qualities', 'SELECT quality_tr FROM weapon_qualities WHERE weapon_tr = ?', ('Katana',)),
+    ('heritage', 'SELECT ancestor_tr FROM samurai_heritage WHERE source = ? ORDER BY roll_min', ('Core',)),
+    ('translate', 'SELECT string_tr FROM i18n WHERE string = ?', ('Katana',))
+]
+
+
+# Time repeat rounds of every lookup against db_file on a fresh connection;
+# returns the mean time per lookup in microseconds, keyed by lookup name
+def run_benchmark(db_file, repeat = 200):
+    db_conn = sqlite3.connect(db_file)
+    timings = {}
+    for name, sql, params in LOOKUPS:
+        db_conn.execute(sql, params).fetchall()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            db_conn.execute(sql, params).fetchall()
+        timings[name] = 1e6 * (time.perf_counter() - start) / repeat
+    db_conn.close()
+
+    return timings
+
+
+# Print one or more benchmark results side by side, with their total
+def print_benchmark(labels, results):
+    print('{:28}'.format('lookup (us)') + ''.join('{:>12}'.format(label) for label in labels))
+    for name, _, _ in LOOKUPS:
+        print('{:28}'.format(name) + ''.join('{:12.1f}'.format(result[name]) for result in results))
+    print('{:28}'.format('total') + ''.join('{:12.1f}'.format(sum(result.values())) for result in results))
+
+
+def main(db_files, repeat):
+    print_benchmark(
+        [pathlib.Path(db_file).name for db_file in db_files],
+        [run_benchmark(db_file, repeat) for db_file in db_files]
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Time the common app lookups against one or more paperblossoms dbs.')
+    parser.add_argument('db', nargs = '+', help = 'Filepaths for the dbs to benchmark')
+    parser.add_argument('--repeat', type = int, default = 200, help = 'Number of times each lookup is run')
+    args = parser.parse_args()
+
+    main(args.db, args.repeat)
@@ -0,0 +1,163 @@
+import argparse
+import collections
+import pathlib
+import sqlite3
+
+import json_to_db
+
+
+# Bounded LRU cache over translate/untranslate and view lookups against the
+# paperblossoms db. Every cached result remembers the data_versions counters
+# of the tables it was read from, and is only served while those counters are
+# unchanged, so edits to i18n, user_descriptions or any user table invalidate
+# exactly the results that depend on them. Derived tables such as items count
+# as the tables they are computed from, and results depending on a table
+# without a counter are never cached.
+class LookupCache:
+
+    def __init__(self, db_conn, max_entries = 4096):
+        self.db_conn = db_conn
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.versions = {}
+        self.snapshot = None
+        self.view_stems = None
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0, 'uncached': 0}
+
+    # Current data version of each tracked table. The counters are only
+    # re-read when sqlite reports a commit from another connection or this
+    # connection has made changes since the last read.
+    def current_versions(self):
+        snapshot = (
+            self.db_conn.execute('PRAGMA data_version').fetchone()[0],
+            self.db_conn.total_changes
+        )
+        if snapshot != self.snapshot:
+            self.versions = dict(self.db_conn.execute('SELECT table_name, version FROM data_versions'))
+            self.snapshot = snapshot
+
+        return self.versions
+
+    # Run sql with params, or serve the cached rows if none of the tables it
+    # depends on has changed since they were cached. Derived tables depend on
+    # the tables they are computed from; if any table has no data version,
+    # changes to it could not be seen, so the rows are not cached
+    def query(self, sql, params = (), tables = ()):
+        key = (sql, tuple(params))
+        versions = self.current_versions()
+        tables = list(dict.fromkeys(
+            source for table in tables for source in json_to_db.DERIVED_TABLES.get(table, [table])
+        ))
+        if not all(table in versions for table in tables):
+            self.stats['misses'] += 1
+            self.stats['uncached'] += 1
+            return self.db_conn.execute(sql, params).fetchall()
+
+        if key in self.entries:
+            rows, dependencies = self.entries[key]
+            if all(versions.get(table, 0) == version for table, version in dependencies):
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return rows
+            del self.entries[key]
+            self.stats['invalidations'] += 1
+
+        self.stats['misses'] += 1
+        rows = self.db_conn.execute(sql, params).fetchall()
+        self.entries[key] = (
+            rows,
+            tuple((table, versions[table]) for table in tables)
+        )
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last = False)
+            self.stats['evictions'] += 1
+
+        return rows
+
+    # Translated form of string, or string itself if it has no translation
+    def translate(self, string):
+        rows = self.query('SELECT string_tr FROM i18n WHERE string = ?', (string,), ['i18n'])
+
+        return rows[0][0] if rows and rows[0][0] is not None else string
+
+    # Original form of a translated string, or string_tr itself if unknown
+    def untranslate(self, string_tr):
+        rows = self.query('SELECT string FROM i18n WHERE string_tr = ?', (string_tr,), ['i18n'])
+
+        return rows[0][0] if rows else string_tr
+
+    # Table stem a view reads from, by the view_catalog of the db; narrow
+    # views such as techniques_name_tr read from user_techniques. Views
+    # missing from the catalog, or dbs built without one, are their own stem
+    def table_stem(self, view_name):
+        if self.view_stems is None:
+            try:
+                self.view_stems = dict(self.db_conn.execute('SELECT view_name, table_stem FROM view_catalog'))
+            except sqlite3.OperationalError:
+                self.view_stems = {}
+
+        return self.view_stems.get(view_name, view_name)
+
+    # Rows of the view_name view, a {table_stem} view or one of its narrow
+    # views, matching the column = value filters in where; the view reads
+    # from the user table, the user junction tables its list fields are
+    # translated from, descriptions and translations. Derived tables and
+    # views such as items depend on what they are computed from
+    def view(self, view_name, columns = '*', order_by = None, **where):
+        sql = 'SELECT {columns} FROM {view_name}'.format(
+            columns = columns if isinstance(columns, str) else ', '.join(columns),
+            view_name = view_name
+        )
+        if where:
+            sql += ' WHERE ' + ' AND '.join('{} = ?'.format(column) for column in where)
+        if order_by is not None:
+            sql += ' ORDER BY ' + order_by
+
+        if view_name in json_to_db.DERIVED_TABLES:
+            return self.query(sql, tuple(where.values()), [view_name])
+
+        table_stem = self.table_stem(view_name)
+        junctions = [
+            'user_' + junction
+            for (list_stem, _), (junction, _, _, _) in json_to_db.LIST_FIELDS.items()
+            if list_stem == table_stem
+        ]
+
+        return self.query(
+            sql,
+            tuple(where.values()),
+            ['user_' + table_stem] + junctions + ['user_descriptions', 'i18n']
+        )
+
+    def clear(self):
+        self.entries.clear()
+
+    def statistics(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+
+        return dict(
+            self.stats,
+            entries = len(self.entries),
+            hit_rate = self.stats['hits'] / lookups if lookups else 0.0
+        )
+
+
+def main(db_file, strings):
+    cache = LookupCache(sqlite3.connect(db_file))
+    for _ in range(2):
+        for string in strings:
+            print(string, '->', cache.translate(string))
+    print(cache.statistics())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Translate strings through the cached lookup layer and print cache statistics.')
+    parser.add_argument(
+        '--db',
+        default = str(pathlib.Path(__file__).parents[1].joinpath('paperblossoms.db')),
+        help = 'Filepath for the paperblossoms db (defaults to the one in the data folder)'
+    )
+    parser.add_argument('strings', nargs = '+', help = 'Strings to translate')
+    args = parser.parse_args()
+
+    main(args.db, args.strings)
@@ -0,0 +1,154 @@
+import argparse
+import json
+import struct
+
+
+# Save file versions MainWindow can load; version 2 added the locale
+MIN_FILE_VERSION = 1
+MAX_FILE_VERSION = 2
+
+# Character fields in the order MainWindow::on_actionSave_As_triggered
+# streams them after the version and locale, with their QDataStream types
+CHARACTER_FIELDS = [
+    ('name', 'string'),
+    ('titles', 'string_list'),
+    ('clan', 'string'),
+    ('family', 'string'),
+    ('school', 'string'),
+    ('ninjo', 'string'),
+    ('giri', 'string'),
+    ('baseskills', 'int_map'),
+    ('baserings', 'int_map'),
+    ('ringranks', 'int_map'),
+    ('honor', 'int'),
+    ('glory', 'int'),
+    ('status', 'int'),
+    ('koku', 'int'),
+    ('bu', 'int'),
+    ('zeni', 'int'),
+    ('rank', 'int'),
+    ('techniques', 'string_list'),
+    ('adv_disadv', 'string_list'),
+    ('equipment', 'string_list_list'),
+    ('abilities', 'string_list_list'),
+    ('heritage', 'string'),
+    ('notes', 'string'),
+    ('advanceStack', 'string_list'),
+    ('portrait', 'image'),
+    ('totalXP', 'int')
+]
+
+INT32 = struct.Struct('>i')
+UINT32 = struct.Struct('>I')
+INT64 = struct.Struct('>q')
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+# Reads QDataStream values (big-endian, Qt 5 and later) from a buffer through
+# a memoryview, slicing rather than copying until strings are decoded
+class DataStreamReader:
+
+    def __init__(self, data):
+        self.view = memoryview(data)
+        self.offset = 0
+
+    def take(self, size):
+        if self.offset + size > len(self.view):
+            raise ValueError('Unexpected end of data at byte {}'.format(self.offset))
+        chunk = self.view[self.offset:self.offset + size]
+        self.offset += size
+        return chunk
+
+    def unpack(self, value_struct):
+        value, = value_struct.unpack(self.take(value_struct.size))
+        return value
+
+    def int(self):
+        return self.unpack(INT32)
+
+    def uint(self):
+        return self.unpack(UINT32)
+
+    # Container sizes are quint32; Qt 6 writes 0xfffffffe followed by a
+    # qint64 for containers too large for that
+    def size(self):
+        size = self.uint()
+        if size == 0xfffffffe:
+            size = self.unpack(INT64)
+        return size
+
+    # QString: byte length (0xffffffff for a null string) and UTF-16BE data
+    def string(self):
+        length = self.uint()
+        if length == 0xffffffff:
+            return None
+        return str(self.take(length), 'utf-16-be')
+
+    def string_list(self):
+        return [self.string() for _ in range(self.size())]
+
+    def string_list_list(self):
+        return [self.string_list() for _ in range(self.size())]
+
+    # QMap<QString, int>; Qt 5 writes the entries in reverse key order
+    def int_map(self):
+        entries = [(self.string(), self.int()) for _ in range(self.size())]
+        return dict(sorted(entries))
+
+    # QImage: a qint32 flag, then for a non-null image the PNG file written
+    # without a length, so it is walked chunk by chunk up to IEND. Returns a
+    # memoryview of the PNG, or None
+    def image(self):
+        if self.int() == 0:
+            return None
+        start = self.offset
+        if bytes(self.take(len(PNG_SIGNATURE))) != PNG_SIGNATURE:
+            raise ValueError('Portrait at byte {} is not a PNG image'.format(start))
+        while True:
+            length = self.uint()
+            chunk_type = bytes(self.take(4))
+            self.take(length + 4)
+            if chunk_type == b'IEND':
+                return self.view[start:self.offset]
+
+
+# Parse the contents of a .pbc file into a dict of the character fields,
+# plus 'version' and 'locale'; raises ValueError for unsupported or
+# truncated files
+def read_character(data):
+    reader = DataStreamReader(data)
+    version = reader.int()
+    if version < MIN_FILE_VERSION or version > MAX_FILE_VERSION:
+        raise ValueError('Unsupported save file version {}'.format(version))
+
+    # Version 1 files carry no locale; all of them were saved in English
+    character = {
+        'version': version,
+        'locale': reader.string() if version >= 2 else 'en'
+    }
+    for field, field_type in CHARACTER_FIELDS:
+        character[field] = getattr(reader, field_type)()
+
+    return character
+
+
+def read_character_file(filename):
+    with open(filename, 'rb') as f:
+        return read_character(f.read())
+
+
+def main(filenames):
+    for filename in filenames:
+        character = read_character_file(filename)
+        portrait = character.pop('portrait')
+        character['portrait'] = None if portrait is None else '{} byte PNG'.format(len(portrait))
+        print(json.dumps(character, indent = 4, ensure_ascii = False))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Read Paper Blossoms .pbc character files and print them as json.')
+    parser.add_argument('pbc', nargs = '+', help = 'Filepaths of the .pbc files to read')
+    args = parser.parse_args()
+
+    main(args.pbc)
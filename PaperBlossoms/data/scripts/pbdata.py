@@ -0,0 +1,176 @@
+import argparse
+import os
+import sys
+
+
+# Data folder the subcommands work on unless --data-dir is given
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# Milliseconds pbdata may add to bare interpreter startup before running a
+# subcommand, checked by the startup subcommand. --help adds about 20 ms,
+# most of it importing argparse; the rest is headroom for slower machines
+# and timing noise
+STARTUP_BUDGET_MS = 40
+
+# Modules only the subcommands that need them may import, never the parser
+LAZY_MODULES = [
+    'jsonschema', 'sqlite3', 'concurrent.futures', 'json', 'pathlib',
+    'json_to_db', 'validate_json', 'add_enums', 'add_default_snippets_to_schema', 'export_import_user_db', 'watch_data', 'check_db'
+]
+
+
+# Each subcommand imports the script it runs only when it is chosen, so
+# building the parser and dispatching stay cheap
+
+def build(args):
+    if args.watch:
+        import watch_data
+        watch_data.main(args.poll, args.debounce, args.data_dir)
+        return True
+
+    import json_to_db
+    json_to_db.main(args.intern_strings, args.release, args.page_size, args.locales, args.jobs, args.data_dir, args.profile)
+    return True
+
+
+def validate(args):
+    import validate_json
+    return validate_json.main(args.data_dir)
+
+
+def enums(args):
+    import add_enums
+    unknown = sorted(set(args.option or []) - set(add_enums.ENUM_OPTIONS))
+    if unknown:
+        args.parser.error('unknown enum options {} (choose from {})'.format(', '.join(unknown), ', '.join(add_enums.ENUM_OPTIONS)))
+    add_enums.main(args.option, args.data_dir)
+    return True
+
+
+def snippets(args):
+    import add_default_snippets_to_schema
+    add_default_snippets_to_schema.main([os.path.join(args.data_dir, schema) for schema in args.schema])
+    return True
+
+
+def export_user_db(args):
+    import export_import_user_db
+    export_import_user_db.main('export', args.db or os.path.join(args.data_dir, 'paperblossoms.db'), args.custom_db)
+    return True
+
+
+def import_user_db(args):
+    import export_import_user_db
+    export_import_user_db.main('import', args.db or os.path.join(args.data_dir, 'paperblossoms.db'), args.custom_db, repair = args.repair)
+    return True
+
+
+def check(args):
+    import check_db
+    return check_db.main(args.db or os.path.join(args.data_dir, 'paperblossoms.db'), args.full, args.repair, args.user_only)
+
+
+# Fastest wall time of running each command, in milliseconds. Runs of the
+# commands alternate so load affects them alike, and the fastest run is the
+# one least disturbed by it
+def fastest_runs_ms(commands, runs):
+    import subprocess
+    import time
+
+    times = [[] for _ in commands]
+    for _ in range(runs):
+        for command, command_times in zip(commands, times):
+            start = time.perf_counter()
+            subprocess.run(command, stdout = subprocess.DEVNULL, check = True)
+            command_times.append(1000 * (time.perf_counter() - start))
+
+    return [min(command_times) for command_times in times]
+
+
+# Measure what pbdata adds to interpreter startup, from building the parser
+# to dispatching, and check the parser imports none of LAZY_MODULES
+def startup(args):
+    import subprocess
+
+    probe = 'import sys; sys.path.insert(0, {!r}); import pbdata; pbdata.make_parser(); print(*sorted(sys.modules))'.format(
+        os.path.dirname(os.path.realpath(__file__))
+    )
+    loaded = subprocess.run([sys.executable, '-c', probe], stdout = subprocess.PIPE, check = True, encoding = 'utf8').stdout.split()
+    eager = [module for module in LAZY_MODULES if module in loaded]
+
+    baseline, cli = fastest_runs_ms([[sys.executable, '-c', 'pass'], [sys.executable, __file__, '--help']], args.runs)
+    print('Interpreter {:.1f} ms, pbdata --help {:.1f} ms, overhead {:.1f} ms of a {} ms budget'.format(
+        baseline, cli, cli - baseline, STARTUP_BUDGET_MS
+    ))
+    if eager:
+        print('Imported before dispatch: ' + ', '.join(eager))
+
+    return cli - baseline <= STARTUP_BUDGET_MS and not eager
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog = 'pbdata', description = 'Paper Blossoms data tools: build, validate and maintain the json data and the paperblossoms db.')
+    common = argparse.ArgumentParser(add_help = False)
+    common.add_argument(
+        '--data-dir',
+        default = DATA_DIR,
+        help = 'Data folder holding json, json_schema and i18n, where the db is written (defaults to the one this script is in)'
+    )
+    subparsers = parser.add_subparsers(dest = 'command', metavar = 'command', required = True)
+
+    build_parser = subparsers.add_parser('build', parents = [common], help = 'Build paperblossoms.db from the json data')
+    build_parser.add_argument('--intern-strings', action = 'store_true', help = 'Store each translatable string once in a strings table and refer to it by id')
+    build_parser.add_argument('--release', action = 'store_true', help = 'Ship planner statistics and rewrite the db at the page size giving the smallest file')
+    build_parser.add_argument('--page-size', type = int, nargs = '+', default = [1024, 2048, 4096], help = 'Candidate page sizes for --release (defaults to 1024 2048 4096)')
+    build_parser.add_argument('--locales', nargs = '+', default = [], metavar = 'LOCALE', help = 'Also build paperblossoms_<locale>.db for each locale')
+    build_parser.add_argument('--jobs', type = int, help = 'Number of processes building locale dbs (defaults to the number of processors)')
+    build_parser.add_argument('--profile', action = 'store_true', help = 'Report the time and peak Python memory of each build stage')
+    build_parser.add_argument('--watch', action = 'store_true', help = 'Keep running, revalidating and rebuilding the affected tables whenever the data changes')
+    build_parser.add_argument('--poll', action = 'store_true', help = 'With --watch, poll for changes instead of using inotify')
+    build_parser.add_argument('--debounce', type = float, default = 0.2, help = 'With --watch, seconds without further changes before a rebuild starts')
+    build_parser.set_defaults(run = build)
+
+    validate_parser = subparsers.add_parser('validate', parents = [common], help = 'Validate the json data against the json schemas')
+    validate_parser.set_defaults(run = validate)
+
+    enums_parser = subparsers.add_parser('enums', parents = [common], help = 'Write the enums of names into the json schemas')
+    enums_parser.add_argument('--option', nargs = '*', help = 'Which enums to write (defaults to all)')
+    enums_parser.set_defaults(run = enums, parser = enums_parser)
+
+    snippets_parser = subparsers.add_parser('snippets', parents = [common], help = 'Add defaultSnippets for editing in vscode to json schemas')
+    snippets_parser.add_argument('schema', nargs = '+', help = 'Json schemas to add snippets to, relative to the data folder')
+    snippets_parser.set_defaults(run = snippets)
+
+    for name, run, help_text in [
+        ('export', export_user_db, 'Export the user tables of the db to another sqlite file'),
+        ('import', import_user_db, 'Import the user tables of another sqlite file into the db')
+    ]:
+        user_db_parser = subparsers.add_parser(name, parents = [common], help = help_text)
+        user_db_parser.add_argument('custom_db', help = 'Filepath for the sqlite file holding the user tables')
+        user_db_parser.add_argument('--db', help = 'Filepath for the paperblossoms db (defaults to paperblossoms.db in the data folder)')
+        user_db_parser.set_defaults(run = run)
+        if name == 'import':
+            user_db_parser.add_argument('--repair', action = 'store_true', help = 'After importing, delete user link rows whose references dangle')
+
+    check_parser = subparsers.add_parser('check', parents = [common], help = 'Check the db for corruption and dangling references')
+    check_parser.add_argument('--db', help = 'Filepath for the paperblossoms db (defaults to paperblossoms.db in the data folder)')
+    check_parser.add_argument('--full', action = 'store_true', help = 'Run PRAGMA integrity_check instead of the faster quick_check')
+    check_parser.add_argument('--repair', action = 'store_true', help = 'Delete user link rows whose references dangle')
+    check_parser.add_argument('--user-only', action = 'store_true', help = 'Only check the references of the user tables')
+    check_parser.set_defaults(run = check)
+
+    startup_parser = subparsers.add_parser('startup', help = 'Check pbdata starts within its startup budget without importing the subcommands')
+    startup_parser.add_argument('--runs', type = int, default = 20, help = 'Number of timed starts (defaults to 20)')
+    startup_parser.set_defaults(run = startup)
+
+    return parser
+
+
+def main(argv = None):
+    args = make_parser().parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    if not main():
+        sys.exit(1)
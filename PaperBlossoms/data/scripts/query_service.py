@@ -0,0 +1,267 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import pathlib
+import queue
+import sqlite3
+import time
+import urllib.parse
+
+
+# Statements used by the endpoints; keeping the SQL text fixed lets each
+# connection's statement cache reuse the prepared statements across requests
+QUERIES = {
+    'school': 'SELECT * FROM schools WHERE name_tr = ?',
+    'school_rings': 'SELECT ring_tr FROM school_rings WHERE school_tr = ?',
+    'school_starting_skills': 'SELECT skill_tr FROM school_starting_skills WHERE school_tr = ?',
+    'school_techniques_available': 'SELECT technique_tr FROM school_techniques_available WHERE school_tr = ?',
+    'school_curriculum': 'SELECT rank, advance_tr, type, special_access FROM curriculum WHERE school_tr = ? ORDER BY rank',
+    'family_rings': 'SELECT ring_tr FROM family_rings WHERE family_tr = ?',
+    'technique': 'SELECT * FROM techniques WHERE name_tr = ?',
+    'weapon': 'SELECT * FROM weapons WHERE name_tr = ?',
+    'weapon_qualities': 'SELECT grip, quality_tr FROM weapon_qualities WHERE weapon_tr = ?'
+}
+
+
+# Open the db read-only; immutable=1 tells sqlite the file cannot change under
+# us, so it skips locking and change detection entirely
+def connect_read_only(db_file):
+    uri = pathlib.Path(db_file).resolve().as_uri() + '?mode=ro&immutable=1'
+    conn = sqlite3.connect(
+        uri,
+        uri = True,
+        check_same_thread = False,
+        cached_statements = 2 * len(QUERIES)
+    )
+    conn.row_factory = sqlite3.Row
+
+    return conn
+
+
+# Fixed-size pool of read-only connections shared by the worker threads
+class ConnectionPool:
+
+    def __init__(self, db_file, size):
+        self.connections = queue.Queue()
+        for _ in range(size):
+            self.connections.put(connect_read_only(db_file))
+
+    def run(self, lookup, *args):
+        conn = self.connections.get()
+        try:
+            return lookup(conn, *args)
+        finally:
+            self.connections.put(conn)
+
+    def close(self):
+        while not self.connections.empty():
+            self.connections.get().close()
+
+
+def fetch_all(conn, query_name, *params):
+    return [dict(row) for row in conn.execute(QUERIES[query_name], params)]
+
+
+def fetch_column(conn, query_name, *params):
+    return [row[0] for row in conn.execute(QUERIES[query_name], params)]
+
+
+# Endpoint lookups; each takes a connection and the translated name
+
+def lookup_school(conn, name):
+    schools = fetch_all(conn, 'school', name)
+    if not schools:
+        return None
+    school = schools[0]
+    school['rings'] = fetch_column(conn, 'school_rings', name)
+    school['starting_skills'] = fetch_column(conn, 'school_starting_skills', name)
+    school['techniques_available'] = fetch_column(conn, 'school_techniques_available', name)
+    school['curriculum'] = fetch_all(conn, 'school_curriculum', name)
+
+    return school
+
+
+def lookup_family_rings(conn, name):
+    return fetch_column(conn, 'family_rings', name)
+
+
+def lookup_technique(conn, name):
+    techniques = fetch_all(conn, 'technique', name)
+
+    return techniques[0] if techniques else None
+
+
+def lookup_weapon(conn, name):
+    grips = fetch_all(conn, 'weapon', name)
+    if not grips:
+        return None
+    qualities = fetch_all(conn, 'weapon_qualities', name)
+
+    return {
+        'name': name,
+        'grips': grips,
+        'qualities': [quality['quality_tr'] for quality in qualities if quality['grip'] is None],
+        'grip_qualities': [quality for quality in qualities if quality['grip'] is not None]
+    }
+
+
+ENDPOINTS = {
+    '/school': lookup_school,
+    '/family_rings': lookup_family_rings,
+    '/technique': lookup_technique,
+    '/weapon': lookup_weapon
+}
+
+
+# Per-endpoint request counts and latencies; percentiles are taken over the
+# most recent window of requests
+class LatencyMetrics:
+
+    def __init__(self, window = 1024):
+        self.window = window
+        self.endpoints = {}
+
+    def record(self, endpoint, seconds, ok):
+        stats = self.endpoints.setdefault(endpoint, {
+            'count': 0,
+            'errors': 0,
+            'total': 0.0,
+            'max': 0.0,
+            'recent': collections.deque(maxlen = self.window)
+        })
+        stats['count'] += 1
+        stats['errors'] += 0 if ok else 1
+        stats['total'] += seconds
+        stats['max'] = max(stats['max'], seconds)
+        stats['recent'].append(seconds)
+
+    def report(self):
+        report = {}
+        for endpoint, stats in self.endpoints.items():
+            recent = sorted(stats['recent'])
+            report[endpoint] = {
+                'count': stats['count'],
+                'errors': stats['errors'],
+                'mean_ms': 1000 * stats['total'] / stats['count'],
+                'max_ms': 1000 * stats['max'],
+                'p50_ms': 1000 * recent[len(recent) // 2],
+                'p95_ms': 1000 * recent[min(len(recent) - 1, len(recent) * 95 // 100)],
+                'p99_ms': 1000 * recent[min(len(recent) - 1, len(recent) * 99 // 100)]
+            }
+
+        return report
+
+
+# Minimal HTTP/1.1 front end: GET requests only, keep-alive unless the client
+# asks to close, JSON responses
+class QueryService:
+
+    def __init__(self, db_file, pool_size):
+        self.pool = ConnectionPool(db_file, pool_size)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers = pool_size)
+        self.metrics = LatencyMetrics()
+
+    async def dispatch(self, target):
+        url = urllib.parse.urlsplit(target)
+        if url.path == '/metrics':
+            return 200, self.metrics.report()
+        if url.path not in ENDPOINTS:
+            return 404, {'error': 'Unknown endpoint ' + url.path}
+        name = urllib.parse.parse_qs(url.query).get('name')
+        if not name:
+            return 400, {'error': 'Missing name parameter'}
+
+        result = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.pool.run, ENDPOINTS[url.path], name[0]
+        )
+        if result is None or result == []:
+            return 404, {'error': 'No match for ' + name[0]}
+
+        return 200, result
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+
+                start = time.perf_counter()
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                if method != 'GET':
+                    status, body = 405, {'error': 'Only GET is supported'}
+                else:
+                    try:
+                        status, body = await self.dispatch(target)
+                    except sqlite3.Error as err:
+                        status, body = 500, {'error': str(err)}
+                endpoint = urllib.parse.urlsplit(target).path
+                if endpoint in ENDPOINTS:
+                    self.metrics.record(endpoint, time.perf_counter() - start, status < 500)
+
+                payload = json.dumps(body).encode('utf8')
+                close = headers.get('connection', '').lower() == 'close'
+                writer.write(
+                    'HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\nContent-Length: {length}\r\nConnection: {connection}\r\n\r\n'.format(
+                        status = status,
+                        reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}.get(status, 'Internal Server Error'),
+                        length = len(payload),
+                        connection = 'close' if close else 'keep-alive'
+                    ).encode('latin-1') + payload
+                )
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port, socket_path):
+        if socket_path is not None:
+            server = await asyncio.start_unix_server(self.handle, path = socket_path)
+            print('Serving on', socket_path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            print('Serving on http://{}:{}'.format(host, port))
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown()
+        self.pool.close()
+
+
+def main(db_file, host, port, socket_path, pool_size):
+    service = QueryService(db_file, pool_size)
+    try:
+        asyncio.run(service.serve(host, port, socket_path))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Local read-only lookup service over the paperblossoms db.')
+    parser.add_argument(
+        '--db',
+        default = str(pathlib.Path(__file__).parents[1].joinpath('paperblossoms.db')),
+        help = 'Filepath for the paperblossoms db (defaults to the one in the data folder)'
+    )
+    parser.add_argument('--host', default = '127.0.0.1', help = 'Address to listen on')
+    parser.add_argument('--port', type = int, default = 8765, help = 'Port to listen on')
+    parser.add_argument('--socket', help = 'Listen on this unix socket instead of TCP')
+    parser.add_argument('--pool-size', type = int, default = 4, help = 'Number of pooled read-only connections')
+    args = parser.parse_args()
+
+    main(args.db, args.host, args.port, args.socket, args.pool_size)
@@ -0,0 +1,226 @@
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import pathlib
+import subprocess
+import sys
+import time
+
+
+# Schemas add_enums.py writes enums into
+ENUM_SCHEMAS = [
+    'json_schema/advantages_disadvantages.schema.json',
+    'json_schema/armor.schema.json',
+    'json_schema/clans.schema.json',
+    'json_schema/personal_effects.schema.json',
+    'json_schema/schools.schema.json',
+    'json_schema/techniques.schema.json',
+    'json_schema/titles.schema.json',
+    'json_schema/weapons.schema.json'
+]
+
+# Schemas that carry defaultSnippets for editing in vscode
+SNIPPET_SCHEMAS = [
+    'json_schema/rings.schema.json',
+    'json_schema/techniques.schema.json'
+]
+
+
+# Pipeline steps: the command each runs (a script in this folder and its
+# arguments), and the files it reads and writes, relative to the data folder
+# and as glob patterns. A step runs after every step writing one of its inputs
+# and every step it names in after, which it needs to succeed without
+# reading their outputs: only validated json is built into the db
+def pipeline_steps(with_snippets):
+    steps = {
+        'enums': {
+            'command': ['add_enums.py'],
+            'inputs': [
+                'json/rings.json',
+                'json/clans.json',
+                'json/skill_groups.json',
+                'json/techniques.json',
+                'json/qualities.json',
+                'json/armor.json',
+                'json/weapons.json',
+                'json/personal_effects.json',
+                'json/advantages_disadvantages.json'
+            ],
+            'outputs': ENUM_SCHEMAS
+        },
+        'validate': {
+            'command': ['validate_json.py'],
+            'inputs': ['json/*.json', 'json_schema/*.schema.json', 'scripts/schema_compiler.py'],
+            'outputs': [],
+            'after': ['enums']
+        },
+        'build': {
+            'command': ['json_to_db.py'],
+            'inputs': ['json/*.json'],
+            'outputs': ['paperblossoms.db'],
+            'after': ['validate']
+        }
+    }
+
+    if with_snippets:
+        for schema in SNIPPET_SCHEMAS:
+            steps['snippets:' + pathlib.Path(schema).name.split('.')[0]] = {
+                'command': ['add_default_snippets_to_schema.py', schema],
+                'inputs': [schema],
+                'outputs': [schema]
+            }
+
+    # Every step also depends on its own script
+    for step in steps.values():
+        step['inputs'] = step['inputs'] + ['scripts/' + step['command'][0]]
+
+    return steps
+
+
+def expand(data_dir, patterns):
+    return sorted({
+        path.relative_to(data_dir).as_posix()
+        for pattern in patterns
+        for path in data_dir.glob(pattern)
+    })
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def hash_files(data_dir, patterns):
+    return {
+        filename: file_hash(data_dir.joinpath(filename))
+        for filename in expand(data_dir, patterns)
+    }
+
+
+# A step depends on the steps it runs after and on the steps writing any
+# file it reads; steps writing the same file as another step's input, such
+# as the enum and snippet steps that both rewrite schemas in place, are
+# ordered by declaration
+def step_dependencies(steps):
+    dependencies = {name: set(step.get('after', [])) & set(steps) for name, step in steps.items()}
+    names = list(steps)
+    for index, name in enumerate(names):
+        for other in names[:index]:
+            if set(steps[other]['outputs']) & set(steps[name]['inputs']) or any(
+                pathlib.PurePath(output).match(pattern)
+                for output in steps[other]['outputs']
+                for pattern in steps[name]['inputs']
+            ):
+                dependencies[name].add(other)
+
+    return dependencies
+
+
+# A step is up to date if its inputs hash the same as when it last succeeded
+# and its outputs are still the files it wrote then
+def up_to_date(data_dir, step, record):
+    if record is None:
+        return False
+    if hash_files(data_dir, step['inputs']) != record['inputs']:
+        return False
+
+    return all(
+        data_dir.joinpath(output).exists() and file_hash(data_dir.joinpath(output)) == record['outputs'].get(output)
+        for output in step['outputs']
+    )
+
+
+def run_step(data_dir, name, step):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, str(data_dir.joinpath('scripts', step['command'][0]))] + step['command'][1:],
+        cwd = data_dir,
+        stdout = subprocess.PIPE,
+        stderr = subprocess.STDOUT,
+        text = True
+    )
+
+    return name, result.returncode, result.stdout, time.perf_counter() - start
+
+
+def main(force, jobs, with_snippets):
+
+    # Get path to data directory
+    data_dir = pathlib.Path(__file__).resolve().parents[1]
+    state_file = data_dir.joinpath('.pipeline_state.json')
+    state = json.loads(state_file.read_text()) if state_file.exists() and not force else {}
+
+    steps = pipeline_steps(with_snippets)
+    dependencies = step_dependencies(steps)
+    summary = {}
+    failed = set()
+    pending = set(steps)
+    running = {}
+    start = time.perf_counter()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers = jobs) as executor:
+        while pending or running:
+
+            # Start or skip every step whose dependencies have finished
+            for name in sorted(pending):
+                if dependencies[name] & (pending | set(running.values())):
+                    continue
+                pending.discard(name)
+                if dependencies[name] & failed:
+                    failed.add(name)
+                    summary[name] = ('blocked', 0.0)
+                elif up_to_date(data_dir, steps[name], state.get(name)):
+                    summary[name] = ('skipped', 0.0)
+                else:
+                    running[executor.submit(run_step, data_dir, name, steps[name])] = name
+
+            if not running:
+                continue
+
+            done, _ = concurrent.futures.wait(running, return_when = concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                del running[future]
+                name, returncode, output, seconds = future.result()
+                print('[{}]'.format(name))
+                print(output.rstrip())
+                if returncode != 0:
+                    failed.add(name)
+                    state.pop(name, None)
+                    summary[name] = ('failed', seconds)
+                else:
+                    state[name] = {
+                        'inputs': hash_files(data_dir, steps[name]['inputs']),
+                        'outputs': hash_files(data_dir, steps[name]['outputs'])
+                    }
+                    summary[name] = ('ran', seconds)
+
+    state_file.write_text(json.dumps(state, indent = 4))
+
+    # Timing summary
+    print()
+    print('{:24}{:>10}{:>10}'.format('step', 'status', 'seconds'))
+    for name in steps:
+        status, seconds = summary[name]
+        print('{:24}{:>10}{:10.2f}'.format(name, status, seconds))
+    print('{:24}{:>10}{:10.2f}'.format('total', '', time.perf_counter() - start))
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Run the data pipeline (enums, validation, db build), skipping steps whose inputs have not changed.')
+    parser.add_argument('--force', action = 'store_true', help = 'Run every step regardless of recorded hashes')
+    parser.add_argument('--jobs', type = int, default = 4, help = 'Number of steps to run at once')
+    parser.add_argument(
+        '--with-snippets',
+        action = 'store_true',
+        help = 'Also regenerate the defaultSnippets of ' + ', '.join(SNIPPET_SCHEMAS) + ' (overwrites hand-tuned snippets)'
+    )
+    args = parser.parse_args()
+
+    sys.exit(main(args.force, args.jobs, args.with_snippets))
@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import time
+
+import synthetic_data
+
+
+SCRIPTS_DIR = pathlib.Path(__file__).resolve().parent
+
+# Steps timed at every scale, in pipeline order, as the script and arguments
+# run against the synthetic data folder
+STEPS = [
+    ('enums', ['add_enums.py']),
+    ('validate', ['validate_json.py']),
+    ('build', ['json_to_db.py'])
+]
+
+
+# Run a script on data_dir in a child process; returns its exit code, wall
+# time in seconds and peak resident memory in MB (None where the platform
+# does not report the resource usage of a single child)
+def run_step(script_args, data_dir):
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, str(SCRIPTS_DIR.joinpath(script_args[0]))] + script_args[1:] + ['--data-dir', str(data_dir)],
+        stdout = subprocess.DEVNULL
+    )
+    if not hasattr(os, 'wait4'):
+        return process.wait(), time.perf_counter() - start, None
+
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    peak = usage.ru_maxrss / (1e6 if sys.platform == 'darwin' else 1e3)
+    return process.returncode, time.perf_counter() - start, peak
+
+
+def main(scales, work_dir, data_dir, output):
+    results = []
+    print('{:>7}{:>10}{:>10}'.format('scale', 'json MB', 'db MB') + ''.join(
+        '{:>12}{:>10}'.format(step + ' s', 'peak MB') for step, _ in STEPS
+    ))
+    for scale in scales:
+        scale_dir = pathlib.Path(work_dir).joinpath('scale_{}'.format(scale))
+        synthetic_data.generate(data_dir, scale_dir, scale)
+        result = {
+            'scale': scale,
+            'json_bytes': sum(path.stat().st_size for path in scale_dir.joinpath('json').glob('*.json'))
+        }
+        for step, script_args in STEPS:
+            returncode, seconds, peak = run_step(script_args, scale_dir)
+            if returncode != 0:
+                print('{} failed at scale {} with exit code {}'.format(step, scale, returncode))
+            result[step] = {'seconds': seconds, 'peak_mb': peak, 'returncode': returncode}
+        db_file = scale_dir.joinpath('paperblossoms.db')
+        result['db_bytes'] = db_file.stat().st_size if db_file.exists() else None
+        results.append(result)
+
+        print('{:>7}{:>10.1f}{:>10}'.format(
+            scale,
+            result['json_bytes'] / 1e6,
+            '' if result['db_bytes'] is None else '{:.1f}'.format(result['db_bytes'] / 1e6)
+        ) + ''.join(
+            '{:>12.2f}{:>10}'.format(
+                result[step]['seconds'],
+                '' if result[step]['peak_mb'] is None else '{:.0f}'.format(result[step]['peak_mb'])
+            )
+            for step, _ in STEPS
+        ))
+
+    if output is not None:
+        with open(output, 'w', encoding = 'utf8') as f:
+            json.dump(results, f, indent = 4)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Time add_enums.py, validate_json.py and json_to_db.py and record their peak memory on synthetic data at growing scales.')
+    parser.add_argument('--scales', type = int, nargs = '+', default = [10, 100, 1000], help = 'Scale factors to benchmark (defaults to 10 100 1000)')
+    parser.add_argument('--work-dir', default = 'scale_benchmark', help = 'Folder for the synthetic data folders, one per scale (defaults to scale_benchmark)')
+    parser.add_argument(
+        '--data-dir',
+        default = str(pathlib.Path(__file__).resolve().parents[1]),
+        help = 'Data folder to scale up (defaults to the one this script is in)'
+    )
+    parser.add_argument('--output', help = 'Filepath to write the results to as json')
+    args = parser.parse_args()
+
+    main(args.scales, args.work_dir, args.data_dir, args.output)
@@ -0,0 +1,221 @@
+import argparse
+import hashlib
+import importlib.util
+import json
+import pathlib
+import sys
+import time
+
+
+# Bump to regenerate every cached module after changing the generated code
+COMPILER_VERSION = 2
+
+# Where generated validator modules are kept
+CACHE_DIR = pathlib.Path(__file__).resolve().parent.joinpath('compiled_schemas')
+
+# Keywords that only annotate a schema and need no check
+ANNOTATION_KEYWORDS = ['$schema', 'title', 'description', 'default', 'defaultSnippets', 'examples', '$comment']
+
+# Python test for each json type, of the json.load value in x; integers
+# include floats with no fractional part, as in draft 6 and later
+TYPE_TESTS = {
+    'string': 'type({x}) is str',
+    'integer': '(type({x}) is int or (type({x}) is float and {x}.is_integer()))',
+    'number': '(type({x}) is int or type({x}) is float)',
+    'boolean': 'type({x}) is bool',
+    'object': 'type({x}) is dict',
+    'array': 'type({x}) is list',
+    'null': '{x} is None'
+}
+
+
+class UnsupportedSchema(ValueError):
+    pass
+
+
+# Generates the source of a module whose validate(instance) returns whether
+# instance is valid against the schema. Each object or array schema becomes a
+# function of straight-line checks, enums become frozenset constants and
+# leaf schemas are inlined into the checks of their parents. Raises
+# UnsupportedSchema for keywords it does not compile
+class SchemaCompiler:
+
+    def __init__(self):
+        self.functions = []
+        self.constants = []
+
+    # Name of a module level frozenset of the strings in values
+    def string_set(self, values):
+        self.constants.append('_E{} = frozenset({!r})'.format(len(self.constants), sorted(set(values))))
+        return '_E{}'.format(len(self.constants) - 1)
+
+    # Python expression testing the value of the expression x against schema
+    def expression(self, schema, x):
+        if not isinstance(schema, dict):
+            raise UnsupportedSchema('Boolean schemas are not compiled')
+        unknown = set(schema) - set(ANNOTATION_KEYWORDS) - {'type', 'enum', 'properties', 'required', 'items', 'minItems', 'maxItems'}
+        if unknown:
+            raise UnsupportedSchema('Unsupported keywords: ' + ', '.join(sorted(unknown)))
+        if any(keyword in schema for keyword in ['properties', 'required', 'items', 'minItems', 'maxItems']):
+            return '{}({})'.format(self.function(schema), x)
+
+        tests = [self.type_test(schema, x)] if 'type' in schema else []
+        if 'enum' in schema:
+            tests.append(self.enum_test(schema['enum'], x))
+
+        return ' and '.join(tests) if tests else 'True'
+
+    def type_test(self, schema, x):
+        types = schema['type'] if isinstance(schema['type'], list) else [schema['type']]
+        if any(json_type not in TYPE_TESTS for json_type in types):
+            raise UnsupportedSchema('Unsupported type: ' + repr(schema['type']))
+        return '(' + ' or '.join(TYPE_TESTS[json_type].format(x = x) for json_type in types) + ')'
+
+    # Only string enums are compiled, as frozenset membership would treat
+    # True and 1 as equal where json schema does not
+    def enum_test(self, enum, x):
+        if not all(isinstance(value, str) for value in enum):
+            raise UnsupportedSchema('Only string enums are compiled')
+        return '(type({x}) is str and {x} in {enum})'.format(x = x, enum = self.string_set(enum))
+
+    # Name of a generated function validating its argument against schema
+    def function(self, schema):
+        name = '_v{}'.format(len(self.functions))
+        self.functions.append(None)
+        lines = ['def {}(x):'.format(name)]
+        if 'type' in schema:
+            lines.append('    if not {}:'.format(self.type_test(schema, 'x')))
+            lines.append('        return False')
+        if 'enum' in schema:
+            lines.append('    if not {}:'.format(self.enum_test(schema['enum'], 'x')))
+            lines.append('        return False')
+
+        # Object and array keywords apply to objects and arrays only, which
+        # needs no test when the type check already ensured it
+        if 'properties' in schema or 'required' in schema:
+            required = schema.get('required', [])
+            indent = '    '
+            if schema.get('type') != 'object':
+                lines.append('    if type(x) is dict:')
+                indent = '        '
+            if required:
+                lines.append(indent + 'if not ({}):'.format(' and '.join('{!r} in x'.format(key) for key in required)))
+                lines.append(indent + '    return False')
+            for key, property_schema in schema.get('properties', {}).items():
+                test = self.expression(property_schema, 'x[{!r}]'.format(key))
+                if test == 'True':
+                    continue
+                if key in required:
+                    lines.append(indent + 'if not ({}):'.format(test))
+                else:
+                    lines.append(indent + 'if {!r} in x and not ({}):'.format(key, test))
+                lines.append(indent + '    return False')
+
+        if any(keyword in schema for keyword in ['items', 'minItems', 'maxItems']):
+            indent = '    '
+            if schema.get('type') != 'array':
+                lines.append('    if type(x) is list:')
+                indent = '        '
+            if 'minItems' in schema:
+                lines.append(indent + 'if len(x) < {:d}:'.format(schema['minItems']))
+                lines.append(indent + '    return False')
+            if 'maxItems' in schema:
+                lines.append(indent + 'if len(x) > {:d}:'.format(schema['maxItems']))
+                lines.append(indent + '    return False')
+            if 'items' in schema:
+                if not isinstance(schema['items'], dict):
+                    raise UnsupportedSchema('Only single items schemas are compiled')
+                test = self.expression(schema['items'], 'item')
+                if test != 'True':
+                    lines.append(indent + 'for item in x:')
+                    lines.append(indent + '    if not ({}):'.format(test))
+                    lines.append(indent + '        return False')
+
+        lines.append('    return True')
+        self.functions[int(name[2:])] = '\n'.join(lines)
+        return name
+
+    def module_source(self, schema, schema_hash):
+        validate = self.expression(schema, 'instance')
+        return '\n\n\n'.join(
+            ['# Generated by schema_compiler.py from a json schema, do not edit\n# schema sha256 ' + schema_hash] +
+            (['\n'.join(self.constants)] if self.constants else []) +
+            [function for function in self.functions] +
+            ['def validate(instance):\n    return {}'.format(validate)]
+        ) + '\n'
+
+
+def schema_hash(schema):
+    canonical = json.dumps(schema, sort_keys = True, ensure_ascii = False)
+    return hashlib.sha256('{}\n{}'.format(COMPILER_VERSION, canonical).encode('utf8')).hexdigest()
+
+
+# The validate function of the generated module for schema, kept in
+# cache_dir as {name}.py and regenerated when the schema hash it was made
+# from differs. None if the schema uses keywords that are not compiled
+def compiled_validator(schema, name, cache_dir = CACHE_DIR):
+    digest = schema_hash(schema)
+    module_path = pathlib.Path(cache_dir).joinpath(name + '.py')
+    header = '# schema sha256 ' + digest
+    try:
+        with open(module_path, encoding = 'utf8') as f:
+            current = f.read().split('\n', 2)[1] == header
+    except (OSError, IndexError):
+        current = False
+
+    if not current:
+        try:
+            source = SchemaCompiler().module_source(schema, digest)
+        except UnsupportedSchema:
+            return None
+        module_path.parent.mkdir(parents = True, exist_ok = True)
+        with open(module_path, 'w', encoding = 'utf8') as f:
+            f.write(source)
+
+    # Name modules by hash so a regenerated module is imported afresh
+    module_name = 'compiled_schemas.{}_{}'.format(name, digest[:16])
+    if module_name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(module_name, module_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules[module_name] = module
+
+    return sys.modules[module_name].validate
+
+
+# Validate instance against schema with the compiled validator, falling
+# back to jsonschema, imported only then, for instances the compiled
+# validator rejects or schemas it cannot compile. Returns None if valid,
+# otherwise the jsonschema error best describing the failure
+def validation_error(instance, schema, name, cache_dir = CACHE_DIR):
+    validator = compiled_validator(schema, name, cache_dir)
+    if validator is not None and validator(instance):
+        return None
+
+    import jsonschema
+    validator_class = jsonschema.validators.validator_for(schema)
+    return jsonschema.exceptions.best_match(validator_class(schema).iter_errors(instance))
+
+
+def main(data_dir):
+    for schema_path in sorted(pathlib.Path(data_dir).joinpath('json_schema').glob('*.schema.json')):
+        with open(schema_path, encoding = 'utf8') as f:
+            schema = json.load(f)
+        start = time.perf_counter()
+        validator = compiled_validator(schema, schema_path.name[:-len('.schema.json')])
+        print('{:45}{}'.format(
+            schema_path.name,
+            'not compiled, uses jsonschema' if validator is None else '{:.1f} ms'.format(1000 * (time.perf_counter() - start))
+        ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Compile the json schemas into generated validator modules, regenerating those whose schema changed.')
+    parser.add_argument(
+        '--data-dir',
+        default = str(pathlib.Path(__file__).resolve().parents[1]),
+        help = 'Data folder holding json_schema (defaults to the one this script is in)'
+    )
+    args = parser.parse_args()
+
+    main(args.data_dir)
@@ -0,0 +1,176 @@
+import argparse
+import collections
+import csv
+import pathlib
+import time
+
+
+# Locales that are not real translations, such as the numbered test strings
+PSEUDO_LOCALES = ['test']
+
+
+def read_translations(path):
+    with open(path, encoding = 'utf8', newline = '') as f:
+        return {row[0]: row[1] if len(row) > 1 else '' for row in csv.reader(f) if row}
+
+
+# Read every i18n_<locale>.csv of i18n_dir, keyed by locale
+def read_locales(i18n_dir):
+    locales = {}
+    for path in sorted(pathlib.Path(i18n_dir).glob('i18n_*.csv')):
+        locale = path.stem[len('i18n_'):]
+        if locale not in PSEUDO_LOCALES:
+            locales[locale] = read_translations(path)
+
+    return locales
+
+
+# Set of character trigrams of a string, ignoring case, padded so that the
+# start and end of the string count as well
+def trigrams(string):
+    padded = '  ' + ' '.join(string.lower().split()) + ' '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# Inverted index from trigram to the translated source strings containing it,
+# with the translations of every string by locale
+class TranslationMemory:
+
+    def __init__(self, locales):
+        self.strings = []
+        self.sizes = []
+        self.translations = []
+        self.postings = collections.defaultdict(list)
+        ids = {}
+        for locale, translations in locales.items():
+            for string, string_tr in translations.items():
+                if not string_tr:
+                    continue
+                if string not in ids:
+                    ids[string] = len(self.strings)
+                    grams = trigrams(string)
+                    self.strings.append(string)
+                    self.sizes.append(len(grams))
+                    self.translations.append({})
+                    for gram in grams:
+                        self.postings[gram].append(ids[string])
+                self.translations[ids[string]][locale] = string_tr
+
+    # Translated strings sharing trigrams with string, as (score, id) pairs
+    # best first, scored by the Dice coefficient of their trigram sets. Only
+    # the postings of the string's own trigrams are visited, and strings too
+    # long or short to reach min_score are skipped before scoring
+    def matches(self, string, min_score):
+        grams = trigrams(string)
+        shared = collections.Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+
+        size = len(grams)
+        min_size = size * min_score / (2 - min_score)
+        max_size = size * (2 - min_score) / min_score if min_score > 0 else float('inf')
+        scored = []
+        for string_id, count in shared.items():
+            if min_size <= self.sizes[string_id] <= max_size:
+                score = 2 * count / (size + self.sizes[string_id])
+                if score >= min_score:
+                    scored.append((score, string_id))
+
+        return sorted(scored, key = lambda match: (-match[0], self.strings[match[1]]))
+
+    # Up to count suggestions (score, locale, matched string, translation) for
+    # string in locale: translations in locale of the closest strings first,
+    # then, as a reference, translations of them in the other locales
+    def suggest(self, string, locale, count, min_score):
+        same_locale = []
+        other_locales = []
+        for score, string_id in self.matches(string, min_score):
+            translations = self.translations[string_id]
+            if locale in translations:
+                same_locale.append((score, locale, self.strings[string_id], translations[locale]))
+            else:
+                other_locales.extend(
+                    (score, other, self.strings[string_id], translations[other])
+                    for other in sorted(translations)
+                )
+            if len(same_locale) >= count:
+                break
+
+        return (same_locale + other_locales)[:count]
+
+
+# Untranslated strings of locale: those with an empty translation, and those
+# another locale has that locale's file lacks
+def untranslated(locales, locale):
+    translations = locales.get(locale, {})
+    strings = dict.fromkeys(string for string, string_tr in translations.items() if not string_tr)
+    for other in sorted(locales):
+        strings.update(dict.fromkeys(string for string in locales[other] if string not in translations))
+
+    return list(strings)
+
+
+def main(i18n_dir, locale, output, count, min_score, fill_score):
+    start = time.perf_counter()
+    locales = read_locales(i18n_dir)
+    memory = TranslationMemory(locales)
+    print('Indexed {} translated strings in {} locales, {} trigrams, in {:.2f} s'.format(
+        len(memory.strings),
+        len(locales),
+        len(memory.postings),
+        time.perf_counter() - start
+    ))
+
+    # Write the draft with the best same locale suggestion filled in when it
+    # scores at least fill_score, and every suggestion alongside for review
+    start = time.perf_counter()
+    strings = untranslated(locales, locale)
+    filled = 0
+    with open(output, 'w', encoding = 'utf8', newline = '') as f:
+        writer = csv.writer(f, quoting = csv.QUOTE_ALL)
+        header = ['string', 'string_tr']
+        for n in range(1, count + 1):
+            header += ['score_' + str(n), 'locale_' + str(n), 'match_' + str(n), 'match_tr_' + str(n)]
+        writer.writerow(header)
+        for string in strings:
+            suggestions = memory.suggest(string, locale, count, min_score)
+            string_tr = ''
+            if suggestions and suggestions[0][1] == locale and suggestions[0][0] >= fill_score:
+                string_tr = suggestions[0][3]
+                filled += 1
+            row = [string, string_tr]
+            for score, match_locale, match, match_tr in suggestions:
+                row += ['{:.2f}'.format(score), match_locale, match, match_tr]
+            writer.writerow(row)
+
+    print('Wrote {} untranslated strings of {} to {}, {} filled in, in {:.2f} s'.format(
+        len(strings),
+        locale,
+        output,
+        filled,
+        time.perf_counter() - start
+    ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Suggest translations for the untranslated i18n strings of a locale from the closest translated strings.')
+    parser.add_argument('locale', help = 'Locale to suggest translations for, e.g. pl')
+    parser.add_argument(
+        '--i18n-dir',
+        default = str(pathlib.Path(__file__).resolve().parents[1].joinpath('i18n')),
+        help = 'Folder of i18n_<locale>.csv files (defaults to the one in the data folder)'
+    )
+    parser.add_argument('--output', help = 'Filepath for the draft csv (defaults to i18n_<locale>_draft.csv)')
+    parser.add_argument('--suggestions', type = int, default = 3, help = 'Number of suggestions listed for each string')
+    parser.add_argument('--min-score', type = float, default = 0.5, help = 'Lowest trigram similarity, from 0 to 1, of a suggestion')
+    parser.add_argument('--fill-score', type = float, default = 0.8, help = 'Lowest similarity for the best suggestion in the locale to be filled in as the draft translation')
+    args = parser.parse_args()
+
+    main(
+        args.i18n_dir,
+        args.locale,
+        args.output or 'i18n_{}_draft.csv'.format(args.locale),
+        args.suggestions,
+        args.min_score,
+        args.fill_score
+    )
@@ -0,0 +1,111 @@
+import argparse
+import contextlib
+import io
+import json
+import pathlib
+import shutil
+
+import add_enums
+
+
+# Json files in the order they are scaled. add_enums runs after each group,
+# so the schemas of later groups already list the copies of the names they
+# refer to. Rings, the heritage tables and question 8 are fixed by the game
+# rules and are copied as they are
+GENERATION_GROUPS = [
+    ['skill_groups.json', 'qualities.json', 'techniques.json', 'item_patterns.json'],
+    ['clans.json', 'armor.json', 'weapons.json', 'personal_effects.json', 'advantages_disadvantages.json'],
+    ['schools.json', 'titles.json']
+]
+
+# Properties naming the thing they belong to, made unique in every copy
+IDENTIFIER_PROPERTIES = ['name', 'skills']
+
+
+# Makes renamed copies of json data following its schema: copy n appends
+# ' #n' to every identifier and points every reference at copy n of what it
+# refers to, when the schema's enum lists it, so that the copies refer to
+# each other just as the original data does
+class SyntheticCopier:
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.enum_sets = {}
+
+    def enum_set(self, schema):
+        if id(schema) not in self.enum_sets:
+            self.enum_sets[id(schema)] = set(schema['enum'])
+        return self.enum_sets[id(schema)]
+
+    def copy(self, value, suffix, schema, key = None):
+        if isinstance(value, dict):
+            properties = schema.get('properties', {})
+            return {
+                item_key: self.copy(item, suffix, properties.get(item_key, {}), item_key)
+                for item_key, item in value.items()
+            }
+        if isinstance(value, list):
+            items = schema.get('items', {})
+            return [self.copy(item, suffix, items, key) for item in value]
+        if isinstance(value, str) and value != '':
+            if 'enum' in schema:
+                return value + suffix if value + suffix in self.enum_set(schema) else value
+            if key in IDENTIFIER_PROPERTIES:
+                return value + suffix
+
+        return value
+
+
+def read_json(filepath):
+    with open(filepath, encoding = 'utf8') as f:
+        return json.load(f)
+
+
+def write_json(filepath, value):
+    with open(filepath, 'w', encoding = 'utf8') as f:
+        json.dump(value, f, indent = 4, ensure_ascii = False)
+
+
+# Write a data folder to output_dir holding the json of data_dir scaled up
+# scale times, with schemas whose enums list the synthetic names. The
+# original entries come first, so scale 1 reproduces the data as it is
+def generate(data_dir, output_dir, scale):
+    data_dir = pathlib.Path(data_dir)
+    output_dir = pathlib.Path(output_dir)
+    for folder in ['json', 'json_schema']:
+        shutil.rmtree(output_dir.joinpath(folder), ignore_errors = True)
+        shutil.copytree(data_dir.joinpath(folder), output_dir.joinpath(folder))
+
+    for group in GENERATION_GROUPS:
+        for filename in group:
+            original = read_json(data_dir.joinpath('json', filename))
+            schema_path = output_dir.joinpath('json_schema', filename[:-len('.json')] + '.schema.json')
+            copier = SyntheticCopier(read_json(schema_path))
+            scaled = list(original)
+            for n in range(2, scale + 1):
+                scaled.extend(copier.copy(entry, ' #{}'.format(n), copier.schema['items']) for entry in original)
+            write_json(output_dir.joinpath('json', filename), scaled)
+
+        # Regenerate the enums from the scaled files, quietly
+        with contextlib.redirect_stdout(io.StringIO()):
+            add_enums.main(None, output_dir)
+
+
+def main(data_dir, output_dir, scale):
+    generate(data_dir, output_dir, scale)
+    size = sum(path.stat().st_size for path in pathlib.Path(output_dir).joinpath('json').glob('*.json'))
+    print('Wrote {}x synthetic data to {} ({:.1f} MB of json)'.format(scale, output_dir, size / 1e6))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Generate schema-valid synthetic data, the json data scaled up by a factor, for stress-testing the data scripts.')
+    parser.add_argument('output_dir', help = 'Folder to write the synthetic json and json_schema folders to')
+    parser.add_argument('--scale', type = int, default = 10, help = 'Number of copies of every entry (defaults to 10)')
+    parser.add_argument(
+        '--data-dir',
+        default = str(pathlib.Path(__file__).resolve().parents[1]),
+        help = 'Data folder to scale up (defaults to the one this script is in)'
+    )
+    args = parser.parse_args()
+
+    main(args.data_dir, args.output_dir, args.scale)
@@ -0,0 +1,56 @@
+import sqlite3
+import unittest
+
+import check_db
+
+
+# A db with only the weapons and weapon_qualities tables, with one weapon
+# in base_weapons held with two grips
+def weapons_db():
+    db_conn = sqlite3.connect(':memory:')
+    for prefix in ['base', 'user']:
+        db_conn.execute('CREATE TABLE {}_weapons (name TEXT, grip TEXT, PRIMARY KEY (name, grip))'.format(prefix))
+        db_conn.execute('CREATE TABLE {}_weapon_qualities (weapon TEXT, grip TEXT, quality TEXT)'.format(prefix))
+    db_conn.executemany('INSERT INTO base_weapons VALUES (?, ?)', [('Bō', '1-handed'), ('Bō', '2-handed')])
+    return db_conn
+
+
+def dangling_weapons(db_conn):
+    return [
+        (table, missing) for table, child_columns, parent, _, missing in check_db.find_dangling(db_conn, ('user',))
+        if parent == 'weapons'
+    ]
+
+
+class WeaponQualitiesTest(unittest.TestCase):
+
+    def test_missing_weapon_without_grip(self):
+        db_conn = weapons_db()
+        db_conn.execute("INSERT INTO user_weapon_qualities VALUES ('Noweapon', NULL, 'Mundane')")
+        self.assertEqual(dangling_weapons(db_conn), [('user_weapon_qualities', [('Noweapon', None)])])
+        self.assertFalse(check_db.check(db_conn, prefixes = ('user',)))
+
+    def test_weapon_without_grip(self):
+        db_conn = weapons_db()
+        db_conn.execute("INSERT INTO user_weapon_qualities VALUES ('Bō', NULL, 'Mundane')")
+        self.assertEqual(dangling_weapons(db_conn), [])
+
+    def test_missing_grip(self):
+        db_conn = weapons_db()
+        db_conn.execute("INSERT INTO user_weapon_qualities VALUES ('Bō', 'Thrown', 'Mundane')")
+        self.assertEqual(dangling_weapons(db_conn), [('user_weapon_qualities', [('Bō', 'Thrown')])])
+
+    def test_repair(self):
+        db_conn = weapons_db()
+        db_conn.executemany('INSERT INTO user_weapon_qualities VALUES (?, ?, ?)', [
+            ('Noweapon', None, 'Mundane'),
+            ('Bō', None, 'Mundane'),
+            ('Bō', '2-handed', 'Wargear')
+        ])
+        self.assertEqual(check_db.repair_dangling(db_conn), {'user_weapon_qualities': 1})
+        self.assertEqual(dangling_weapons(db_conn), [])
+        self.assertEqual(db_conn.execute('SELECT count(*) FROM user_weapon_qualities').fetchone(), (2,))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,35 +1,39 @@
+import argparse
 import pathlib
+import sys
 import json
-import jsonschema
 
+import schema_compiler
 
 
 # Validates specified json against specified schema. Will raise informative error
-# if json fails schema validation.
+# if json fails schema validation. Returns whether the json is valid. Uses the
+# validator compiled from the schema, and jsonschema only to explain failures
 def validate_schema(json_filepath, schema_filepath):
     with open(json_filepath, encoding = 'utf8') as f:
         instance = json.load(f)
     with open(schema_filepath, encoding = 'utf8') as f:
         schema = json.load(f)
-    
-    try:
-        jsonschema.validate(instance, schema)
-        print('Validated ' + json_filepath.name)
-    except jsonschema.exceptions.ValidationError as err:
+
+    err = schema_compiler.validation_error(instance, schema, schema_filepath.name[:-len('.schema.json')])
+    if err is not None:
         print('Could not validate ' + json_filepath.name + '!')
         print(err.message)
+        return False
+    print('Validated ' + json_filepath.name)
 
-    return None
+    return True
 
 
-def main():
+def main(data_dir = None):
 
     # Get path to data directory
-    data_dir = pathlib.Path(__file__).parents[1]
+    data_dir = pathlib.Path(data_dir) if data_dir is not None else pathlib.Path(__file__).parents[1]
 
     # Loop through all json schemas
+    valid = True
     for schema_filepath in list(data_dir.joinpath('json_schema').glob('*')):
-        validate_schema(
+        valid &= validate_schema(
             json_filepath=(
                 data_dir
                 .joinpath('json')
@@ -38,5 +42,12 @@ def main():
             schema_filepath = schema_filepath
         )
 
+    return valid
+
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description = 'Validate the json data files against their json schemas.')
+    parser.add_argument('--data-dir', help = 'Data folder holding json and json_schema (defaults to the one this script is in)')
+    args = parser.parse_args()
+
+    if not main(args.data_dir):
+        sys.exit(1)
@@ -0,0 +1,357 @@
+import argparse
+import csv
+import ctypes
+import ctypes.util
+import json
+import os
+import pathlib
+import select
+import sqlite3
+import struct
+import time
+
+import jsonschema
+
+import json_to_db
+import schema_compiler
+
+
+# inotify event mask bits, see inotify(7)
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+
+
+# Change notification through inotify, available on Linux
+class InotifyWatcher:
+
+    def __init__(self, directories):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno = True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        self.directories = {}
+        for directory in directories:
+            wd = libc.inotify_add_watch(
+                self.fd,
+                str(directory).encode(),
+                IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+            )
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), 'inotify_add_watch failed for ' + str(directory))
+            self.directories[wd] = directory
+
+    # Wait up to timeout seconds (forever if None) and return the changed paths
+    def changes(self, timeout):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        changed = set()
+        events = os.read(self.fd, 65536)
+        offset = 0
+        while offset < len(events):
+            wd, _, _, length = struct.unpack_from('iIII', events, offset)
+            name = events[offset + 16:offset + 16 + length].rstrip(b'\0').decode()
+            offset += 16 + length
+            if name and wd in self.directories:
+                changed.add(self.directories[wd].joinpath(name))
+
+        return changed
+
+
+# Fallback change notification comparing file modification times and sizes
+class PollingWatcher:
+
+    def __init__(self, directories, interval = 0.25):
+        self.directories = directories
+        self.interval = interval
+        self.stamps = self.scan()
+
+    def scan(self):
+        stamps = {}
+        for directory in self.directories:
+            for path in directory.iterdir():
+                stat = path.stat()
+                stamps[path] = (stat.st_mtime_ns, stat.st_size)
+
+        return stamps
+
+    def changes(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            stamps = self.scan()
+            changed = {
+                path for path in stamps.keys() | self.stamps.keys()
+                if stamps.get(path) != self.stamps.get(path)
+            }
+            self.stamps = stamps
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+            time.sleep(self.interval)
+
+
+def make_watcher(directories, polling = False):
+    if not polling:
+        try:
+            return InotifyWatcher(directories)
+        except (OSError, AttributeError, TypeError):
+            print('inotify unavailable, polling for changes instead')
+
+    return PollingWatcher(directories)
+
+
+# Block until something changes, then keep collecting changes until none
+# arrive for quiet seconds, so a burst of saves is handled as one
+def debounced_changes(watcher, quiet):
+    changed = watcher.changes(None)
+    while True:
+        more = watcher.changes(quiet)
+        if not more:
+            return changed
+        changed |= more
+
+
+# Keeps the parsed json documents, compiled schema validators and translation
+# tables in memory and the built db open, so each change only reparses the
+# edited file and rebuilds the tables of the data source it feeds, or for
+# translations updates the strings that changed in the matching locale db
+class DataWatcher:
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.documents = {}
+        self.validators = {}
+        self.translations = {}
+        self.source_objects = {}
+        self.db_conn = None
+        self.sources_by_file = {
+            filename: source for source, (filename, _, _) in json_to_db.SOURCES.items()
+        }
+
+    def load_document(self, filename):
+        try:
+            with open(self.data_dir.joinpath('json', filename), encoding = 'utf8') as f:
+                self.documents[filename] = json.load(f)
+            return True
+        except (OSError, ValueError) as err:
+            print('Could not read ' + filename + '!')
+            print(err)
+            self.documents.pop(filename, None)
+            return False
+
+    # Compile the schema for a json filename once; validators are reused for
+    # every later change to the document. Files without a schema are not
+    # validated, as in validate_json
+    def load_validator(self, filename):
+        schema_path = self.data_dir.joinpath('json_schema', filename[:-len('.json')] + '.schema.json')
+        if not schema_path.exists():
+            self.validators.pop(filename, None)
+            return
+        try:
+            with open(schema_path, encoding = 'utf8') as f:
+                schema = json.load(f)
+            validator_class = jsonschema.validators.validator_for(schema)
+            validator_class.check_schema(schema)
+            self.validators[filename] = (
+                schema_compiler.compiled_validator(schema, filename[:-len('.json')]),
+                validator_class(schema)
+            )
+        except (OSError, ValueError, jsonschema.exceptions.SchemaError) as err:
+            print('Could not load schema for ' + filename + '!')
+            print(err)
+            self.validators.pop(filename, None)
+
+    def validate(self, filename):
+        if filename not in self.documents:
+            return False
+        if filename not in self.validators:
+            return True
+
+        # The compiled validator is tried first, jsonschema explains failures
+        compiled, validator = self.validators[filename]
+        if compiled is not None and compiled(self.documents[filename]):
+            error = None
+        else:
+            error = jsonschema.exceptions.best_match(validator.iter_errors(self.documents[filename]))
+        if error is not None:
+            print('Could not validate ' + filename + '!')
+            print(error.message)
+            return False
+        print('Validated ' + filename)
+
+        return True
+
+    # Read an i18n csv as the locale dbs load it (see json_to_db.read_i18n)
+    # and keep its translations resident; returns whether it could be read
+    def load_translations(self, filename):
+        try:
+            translations = json_to_db.read_i18n(self.data_dir.joinpath('i18n', filename))
+        except (OSError, csv.Error) as err:
+            print('Could not read ' + filename + '!')
+            print(err)
+            return False
+        self.translations[filename] = translations
+        print('Read {filename}: {count} strings, {missing} untranslated'.format(
+            filename = filename,
+            count = len(translations),
+            missing = sum(1 for string_tr in translations.values() if string_tr is None)
+        ))
+
+        return True
+
+    # Apply the edits to an i18n_<locale>.csv to the i18n table of the
+    # paperblossoms_<locale>.db built from it, if there is one; its i18n
+    # triggers then refresh the stored translations of the base rows. Only
+    # strings the edit changed are written, so translations made in the
+    # app's localisation editor are kept for the others
+    def refresh_translations(self, filename):
+        previous = self.translations.get(filename, {})
+        if not self.load_translations(filename) or not filename.startswith('i18n_'):
+            return
+        locale_file = self.data_dir.joinpath('paperblossoms_{}.db'.format(filename[len('i18n_'):-len('.csv')]))
+        if not locale_file.exists():
+            return
+
+        translations = self.translations[filename]
+        removed = [(string,) for string in previous if string not in translations]
+        changed = [
+            (string, string_tr) for string, string_tr in translations.items()
+            if string not in previous or previous[string] != string_tr
+        ]
+        if not removed and not changed:
+            return
+
+        start = time.perf_counter()
+        locale_conn = sqlite3.connect(str(locale_file))
+        try:
+            with locale_conn:
+                locale_conn.executemany('DELETE FROM i18n WHERE string = ?', removed)
+                locale_conn.executemany(
+                    'INSERT INTO i18n VALUES (?, ?) ON CONFLICT (string) DO UPDATE SET string_tr = excluded.string_tr',
+                    changed
+                )
+        except sqlite3.Error as err:
+            print('Could not update ' + locale_file.name + '!')
+            print(repr(err))
+            return
+        finally:
+            locale_conn.close()
+        print('Updated {} translations in {} in {:.1f} ms'.format(
+            len(removed) + len(changed),
+            locale_file.name,
+            1000 * (time.perf_counter() - start)
+        ))
+
+    def schema_objects(self):
+        return set(self.db_conn.execute("SELECT type, name FROM sqlite_master WHERE type IN ('table', 'view')"))
+
+    # Create a source's tables from its resident document, remembering which
+    # tables and views it created so they can be dropped on rebuild
+    def build_source(self, source):
+        before = self.schema_objects()
+        json_to_db.source_to_db(self.db_conn, source, self.documents[json_to_db.SOURCES[source][0]])
+        self.source_objects[source] = self.schema_objects() - before
+
+    def build(self):
+        for filename in self.sources_by_file:
+            self.load_validator(filename)
+            self.load_document(filename)
+        for path in sorted(self.data_dir.joinpath('i18n').glob('*.csv')):
+            self.load_translations(path.name)
+
+        start = time.perf_counter()
+        self.db_conn = json_to_db.connect_db(str(self.data_dir.joinpath('paperblossoms.db')))
+        json_to_db.desc_to_db(self.db_conn)
+        json_to_db.translations_to_db(self.db_conn)
+        for filename, source in self.sources_by_file.items():
+            if self.validate(filename):
+                self.build_source(source)
+        for builder, _ in json_to_db.DERIVED_BUILDERS:
+            builder(self.db_conn)
+        json_to_db.data_versions_to_db(self.db_conn)
+        json_to_db.view_catalog_to_db(self.db_conn)
+        self.db_conn.commit()
+        print('Built paperblossoms.db in {:.1f} ms'.format(1000 * (time.perf_counter() - start)))
+
+    # Drop and recreate the tables of the given sources in one transaction
+    def rebuild(self, sources):
+        start = time.perf_counter()
+        self.db_conn.execute('BEGIN')
+        try:
+            for source in sources:
+                objects = self.source_objects.pop(source, set())
+                for object_type, name in sorted(objects, key = lambda obj: obj[0] != 'view'):
+                    self.db_conn.execute('DROP {} IF EXISTS {}'.format(object_type.upper(), name))
+                self.build_source(source)
+
+            # Only derived tables reading a rebuilt source are stale; the
+            # data versions and view catalog cover every table
+            for builder, builder_sources in json_to_db.DERIVED_BUILDERS:
+                if set(builder_sources) & set(sources):
+                    builder(self.db_conn)
+            json_to_db.data_versions_to_db(self.db_conn)
+            json_to_db.view_catalog_to_db(self.db_conn)
+            self.db_conn.commit()
+        except (sqlite3.Error, KeyError, TypeError, ValueError) as err:
+            self.db_conn.rollback()
+            print('Could not rebuild ' + ', '.join(sources) + '!')
+            print(repr(err))
+            return
+        print('Rebuilt {} in {:.1f} ms'.format(', '.join(sources), 1000 * (time.perf_counter() - start)))
+
+    def handle(self, changed):
+        stale_files = set()
+        for path in sorted(changed):
+            if path.parent.name == 'json_schema' and path.name.endswith('.schema.json'):
+                filename = path.name[:-len('.schema.json')] + '.json'
+                if filename in self.sources_by_file:
+                    self.load_validator(filename)
+                    stale_files.add(filename)
+            elif path.parent.name == 'json' and path.name in self.sources_by_file:
+                if self.load_document(path.name):
+                    stale_files.add(path.name)
+            elif path.parent.name == 'i18n' and path.suffix == '.csv' and path.exists():
+                self.refresh_translations(path.name)
+
+        sources = [
+            self.sources_by_file[filename]
+            for filename in self.sources_by_file
+            if filename in stale_files and self.validate(filename)
+        ]
+        if sources:
+            self.rebuild(sources)
+
+
+def main(polling = False, debounce = 0.2, data_dir = None):
+
+    # The data folder to watch and build the db in
+    data_dir = pathlib.Path(data_dir if data_dir is not None else pathlib.Path(__file__).resolve().parents[1])
+
+    data_watcher = DataWatcher(data_dir)
+    data_watcher.build()
+
+    watcher = make_watcher(
+        [data_dir.joinpath(directory) for directory in ['json', 'json_schema', 'i18n']],
+        polling
+    )
+    print('Watching for changes, press Ctrl+C to stop')
+    try:
+        while True:
+            data_watcher.handle(debounced_changes(watcher, debounce))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        data_watcher.db_conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Continuously validate the json data and rebuild the paperblossoms db as files change.')
+    parser.add_argument('--poll', action = 'store_true', help = 'Poll for changes instead of using inotify')
+    parser.add_argument('--debounce', type = float, default = 0.2, help = 'Seconds without further changes before a rebuild starts')
+    parser.add_argument('--data-dir', help = 'Data folder holding json, json_schema and i18n, where the db is written (defaults to the one this script is in)')
+    args = parser.parse_args()
+
+    main(args.poll, args.debounce, args.data_dir)
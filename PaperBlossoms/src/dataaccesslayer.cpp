@@ -88,12 +88,71 @@ DataAccessLayer::DataAccessLayer(QString locale)
             qWarning() << "ERROR: " << db.lastError();
     }
 
-    //import translation table for locale (if possible)
-    importCSV(":/translations/data/i18n/i18n_"+locale+".csv","i18n",false);
+    //dbs from before the advantage type and school role tables need them
+    migrateListTables();
+
+    //import translation table for locale (if possible),
+    //unless the db was built for this locale with its translations applied
+    QSqlQuery localequery("SELECT locale FROM build_locale");
+    if(!(localequery.next() && localequery.value(0).toString() == locale)){
+        importCSV(":/translations/data/i18n/i18n_"+locale+".csv","i18n",false);
+    }
     //:/translations/data/i18n/i18n_en.csv
 
 }
 
+//create the advantage_types and school_roles tables, one row per value of
+//the ', ' separated types and role lists, in dbs built before they existed
+void DataAccessLayer::migrateListTables(){
+    const QList<QStringList> listtables = {
+        {"advantage_types", "advantage", "type", "advantages_disadvantages", "types"},
+        {"school_roles", "school", "role", "schools", "role"}
+    };
+    foreach(const QStringList listtable, listtables){
+        const QString junction = listtable[0];
+        const QString key = listtable[1];
+        const QString value = listtable[2];
+        const QString parent = listtable[3];
+        const QString list = listtable[4];
+
+        QSqlQuery existsquery;
+        existsquery.prepare("SELECT 1 FROM sqlite_master WHERE name = ?");
+        existsquery.bindValue(0, junction);
+        existsquery.exec();
+        if(existsquery.next()) continue;
+
+        qDebug() << "Creating " + junction + " from " + parent + "." + list;
+        QSqlDatabase::database().transaction();
+        QSqlQuery query;
+        bool ok = true;
+        foreach(const QString prefix, QStringList({"base_", "user_"})){
+            ok = ok && query.exec("CREATE TABLE " + prefix + junction + " ("
+                       + key + " TEXT, seq INTEGER, " + value + " TEXT, PRIMARY KEY (" + key + ", seq))");
+            ok = ok && query.exec("CREATE INDEX " + prefix + junction + "_" + value + " ON " + prefix + junction + " (" + value + ")");
+            //split each list into its values, numbering them from 0
+            ok = ok && query.exec("INSERT INTO " + prefix + junction + " "
+                       "WITH RECURSIVE split(key, seq, value, rest) AS ("
+                       "SELECT name, -1, NULL, " + list + " || ', ' FROM " + prefix + parent + " WHERE " + list + " <> '' "
+                       "UNION ALL SELECT key, seq + 1, substr(rest, 1, instr(rest, ', ') - 1), substr(rest, instr(rest, ', ') + 2) "
+                       "FROM split WHERE rest <> '') "
+                       "SELECT key, seq, value FROM split WHERE seq >= 0");
+        }
+        ok = ok && query.exec("CREATE VIEW " + junction + " AS SELECT t.*"
+                   ", COALESCE(i18n_" + key + ".string_tr, t." + key + ") AS " + key + "_tr"
+                   ", COALESCE(i18n_" + value + ".string_tr, t." + value + ") AS " + value + "_tr"
+                   " FROM (SELECT * FROM base_" + junction + " UNION ALL SELECT * FROM user_" + junction + ") t"
+                   " LEFT JOIN i18n i18n_" + key + " ON t." + key + " = i18n_" + key + ".string"
+                   " LEFT JOIN i18n i18n_" + value + " ON t." + value + " = i18n_" + value + ".string");
+        if(ok){
+            QSqlDatabase::database().commit();
+        }
+        else{
+            qWarning() << "ERROR: " << query.lastError();
+            QSqlDatabase::database().rollback();
+        }
+    }
+}
+
 QString DataAccessLayer::untranslate(QString string_tr){
     QSqlQuery query;
     query.prepare("SELECT string FROM i18n WHERE string_tr = ?");
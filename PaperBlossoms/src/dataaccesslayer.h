@@ -36,6 +36,7 @@ public:
     DataAccessLayer(QString locale = "en");
 
     const QStringList user_tables = {
+        "user_advantage_types",
         "user_advantages_disadvantages",
         "user_armor",
         "user_armor_qualities",
@@ -50,6 +51,7 @@ public:
         "user_personal_effects",
         "user_qualities",
         "user_school_rings",
+        "user_school_roles",
         "user_school_starting_outfit",
         "user_school_starting_skills",
         "user_school_starting_techniques",
@@ -68,7 +70,7 @@ public:
             "select distinct * from (                                                                                   "
             "select distinct name as term from advantages_disadvantages                                                "
             "union select distinct ring as term from advantages_disadvantages                                   "
-            "union select distinct types as term from advantages_disadvantages                                   "
+            "union select distinct type as term from advantage_types                                   "
             "union select distinct name as term from armor                                                                      "
             "union select distinct price_unit as term from armor                                                                      "
             "union select distinct quality as term from armor_qualities                                   "
@@ -104,7 +106,7 @@ public:
             "union select distinct school from school_techniques_available                                                                      "
             "union select distinct technique from school_techniques_available                                                                      "
             "union select distinct name from schools                                                                      "
-            "union select distinct role from schools                                                                      "
+            "union select distinct role from school_roles                                                                      "
             "union select distinct clan from schools                                                                      "
             "union select distinct school_ability_name from schools                                                                      "
             "union select distinct mastery_ability_name from schools                                                                      "
@@ -229,6 +231,7 @@ private:
     QString escapedCSV(QString unexc);
     QStringList parseCSV(const QString &string);
     bool queryToCsv(const QString querystr, QString filename);
+    void migrateListTables();
 };
 
 #endif // DATAACCESSLAYER_H